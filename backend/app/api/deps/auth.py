@@ -1,5 +1,6 @@
 from fastapi import Header, HTTPException
-from firebase_admin import auth
+
+from ...core.token_cache import verify_id_token_cached
 
 
 # verify id token issued by firebase
@@ -8,7 +9,7 @@ def require_user(authorization: str | None = Header(default=None)):
         raise HTTPException(status_code=401, detail="missing token")
     id_token = authorization.split(" ", 1)[1]
     try:
-        decoded = auth.verify_id_token(id_token)
+        decoded = verify_id_token_cached(id_token)
         return decoded  # includes 'uid', 'email', etc.
     except Exception:
         raise HTTPException(status_code=401, detail="invalid or expired token")
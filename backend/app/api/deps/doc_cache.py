@@ -0,0 +1,6 @@
+from ...core.doc_cache import RequestDocCache
+
+
+# one cache per request: FastAPI reuses a dependency's value within a request
+def get_doc_cache() -> RequestDocCache:
+    return RequestDocCache()
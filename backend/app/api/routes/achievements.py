@@ -1,11 +1,15 @@
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ..deps.doc_cache import get_doc_cache
+from ...core import repository as repo
+from ...core.doc_cache import RequestDocCache
+from ...core import study_stats, task_stats
 from ...core.notification_sender import send_achievement_notification
 
 router = APIRouter(prefix="/achievements", tags=["achievements"])
@@ -85,129 +89,122 @@ ACHIEVEMENTS_CONFIG = {
 }
 
 
-def _achievements_collection(uid: str):
-    """Get reference to user's achievements collection"""
-    return db.collection("users").document(uid).collection("achievements")
+async def _load_achievement_inputs(
+    uid: str, cache: Optional[RequestDocCache] = None
+) -> tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Read the user's stat aggregates and achievement records in one batched get.
 
+    Returns ``(stats, achievement_map)`` where ``achievement_map`` holds the
+    stored record for each achievement that has one. Documents already in
+    ``cache`` are not read again.
+    """
+    refs = [
+        study_stats.study_stats_doc(uid),
+        task_stats.task_stats_doc(uid),
+        repo.wellness_summary_doc(uid),
+    ]
+    achievements_ref = repo.achievements_collection(uid)
+    refs += [achievements_ref.document(achievement_id) for achievement_id in ACHIEVEMENTS_CONFIG]
+    docs = await (cache.get_many(refs) if cache is not None else repo.get_many(refs))
+    study_data, task_data, wellness_data, *achievement_docs = docs
 
-async def _get_user_stats(uid: str) -> Dict[str, Any]:
-    """Gather all user statistics for achievement checking"""
-    stats = {
-        "has_account": True,  # If they can access this, they have an account
-        "total_study_sessions": 0,
-        "total_study_hours": 0,
-        "longest_streak": 0,
-        "total_checkins": 0,
-        "completed_tasks": 0,
+    # Accounts created before the aggregates existed get them built on first use
+    if study_data is None:
+        study_data = await study_stats.rebuild_study_stats(uid)
+    if task_data is None:
+        task_data = await task_stats.rebuild_task_stats(uid)
+
+    stats = _get_user_stats(study_data, task_data, wellness_data or {})
+    achievement_map = {
+        achievement_id: data
+        for achievement_id, data in zip(ACHIEVEMENTS_CONFIG, achievement_docs)
+        if data is not None
     }
-    
-    # Get study sessions stats
-    try:
-        study_sessions = db.collection("users").document(uid).collection("studySessions").stream()
-        total_minutes = 0
-        session_count = 0
-        completed_count = 0
-        for session in study_sessions:
-            session_data = session.to_dict()
-            # Use actual_duration_minutes (new format) with fallback to duration_minutes (legacy)
-            actual_duration = session_data.get("actual_duration_minutes")
-            if actual_duration is None:
-                actual_duration = session_data.get("duration_minutes", 0)
-            
-            # Sum actual_duration_minutes from ALL sessions for total study hours
-            if actual_duration is not None and isinstance(actual_duration, (int, float)) and actual_duration > 0:
-                total_minutes += int(actual_duration)
-            
-            session_count += 1
-            # Count completed sessions for Streak Master achievement
-            if session_data.get("status") == "completed" and actual_duration and actual_duration > 0:
-                completed_count += 1
-        stats["total_study_sessions"] = completed_count  # Use completed sessions count
-        stats["total_study_hours"] = total_minutes / 60
-    except Exception:
-        pass
-    
-    # Get wellness stats
-    try:
-        wellness_summary = (
-            db.collection("users")
-            .document(uid)
-            .collection("wellness")
-            .document("summary")
-            .get()
-        )
-        if wellness_summary.exists:
-            wellness_data = wellness_summary.to_dict() or {}
-            overview = wellness_data.get("overview", {})
-            stats["longest_streak"] = overview.get("longestStreak", 0)
-            stats["total_checkins"] = overview.get("totalCheckIns", 0)
-    except Exception:
-        pass
-    
-    # Get tasks stats
-    try:
-        tasks = db.collection("users").document(uid).collection("tasks").stream()
-        completed_count = 0
-        for task in tasks:
-            task_data = task.to_dict()
-            if task_data.get("status") == "done":
-                completed_count += 1
-        stats["completed_tasks"] = completed_count
-    except Exception:
-        pass
-    
+    return stats, achievement_map
+
+
+def _get_user_stats(
+    study_data: Dict[str, Any], task_data: Dict[str, Any], wellness_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Gather all user statistics for achievement checking"""
+    overview = wellness_data.get("overview", {})
     # TODO: Add social buddies count when social features are implemented
     # TODO: Add pet care days tracking
-    
-    return stats
+    return {
+        "has_account": True,  # If they can access this, they have an account
+        # Completed sessions count towards First Steps / Streak Master
+        "total_study_sessions": study_data.get("completed_sessions", 0),
+        "total_study_hours": study_data.get("total_minutes", 0) / 60,
+        "longest_streak": overview.get("longestStreak", 0),
+        "total_checkins": overview.get("totalCheckIns", 0),
+        "completed_tasks": task_data.get("completed_tasks", 0),
+    }
 
 
-async def _check_and_unlock_achievements(uid: str, stats: Dict[str, Any]) -> Dict[str, Any]:
-    """Check user progress and mark achievements as earned (not claimed)"""
-    achievements_ref = _achievements_collection(uid)
+async def _check_and_unlock_achievements(
+    uid: str, stats: Dict[str, Any], achievement_map: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Check user progress and mark achievements as earned (not claimed).
+
+    Only achievements whose progress or earned flag changed are written, all in
+    one batch. ``achievement_map`` is updated in place with the new records.
+    """
+    achievements_ref = repo.achievements_collection(uid)
     claimed_count = 0
     newly_earned = []
+    batch = repo.batch()
+    pending = 0
+    now = datetime.now(timezone.utc)
     
     for achievement_id, config in ACHIEVEMENTS_CONFIG.items():
         doc_ref = achievements_ref.document(achievement_id)
-        doc = doc_ref.get()
+        achievement_data = achievement_map.get(achievement_id)
         
         # Calculate current progress
         current_progress = config["check"](stats)
         is_earned = current_progress >= config["required"]
         
-        if doc.exists:
-            achievement_data = doc.to_dict() or {}
+        if achievement_data is not None:
             was_earned = achievement_data.get("earned", False)
-            is_claimed = achievement_data.get("claimed", False)
+            
+            if achievement_data.get("claimed", False):
+                claimed_count += 1
+            
+            if achievement_data.get("progress") == current_progress and was_earned == is_earned:
+                continue
             
             # Update progress
-            doc_ref.update({
+            update_data = {
                 "progress": current_progress,
                 "earned": is_earned,
-                "unlocked_at": datetime.now(timezone.utc) if (is_earned and not was_earned) else achievement_data.get("unlocked_at"),
-                "updated_at": datetime.now(timezone.utc),
-            })
+                "unlocked_at": now if (is_earned and not was_earned) else achievement_data.get("unlocked_at"),
+                "updated_at": now,
+            }
+            batch.update(doc_ref, update_data)
+            achievement_data.update(update_data)
             
             if is_earned and not was_earned:
                 newly_earned.append(config["title"])
-            
-            if is_claimed:
-                claimed_count += 1
         else:
             # Create new achievement record
-            doc_ref.set({
+            achievement_data = {
                 "earned": is_earned,
                 "claimed": False,
                 "progress": current_progress,
-                "unlocked_at": datetime.now(timezone.utc) if is_earned else None,
+                "unlocked_at": now if is_earned else None,
                 "claimed_at": None,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            })
+                "created_at": now,
+                "updated_at": now,
+            }
+            batch.set(doc_ref, achievement_data)
+            achievement_map[achievement_id] = achievement_data
             
             if is_earned:
                 newly_earned.append(config["title"])
+        pending += 1
+    
+    if pending:
+        await batch.commit()
     
     return {
         "claimed_count": claimed_count,
@@ -216,24 +213,17 @@ async def _check_and_unlock_achievements(uid: str, stats: Dict[str, Any]) -> Dic
 
 
 @router.get("/", response_model=AchievementsOverviewResponse)
-async def get_achievements(user: dict = Depends(require_user)):
+async def get_achievements(
+    user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     """Get all achievements with current progress for the authenticated user"""
     uid = user["uid"]
     
-    # Get user stats
-    stats = await _get_user_stats(uid)
+    # Get user stats and achievement records
+    stats, achievement_map = await _load_achievement_inputs(uid, cache)
     
     # Check and unlock achievements
-    unlock_result = await _check_and_unlock_achievements(uid, stats)
-    
-    # Get all achievement records
-    achievements_ref = _achievements_collection(uid)
-    achievements_docs = achievements_ref.stream()
-    
-    # Create achievement map
-    achievement_map = {}
-    for doc in achievements_docs:
-        achievement_map[doc.id] = doc.to_dict()
+    unlock_result = await _check_and_unlock_achievements(uid, stats, achievement_map)
     
     # Build response
     achievements_list = []
@@ -273,8 +263,8 @@ async def check_achievements(user: dict = Depends(require_user)):
     """Manually trigger achievement check and return newly earned achievements"""
     uid = user["uid"]
     
-    stats = await _get_user_stats(uid)
-    unlock_result = await _check_and_unlock_achievements(uid, stats)
+    stats, achievement_map = await _load_achievement_inputs(uid)
+    unlock_result = await _check_and_unlock_achievements(uid, stats, achievement_map)
     
     return {
         "message": f"Checked achievements. {len(unlock_result['newly_earned'])} newly earned.",
@@ -293,8 +283,8 @@ async def claim_achievement(achievement_id: str, user: dict = Depends(require_us
         raise HTTPException(status_code=404, detail="Achievement not found")
     
     # Get achievement document
-    doc_ref = _achievements_collection(uid).document(achievement_id)
-    doc = doc_ref.get()
+    doc_ref = repo.achievements_collection(uid).document(achievement_id)
+    doc = await doc_ref.get()
     
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Achievement not earned yet")
@@ -310,7 +300,7 @@ async def claim_achievement(achievement_id: str, user: dict = Depends(require_us
         raise HTTPException(status_code=400, detail="Achievement already claimed")
     
     # Claim the achievement
-    doc_ref.update({
+    await doc_ref.update({
         "claimed": True,
         "claimed_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc),
@@ -319,7 +309,8 @@ async def claim_achievement(achievement_id: str, user: dict = Depends(require_us
     config = ACHIEVEMENTS_CONFIG[achievement_id]
     
     # Send achievement notification (in-app + email)
-    send_achievement_notification(
+    await run_in_threadpool(
+        send_achievement_notification,
         uid=uid,
         achievement_title=config["title"],
         achievement_icon=config["icon"],
@@ -348,8 +339,8 @@ async def unclaim_achievement(achievement_id: str, user: dict = Depends(require_
         raise HTTPException(status_code=404, detail="Achievement not found")
     
     # Get achievement document
-    doc_ref = _achievements_collection(uid).document(achievement_id)
-    doc = doc_ref.get()
+    doc_ref = repo.achievements_collection(uid).document(achievement_id)
+    doc = await doc_ref.get()
     
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Achievement not found")
@@ -361,7 +352,7 @@ async def unclaim_achievement(achievement_id: str, user: dict = Depends(require_
         raise HTTPException(status_code=400, detail="Achievement is not claimed")
     
     # Unclaim the achievement
-    doc_ref.update({
+    await doc_ref.update({
         "claimed": False,
         "claimed_at": None,
         "updated_at": datetime.now(timezone.utc),
@@ -0,0 +1,123 @@
+"""Everything the dashboard page shows, in one request.
+
+The page used to call seven endpoints, each verifying the same ID token and
+several reading the same aggregate documents. ``GET /api/dashboard`` verifies
+the token once, prefetches the shared documents in a single batched read
+into a request-scoped ``RequestDocCache``, and runs the sections
+concurrently through the existing handlers.
+
+Every section carries an ETag. Send the ETags from a previous response in
+``If-None-Match`` and unchanged sections come back as ``not_modified``
+without their data (the whole response is a 304 when nothing changed).
+Per-section durations are in the payload and in the ``Server-Timing`` header.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from ..deps.auth import require_user
+from ..deps.doc_cache import get_doc_cache
+from . import achievements, notifications, profile, study_sessions, tasks, wellness
+from ...core import repository as repo
+from ...core import study_stats, task_stats
+from ...core.doc_cache import RequestDocCache
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+SECTIONS: Dict[str, Callable[[dict, RequestDocCache], Awaitable[Any]]] = {
+    "tasks": lambda user, cache: tasks._calculate_stats(user["uid"]),
+    "timer_stats": lambda user, cache: study_sessions.get_timer_stats(user),
+    "study_stats": study_sessions.get_study_stats,
+    "achievements": achievements.get_achievements,
+    "wellness": wellness.get_wellness_overview,
+    "unread_notifications": lambda user, cache: notifications.get_unread_notification_count(user),
+    "pet_status": profile.get_pet_status,
+}
+
+
+def _shared_docs(uid: str) -> list:
+    """Documents read by more than one section."""
+    achievement_docs = repo.achievements_collection(uid)
+    return [
+        repo.user_doc(uid),
+        study_stats.study_stats_doc(uid),
+        task_stats.task_stats_doc(uid),
+        repo.wellness_summary_doc(uid),
+        *(achievement_docs.document(achievement_id) for achievement_id in achievements.ACHIEVEMENTS_CONFIG),
+    ]
+
+
+def _etag(name: str, data: Any) -> str:
+    digest = hashlib.sha1(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+    return f'"{name}-{digest}"'
+
+
+def _parse_if_none_match(header: Optional[str]) -> set:
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+async def _run_section(name: str, user: dict, cache: RequestDocCache, known_etags: set) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        data = jsonable_encoder(await SECTIONS[name](user, cache))
+    except HTTPException as e:
+        return {"error": e.detail, "status": e.status_code, "ms": _ms_since(started)}
+    except Exception as e:
+        print(f"Dashboard section {name} failed: {e}")
+        # The detail stays in the server log
+        return {"error": "section failed", "status": 500, "ms": _ms_since(started)}
+    etag = _etag(name, data)
+    if etag in known_etags:
+        return {"etag": etag, "not_modified": True, "ms": _ms_since(started)}
+    return {"etag": etag, "data": data, "ms": _ms_since(started)}
+
+
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+@router.get("/")
+async def get_dashboard(
+    sections: Optional[str] = Query(
+        default=None, description="Comma-separated sections to include; all by default"
+    ),
+    if_none_match: Optional[str] = Header(default=None),
+    user: dict = Depends(require_user),
+    cache: RequestDocCache = Depends(get_doc_cache),
+):
+    """Get every dashboard section for the authenticated user in one call"""
+    names = list(SECTIONS)
+    if sections:
+        names = [name.strip() for name in sections.split(",") if name.strip()]
+        unknown = [name for name in names if name not in SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    await cache.get_many(_shared_docs(user["uid"]))
+    prefetch_ms = _ms_since(started)
+
+    known_etags = _parse_if_none_match(if_none_match)
+    results = await asyncio.gather(*(_run_section(name, user, cache, known_etags) for name in names))
+    payload = dict(zip(names, results))
+
+    timings = [f"prefetch;dur={prefetch_ms}"] + [f"{name};dur={payload[name]['ms']}" for name in names]
+    timings.append(f"total;dur={_ms_since(started)}")
+    headers = {"Server-Timing": ", ".join(timings)}
+
+    if known_etags and all(section.get("not_modified") for section in payload.values()):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(
+        {"sections": payload, "prefetch_ms": prefetch_ms, "total_ms": _ms_since(started)},
+        headers=headers,
+    )
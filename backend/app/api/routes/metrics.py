@@ -0,0 +1,34 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from ..deps.auth import require_user
+from ...core.email import mail_queue
+from ...core.pet_engine.broadcast import pet_broadcaster
+from ...core.pet_engine.fanout import pet_fanout
+from ...core.pet_engine.manager import pet_manager
+from ...core.pet_engine.moves import move_coalescer
+from ...core.pet_engine.node import pet_node
+from ...core.scheduler import scheduler
+from ...core.session_buffer import session_buffer
+from ...core.settings_cache import settings_cache
+from ...core.token_cache import token_cache
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/", response_model=Dict[str, Any])
+def get_metrics(user: dict = Depends(require_user)):
+    """Return in-process cache and background worker counters"""
+    return {
+        "token_cache": token_cache.stats(),
+        "settings_cache": settings_cache.stats(),
+        "scheduler": scheduler.stats(),
+        "mail_queue": mail_queue.stats(),
+        "pet_broadcast": pet_broadcaster.stats(),
+        "pet_fanout": pet_fanout.stats(),
+        "pets": pet_manager.stats(),
+        "pet_node": pet_node.stats(),
+        "pet_moves": move_coalescer.stats(),
+        "session_buffer": session_buffer.stats(),
+    }
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ...core import repository as repo
 
 router = APIRouter(prefix="/minigame", tags=["minigame"])
 
@@ -42,20 +42,15 @@ class MinigameUpdateResponse(BaseModel):
     message: str
 
 
-def _minigame_doc(uid: str):
-    """Get reference to user's minigame progress document"""
-    return db.collection("users").document(uid).collection("minigame").document("progress")
-
-
 @router.get("/progress", response_model=MinigameProgressResponse, summary="Get minigame progress")
-def get_minigame_progress(user: dict = Depends(require_user)):
+async def get_minigame_progress(user: dict = Depends(require_user)):
     """
     Get the user's minigame progress.
 
     Returns None if no progress exists (first time playing).
     """
     uid = user["uid"]
-    doc = _minigame_doc(uid).get()
+    doc = await repo.minigame_doc(uid).get()
 
     if not doc.exists:
         return MinigameProgressResponse(progress=None)
@@ -65,7 +60,7 @@ def get_minigame_progress(user: dict = Depends(require_user)):
 
 
 @router.post("/progress", response_model=MinigameUpdateResponse, summary="Save minigame progress")
-def save_minigame_progress(
+async def save_minigame_progress(
     payload: MinigameProgress,
     user: dict = Depends(require_user)
 ):
@@ -75,13 +70,13 @@ def save_minigame_progress(
     This endpoint handles both creating new progress and updating existing progress.
     """
     uid = user["uid"]
-    doc_ref = _minigame_doc(uid)
+    doc_ref = repo.minigame_doc(uid)
 
     data = payload.model_dump()
     data["updated_at"] = datetime.now(timezone.utc)
 
     # Use merge=True to update existing or create new
-    doc_ref.set(data, merge=True)
+    await doc_ref.set(data, merge=True)
 
     return MinigameUpdateResponse(
         ok=True,
@@ -90,19 +85,19 @@ def save_minigame_progress(
 
 
 @router.delete("/progress", response_model=MinigameUpdateResponse, summary="Clear minigame progress")
-def clear_minigame_progress(user: dict = Depends(require_user)):
+async def clear_minigame_progress(user: dict = Depends(require_user)):
     """
     Clear the user's minigame progress.
 
     Useful for testing or resetting the game state.
     """
     uid = user["uid"]
-    doc_ref = _minigame_doc(uid)
+    doc_ref = repo.minigame_doc(uid)
 
-    if not doc_ref.get().exists:
+    if not (await doc_ref.get()).exists:
         raise HTTPException(status_code=404, detail="No progress found to clear")
 
-    doc_ref.delete()
+    await doc_ref.delete()
 
     return MinigameUpdateResponse(
         ok=True,
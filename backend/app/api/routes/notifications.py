@@ -6,12 +6,13 @@ from pydantic import BaseModel, Field
 from google.cloud import firestore
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ...core import repository as repo
 from ...core.notification_sender import (
     send_daily_checkin_reminder,
     send_study_reminder,
     send_social_update,
 )
+from ...core.settings_cache import settings_cache
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -51,14 +52,6 @@ class NotificationResponse(BaseModel):
 SUCCESS_RESPONSE = {"ok": True, "message": "Operation completed successfully"}
 
 
-def _user_doc(uid: str):
-    return db.collection("users").document(uid)
-
-
-def _notifications_collection(uid: str):
-    return _user_doc(uid).collection("notifications")
-
-
 def _isoformat(dt: Optional[datetime]) -> Optional[str]:
     if not dt:
         return None
@@ -91,39 +84,40 @@ def _serialize_notification(doc) -> Dict[str, Any]:
 
 
 @router.get("/settings", response_model=NotificationSettings)
-def get_notification_settings(user: dict = Depends(require_user)):
+async def get_notification_settings(user: dict = Depends(require_user)):
     uid = user["uid"]
-    doc_snapshot = _user_doc(uid).get()
+    exists, stored = await settings_cache.user_field(uid, "notification_settings")
 
-    if not doc_snapshot.exists:
+    if not exists:
         return NotificationSettings()
 
-    stored = (doc_snapshot.to_dict() or {}).get("notification_settings") or {}
+    stored = stored or {}
     return NotificationSettings(**{**NotificationSettings().model_dump(), **stored})
 
 
 @router.put("/settings", response_model=Dict[str, Any])
-def update_notification_settings(
+async def update_notification_settings(
     payload: NotificationSettings, user: dict = Depends(require_user)
 ):
     uid = user["uid"]
-    _user_doc(uid).set({"notification_settings": payload.model_dump()}, merge=True)
+    await repo.user_doc(uid).set({"notification_settings": payload.model_dump()}, merge=True)
+    settings_cache.invalidate(uid, "notification_settings")
     return SUCCESS_RESPONSE
 
 
 @router.get("/", response_model=List[NotificationResponse])
-def list_notifications(user: dict = Depends(require_user)):
+async def list_notifications(user: dict = Depends(require_user)):
     uid = user["uid"]
-    notifications_ref = _notifications_collection(uid)
+    notifications_ref = repo.notifications_collection(uid)
     query = notifications_ref.order_by(
         "created_at", direction=firestore.Query.DESCENDING
     )
-    docs = query.stream()
+    docs = await repo.stream(query)
     return [_serialize_notification(doc) for doc in docs]
 
 
 @router.post("/", response_model=NotificationResponse)
-def create_notification(
+async def create_notification(
     payload: NotificationCreate, user: dict = Depends(require_user)
 ):
     uid = user["uid"]
@@ -139,63 +133,65 @@ def create_notification(
         "metadata": payload.metadata or {},
     }
 
-    doc_ref = _notifications_collection(uid).document()
-    doc_ref.set(data)
-    stored_doc = doc_ref.get()
+    doc_ref = repo.notifications_collection(uid).document()
+    await doc_ref.set(data)
+    stored_doc = await doc_ref.get()
     return _serialize_notification(stored_doc)
 
 
 @router.put("/{notification_id}/read", response_model=Dict[str, Any])
-def mark_notification_read(
+async def mark_notification_read(
     notification_id: str,
     payload: NotificationReadUpdate,
     user: dict = Depends(require_user),
 ):
     uid = user["uid"]
-    doc_ref = _notifications_collection(uid).document(notification_id)
-    doc = doc_ref.get()
+    doc_ref = repo.notifications_collection(uid).document(notification_id)
+    doc = await doc_ref.get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    doc_ref.update({"is_read": payload.is_read})
+    await doc_ref.update({"is_read": payload.is_read})
     return SUCCESS_RESPONSE
 
 
 @router.put("/read-all", response_model=Dict[str, Any])
-def mark_all_notifications_read(user: dict = Depends(require_user)):
+async def mark_all_notifications_read(user: dict = Depends(require_user)):
     uid = user["uid"]
-    notifications_ref = _notifications_collection(uid)
+    notifications_ref = repo.notifications_collection(uid)
     unread_query = notifications_ref.where("is_read", "==", False)
-    unread_docs = list(unread_query.stream())
+    unread_docs = await repo.stream(unread_query)
 
     if not unread_docs:
         return SUCCESS_RESPONSE
 
-    batch = db.batch()
-    for doc in unread_docs:
-        batch.update(doc.reference, {"is_read": True})
-    batch.commit()
+    for start in range(0, len(unread_docs), repo.BATCH_LIMIT):
+        batch = repo.batch()
+        for doc in unread_docs[start : start + repo.BATCH_LIMIT]:
+            batch.update(doc.reference, {"is_read": True})
+        await batch.commit()
 
     return SUCCESS_RESPONSE
 
 
 @router.delete("/{notification_id}", response_model=Dict[str, Any])
-def delete_notification(notification_id: str, user: dict = Depends(require_user)):
+async def delete_notification(notification_id: str, user: dict = Depends(require_user)):
     uid = user["uid"]
-    doc_ref = _notifications_collection(uid).document(notification_id)
-    doc = doc_ref.get()
+    doc_ref = repo.notifications_collection(uid).document(notification_id)
+    doc = await doc_ref.get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    doc_ref.delete()
+    await doc_ref.delete()
     return SUCCESS_RESPONSE
 
 
 @router.get("/unread-count", response_model=Dict[str, int])
-def get_unread_notification_count(user: dict = Depends(require_user)):
+async def get_unread_notification_count(user: dict = Depends(require_user)):
     uid = user["uid"]
-    unread_query = _notifications_collection(uid).where("is_read", "==", False)
-    total = sum(1 for _ in unread_query.stream())
+    unread_query = repo.notifications_collection(uid).where("is_read", "==", False)
+    result = await unread_query.count().get()
+    total = int(result[0][0].value) if result else 0
     return {"count": total}
 
 
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Dict
 import os
 
 router = APIRouter(prefix="/pet", tags=["pet"])
 
-from app.core.pet_engine.pet_state import PetState
-pet_state = PetState()
+from app.api.deps.auth import require_user
+from app.core.pet_engine.animation_states import ANIMATION_TABLE, AnimationId
+from app.core.pet_engine.clock import STEP_SECONDS
+from app.core.pet_engine.codec import frame_format
+from app.core.pet_engine.manager import PET_SYNC_MODE, pet_manager
+from app.core.pet_engine.node import pet_node
 
 class PetConfig(BaseModel):
     canvas_width: int
@@ -26,54 +30,55 @@ async def get_pet_config():
             "scale": 3,   # Display scale multiplier
             "columns": 12  # Auto-detected on frontend
         },
-        "animations": {
-            # Format: { row, frames, fps, loop, colStart }
-            # You can customize these to extract different sprites from the sheet
-            "idle":     {"row": 0, "frames": 8, "fps": 6,  "loop": True,  "colStart": 0},
-            "idle2":    {"row": 1, "frames": 8, "fps": 6,  "loop": True,  "colStart": 0},
-            "clean":    {"row": 2, "frames": 8, "fps": 8,  "loop": True,  "colStart": 0},
-            "clean2":   {"row": 3, "frames": 8, "fps": 8,  "loop": True,  "colStart": 0},
-            "walk":     {"row": 4, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
-            "walk2":    {"row": 5, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
-            "walk_left":  {"row": 4, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
-            "walk_right": {"row": 5, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
-            "sleep":    {"row": 6, "frames": 6, "fps": 5,  "loop": True,  "colStart": 0},
-            "grabbed":  {"row": 7, "frames": 6, "fps": 8,  "loop": True,  "colStart": 0},
-            "jump":     {"row": 8, "frames": 8, "fps": 12, "loop": False, "colStart": 0},
-            "falling":  {"row": 9, "frames": 8, "fps": 12, "loop": True,  "colStart": 0},
-            "scared":   {"row": 9, "frames": 8, "fps": 10, "loop": False, "colStart": 0},
-            "idle_to_sleep": {"row": 6, "frames": 3, "fps": 5, "loop": False, "colStart": 0},
-            "sleep_to_idle": {"row": 6, "frames": 3, "fps": 5, "loop": False, "colStart": 3}
-        },
+        # Format: { row, frames, fps, loop, colStart }
+        "animations": ANIMATION_TABLE,
+        # Ids used by binary pet_frame events
+        "animation_ids": {animation.name.lower(): animation.value for animation in AnimationId},
         "physics": {
             "gravity": 0.8,
             "terminal_velocity": 15,
             "drag_coefficient": 0.95,
-            "walk_speed": 2
-        }
+            "walk_speed": 2,
+            # Server updates per second; walk_speed and gravity are per update
+            "tick_rate": round(1 / STEP_SECONDS),
+        },
+        # "stream" (pet_update / pet_delta) or "transitions" (pet_transition)
+        "sync_mode": PET_SYNC_MODE,
+        # Sent instead of pet_update / pet_delta to clients that connect with {encoding: "binary"}
+        "binary_frame": frame_format(),
     }
 
+def _pet_state(uid: str) -> Dict:
+    """The pet's state, as last published by the leader when another node runs it"""
+    if not pet_node.is_leader:
+        # Only the leader may create pets; it also evicts them when idle
+        mirrored = pet_node.mirrored_state(uid)
+        if mirrored is None:
+            raise HTTPException(status_code=503, detail="Pet state not available yet")
+        return mirrored
+    return pet_manager.get(uid).to_dict()
+
 @router.get("/state")
-async def get_pet_state():
+async def get_pet_state(user: dict = Depends(require_user)):
     """Get current pet state"""
-    pet_state.update_position()
-    return pet_state.to_dict()
+    return _pet_state(user["uid"])
 
 @router.post("/position")
-async def update_position(position: Position):
+async def update_position(position: Position, user: dict = Depends(require_user)):
     """Update pet position (for dragging)"""
-    pet_state.set_position(position.x, position.y)
-    return pet_state.to_dict()
+    await pet_node.command("position", owner=user["uid"], x=position.x, y=position.y)
+    return _pet_state(user["uid"])
 
 @router.post("/grab")
-async def grab_pet(grabbed: bool):
+async def grab_pet(grabbed: bool, user: dict = Depends(require_user)):
     """Handle grab/release"""
-    pet_state.set_grabbed(grabbed)
-    return pet_state.to_dict()
+    await pet_node.command("grab", owner=user["uid"], grabbed=grabbed)
+    return _pet_state(user["uid"])
 
 @router.post("/init")
-async def initialize_pet(config: PetConfig):
-    """Initialize pet with canvas dimensions"""
-    global pet_state
-    pet_state = PetState(config.canvas_width, config.canvas_height)
+async def initialize_pet(config: PetConfig, user: dict = Depends(require_user)):
+    """Initialize the user's pet with canvas dimensions"""
+    await pet_node.command(
+        "reset", owner=user["uid"], canvas_width=config.canvas_width, canvas_height=config.canvas_height
+    )
     return {"status": "initialized"}
@@ -1,32 +1,246 @@
-from fastapi import APIRouter
-from fastapi_socketio import SocketManager
+"""Socket.IO events and update loop for the interactive pet.
+
+Clients pass their Firebase ID token in the connection's auth payload
+(``io(url, {auth: {token}})``) and watch their own pet in the
+``pet:{uid}`` room, so every tab of the same user sees the same cat.
+Connections without a token get a pet of their own that is dropped when
+they disconnect.
+
+Adding ``encoding: "binary"`` to the auth payload switches the delta
+stream to compact ``pet_frame`` binary events (``pet_engine/codec.py``);
+binary clients sit in a separate room so each encoding is built once per
+tick. With ``PET_SYNC_MODE=transitions`` rooms get ``pet_transition``
+events (see ``pet_engine/transitions.py``) instead of the 10 Hz stream.
+
+Every event becomes a command for ``pet_node``, which applies it here or,
+with several nodes, forwards it to the one running the simulation.
+``move_pet`` drag events are rate limited per socket and coalesced, so each
+socket's latest position is sent once per simulation step
+(``pet_engine/moves.py``).
+"""
+
 import asyncio
-from app.core.pet_engine.pet_state import PetState
+import time
+from typing import Optional
+
+import socketio
+
+from ...core.pet_engine.broadcast import pet_broadcaster
+from ...core.pet_engine.codec import FRAME_EVENT, binary_room, encode_frame
+from ...core.pet_engine.clock import STEP_SECONDS
+from ...core.pet_engine.manager import PET_SYNC_MODE, pet_manager, pet_room
+from ...core.pet_engine.moves import move_coalescer
+from ...core.pet_engine.node import pet_node
+from ...core.throttle import SampledLogger
+from ...core.token_cache import verify_id_token_cached
+
+EVICT_INTERVAL_SECONDS = 30
+TRANSITIONS = PET_SYNC_MODE == "transitions"
+move_log = SampledLogger(interval=5.0)
+grab_log = SampledLogger(interval=5.0)
+
+# Set by register()
+sio: Optional[socketio.AsyncServer] = None
+
+
+async def _authenticate(auth) -> Optional[str]:
+    """uid for the token in the connect payload, ``None`` if there is no token."""
+    token = auth.get("token") if isinstance(auth, dict) else None
+    if not token:
+        return None
+    try:
+        claims = await asyncio.to_thread(verify_id_token_cached, token)
+    except Exception:
+        raise socketio.exceptions.ConnectionRefusedError("invalid or expired token")
+    return claims["uid"]
+
 
-router = APIRouter()
+def _room_messages(room: str, message) -> list:
+    """``message`` for the JSON clients and binary clients of ``room``"""
+    messages = []
+    json_clients, binary_clients = pet_broadcaster.encodings(room)
+    if json_clients:
+        event, payload = message
+        messages.append((room, event, payload))
+    if binary_clients:
+        messages.append((binary_room(room), FRAME_EVENT, encode_frame(pet_broadcaster.snapshot(room))))
+    return messages
 
-# This will be initialized in main.py
-socket_manager = None
-pet_state = PetState()
 
-async def broadcast_pet_state():
-    """Continuously broadcast pet state updates"""
+async def broadcast_pet_state(owner: str, force_keyframe: bool = False):
+    """Emit the changes to ``owner``'s pet (or a keyframe) to its room"""
+    room = pet_room(owner)
+    state = pet_manager.get(owner).to_dict()
+    message = pet_broadcaster.next_message(room, state, force_keyframe=force_keyframe)
+    if message:
+        await pet_node.send(_room_messages(room, message), {owner: state})
+
+
+async def _emit_transition(owner: str, payload):
+    await pet_node.send([(pet_room(owner), "pet_transition", payload)], {owner: pet_manager.get(owner).to_dict()})
+
+
+async def pet_update_loop():
+    """Step the simulation on its fixed clock and send each room its changes"""
+    if TRANSITIONS:
+        await pet_manager.run(_emit_transition)
+        return
+
+    last = last_eviction = time.monotonic()
     while True:
-        pet_state.update_position(dt=0.1)
-        await socket_manager.emit('pet_update', pet_state.to_dict())
-        await asyncio.sleep(0.1)  # 10 updates per second
-
-@router.on('connect')
-async def handle_connect(sid, environ):
-    print(f'Client connected: {sid}')
-    await socket_manager.emit('pet_state', pet_state.to_dict(), room=sid)
-
-@router.on('move_pet')
-async def handle_move_pet(sid, data):
-    pet_state.set_position(data['x'], data['y'])
-    await socket_manager.emit('pet_update', pet_state.to_dict(), broadcast=True)
-
-@router.on('grab_pet')
-async def handle_grab(sid, data):
-    pet_state.set_grabbed(data['grabbed'])
-    await socket_manager.emit('pet_update', pet_state.to_dict(), broadcast=True)
+        try:
+            now = time.monotonic()
+            watched = pet_manager.advance(now - last)
+            last = now
+
+            messages = []
+            states = {}
+            for owner, handle in watched:
+                room = pet_room(owner)
+                state = handle.to_dict()
+                message = pet_broadcaster.next_message(room, state)
+                if message:
+                    messages.extend(_room_messages(room, message))
+                    states[owner] = state
+            # Each message is encoded once for all of its room's sockets
+            await pet_node.send(messages, states)
+
+            if now - last_eviction >= EVICT_INTERVAL_SECONDS:
+                evicted = pet_manager.evict_idle(now)
+                if evicted:
+                    print(f"Evicted {len(evicted)} idle pet(s)")
+                last_eviction = now
+
+            await asyncio.sleep(pet_manager.clock.until_next_step())
+        except Exception as e:
+            print(f"Pet update error: {e}")
+            await asyncio.sleep(1)
+
+
+async def _attach(sid: str, owner: str, binary: bool) -> None:
+    state = pet_manager.attach(sid, owner)
+    # Send initial pet state
+    if TRANSITIONS:
+        await pet_node.send([(sid, "pet_transition", pet_manager.transition(owner))], {owner: state.to_dict()})
+        return
+    keyframe = pet_broadcaster.join(sid, pet_room(owner), state.to_dict(), binary=binary)
+    if binary:
+        message = (sid, FRAME_EVENT, encode_frame(keyframe))
+    else:
+        message = (sid, "pet_state", keyframe)
+    await pet_node.send([message], {owner: state.to_dict()})
+
+
+async def move_flush_loop():
+    """Send each socket's latest drag position once per simulation step"""
+    while True:
+        try:
+            await asyncio.sleep(STEP_SECONDS)
+            moves = move_coalescer.drain()
+            if moves:
+                await pet_node.command("positions", moves=moves)
+            # Grabs over the socket's rate, after the positions they end
+            for sid, grabbed in move_coalescer.drain_grabs().items():
+                await pet_node.command("grab", sid=sid, grabbed=grabbed)
+        except Exception as e:
+            print(f"Pet move flush error: {e}")
+            await asyncio.sleep(1)
+
+
+def _set_position(owner: str, x: float, y: float) -> None:
+    pet_state = pet_manager.get(owner)
+    pet_state.set_position(x, y)
+    move_log.log(f"🎯 move_pet: x={x}, y={y}, grabbed={pet_state.is_grabbed}")
+
+
+def _detach(sid: str) -> None:
+    pet_broadcaster.leave(sid)
+    owner = pet_manager.detach(sid)
+    if owner == sid:
+        pet_manager.remove(owner)
+
+
+async def apply_command(name: str, args: dict) -> None:
+    """Run a pet command against the simulation on this node (the leader in a cluster)"""
+    if name == "attach":
+        await _attach(args["sid"], args["owner"], args.get("binary", False))
+        return
+    if name == "detach":
+        _detach(args["sid"])
+        return
+    if name == "detach_all":
+        for sid in pet_manager.sockets():
+            _detach(sid)
+        return
+    if name == "reset":
+        pet_manager.reset(args["owner"], args["canvas_width"], args["canvas_height"])
+        return
+    if name == "positions":
+        for sid, (x, y) in args["moves"].items():
+            owner = pet_manager.owner_of(sid)
+            if owner is not None:
+                _set_position(owner, x, y)
+        return
+
+    # Socket events name the sid, pet API calls the owner
+    owner = args.get("owner") or pet_manager.owner_of(args.get("sid"))
+    if owner is None:
+        return
+    if name == "position":
+        _set_position(owner, args["x"], args["y"])
+    elif name == "grab":
+        pet_state = pet_manager.get(owner)
+        grab_log.log(f"✋ grab_pet: {args['grabbed']}, current_pos=({pet_state.x}, {pet_state.y})")
+        pet_state.set_grabbed(args["grabbed"])
+        if not TRANSITIONS:
+            # The transition loop announces grabs itself
+            await broadcast_pet_state(owner, force_keyframe=True)
+    else:
+        print(f"Unknown pet command: {name}")
+
+
+async def connect(sid, environ, auth=None):
+    owner = await _authenticate(auth) or sid
+    print(f"Client connected: {sid}")
+    room = pet_room(owner)
+    binary = isinstance(auth, dict) and auth.get("encoding") == "binary" and not TRANSITIONS
+    # Rooms live on the node holding the socket, the pet on the leader
+    await sio.enter_room(sid, binary_room(room) if binary else room)
+    await pet_node.command("attach", sid=sid, owner=owner, binary=binary)
+
+
+async def disconnect(sid):
+    print(f"Client disconnected: {sid}")
+    move_coalescer.forget(sid)
+    await pet_node.command("detach", sid=sid)
+
+
+async def move_pet(sid, data):
+    # Applied by move_flush_loop on the next step
+    try:
+        move_coalescer.submit(sid, float(data["x"]), float(data["y"]))
+    except (KeyError, TypeError, ValueError):
+        return
+
+
+async def grab_pet(sid, data):
+    grabbed = data.get("grabbed") if isinstance(data, dict) else None
+    if not isinstance(grabbed, bool):
+        return
+    if not move_coalescer.grab(sid, grabbed):
+        # Over the rate; move_flush_loop applies it on the next step
+        return
+    # Land a release where the drag ended, not at the last flushed position
+    pending = move_coalescer.pop(sid)
+    if pending is not None:
+        await pet_node.command("positions", moves={sid: pending})
+    await pet_node.command("grab", sid=sid, grabbed=grabbed)
+
+
+def register(server: socketio.AsyncServer) -> None:
+    """Attach the pet event handlers to ``server`` and the node running the simulation."""
+    global sio
+    sio = server
+    for handler in (connect, disconnect, move_pet, grab_pet):
+        server.on(handler.__name__, handler)
+    pet_node.bind(server, apply_command, pet_update_loop, background=[move_flush_loop])
@@ -7,7 +7,12 @@ from pydantic import BaseModel, Field
 from google.cloud import firestore
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ..deps.doc_cache import get_doc_cache
+from ...core.doc_cache import RequestDocCache
+from ...core import repository as repo
+from ...core import study_stats
+from ...core.pet_care import decay_pet_status
+from ...core.settings_cache import settings_cache
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
@@ -63,10 +68,11 @@ class UserPreferences(BaseModel):
 
 @router.post("/")
 # verify user id token before upserting profile
-def upsert_profile(payload: dict, user: dict = Depends(require_user)):
+async def upsert_profile(
+    payload: dict, user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     uid = user["uid"]
-    doc_ref = db.collection("users").document(uid)
-    doc_snapshot = doc_ref.get()
+    doc_snapshot = await cache.get(repo.user_doc(uid))
     if doc_snapshot.exists:
         return {"ok": True, "uid": uid, "message": "profile already exists"}
     if payload.get("avatar") is not None:
@@ -74,7 +80,8 @@ def upsert_profile(payload: dict, user: dict = Depends(require_user)):
     else:
         avatar = ""
     # create document in users collection
-    db.collection("users").document(uid).set(
+    await cache.set(
+        repo.user_doc(uid),
         {
             "full_name": payload["name"],
             "email": payload["email"],
@@ -87,14 +94,15 @@ def upsert_profile(payload: dict, user: dict = Depends(require_user)):
         },
         merge=True,
     )
+    settings_cache.invalidate(uid)
     return {"ok": True, "uid": uid, "message": "profile upserted successfully"}
 
 
 @router.get("/")
-def get_profile(user: dict = Depends(require_user)):
+async def get_profile(user: dict = Depends(require_user)):
     """Get user profile data including flags"""
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
+    doc_snapshot = await repo.user_doc(uid).get()
     
     if not doc_snapshot.exists:
         return {"hasSeenPremiumBorderModal": False}
@@ -106,7 +114,7 @@ def get_profile(user: dict = Depends(require_user)):
 
 
 @router.put("/")
-def update_profile(payload: dict, user: dict = Depends(require_user)):
+async def update_profile(payload: dict, user: dict = Depends(require_user)):
     """Update general user profile fields"""
     uid = user["uid"]
     
@@ -123,7 +131,7 @@ def update_profile(payload: dict, user: dict = Depends(require_user)):
         return {"ok": False, "message": "No valid fields to update"}
     
     # Update the user document
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         update_data,
         merge=True,
     )
@@ -132,7 +140,7 @@ def update_profile(payload: dict, user: dict = Depends(require_user)):
 
 
 @router.put("/avatar")
-def update_avatar(payload: dict, user: dict = Depends(require_user)):
+async def update_avatar(payload: dict, user: dict = Depends(require_user)):
     """Update user's profile avatar (base64 encoded image)"""
     uid = user["uid"]
     avatar = payload.get("avatar")
@@ -149,7 +157,7 @@ def update_avatar(payload: dict, user: dict = Depends(require_user)):
             pass
     
     # Update avatar in Firestore
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"avatar": avatar},
         merge=True,
     )
@@ -158,13 +166,10 @@ def update_avatar(payload: dict, user: dict = Depends(require_user)):
 
 
 @router.get("/preferences", response_model=UserPreferences)
-def get_user_preferences(user: dict = Depends(require_user)):
+async def get_user_preferences(user: dict = Depends(require_user)):
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
-
-    stored: Dict[str, Any] = {}
-    if doc_snapshot.exists:
-        stored = (doc_snapshot.to_dict() or {}).get("user_preferences") or {}
+    _exists, stored = await settings_cache.user_field(uid, "preferences")
+    stored = stored or {}
 
     merged = {**DEFAULT_USER_PREFERENCES, **stored}
     merged["timer_settings"] = {
@@ -176,35 +181,35 @@ def get_user_preferences(user: dict = Depends(require_user)):
 
 
 @router.put("/preferences", response_model=Dict[str, Any])
-def update_user_preferences(
+async def update_user_preferences(
     payload: UserPreferences, user: dict = Depends(require_user)
 ):
     uid = user["uid"]
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"user_preferences": payload.model_dump()},
         merge=True,
     )
+    settings_cache.invalidate(uid, "preferences")
     return SUCCESS_RESPONSE
 
 
 @router.get("/coins")
-def get_user_coins(user: dict = Depends(require_user)):
+async def get_user_coins(user: dict = Depends(require_user)):
     """Get the user's current coin balance"""
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
+    exists, coins = await settings_cache.user_field(uid, "coins")
 
-    if not doc_snapshot.exists:
+    if not exists:
         raise Exception("User profile not found")
 
-    user_data = doc_snapshot.to_dict() or {}
-    if "coins" not in user_data:
+    if coins is None:
         raise Exception("Coins field not found in user profile")
 
-    return {"coins": user_data["coins"]}
+    return {"coins": coins}
 
 
 @router.put("/coins")
-def update_user_coins(payload: dict, user: dict = Depends(require_user)):
+async def update_user_coins(payload: dict, user: dict = Depends(require_user)):
     """Update the user's coin balance"""
     uid = user["uid"]
     new_coins = payload.get("coins")
@@ -215,31 +220,29 @@ def update_user_coins(payload: dict, user: dict = Depends(require_user)):
     if not isinstance(new_coins, int) or new_coins < 0:
         return {"ok": False, "message": "Coins must be a non-negative integer"}
 
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"coins": new_coins},
         merge=True,
     )
+    settings_cache.invalidate(uid, "coins")
 
     return {"ok": True, "coins": new_coins, "message": "Coins updated successfully"}
 
 
 @router.get("/inventory")
-def get_user_inventory(user: dict = Depends(require_user)):
+async def get_user_inventory(user: dict = Depends(require_user)):
     """Get the user's inventory"""
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
+    exists, inventory = await settings_cache.user_field(uid, "inventory")
 
-    if not doc_snapshot.exists:
+    if not exists:
         raise Exception("User profile not found")
 
-    user_data = doc_snapshot.to_dict() or {}
-    inventory = user_data.get("inventory", [])
-
-    return {"inventory": inventory}
+    return {"inventory": inventory if inventory is not None else []}
 
 
 @router.put("/inventory")
-def update_user_inventory(payload: dict, user: dict = Depends(require_user)):
+async def update_user_inventory(payload: dict, user: dict = Depends(require_user)):
     """Update the user's inventory"""
     uid = user["uid"]
     inventory = payload.get("inventory")
@@ -259,10 +262,11 @@ def update_user_inventory(payload: dict, user: dict = Depends(require_user)):
         if not isinstance(item["count"], int) or item["count"] < 1:
             return {"ok": False, "message": "Item count must be a positive integer"}
 
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"inventory": inventory},
         merge=True,
     )
+    settings_cache.invalidate(uid, "inventory")
 
     return {
         "ok": True,
@@ -272,7 +276,7 @@ def update_user_inventory(payload: dict, user: dict = Depends(require_user)):
 
 
 @router.delete("/account")
-def delete_user_account(user: dict = Depends(require_user)):
+async def delete_user_account(user: dict = Depends(require_user)):
     """Delete user account and all associated data"""
     uid = user["uid"]
     try:
@@ -288,17 +292,12 @@ def delete_user_account(user: dict = Depends(require_user)):
         # Delete documents from root collections
         for collection_name in collections_to_clean:
             try:
+                root_collection = repo.collection(collection_name)
                 # Delete documents where user_id matches
-                docs = (
-                    db.collection(collection_name).where("user_id", "==", uid).stream()
-                )
-                for doc in docs:
-                    doc.reference.delete()
+                await repo.delete_all(root_collection.where("user_id", "==", uid))
 
                 # Delete documents where uid matches (alternative field name)
-                docs = db.collection(collection_name).where("uid", "==", uid).stream()
-                for doc in docs:
-                    doc.reference.delete()
+                await repo.delete_all(root_collection.where("uid", "==", uid))
 
                 print(f"Cleaned up {collection_name} collection for user {uid}")
             except Exception as e:
@@ -307,46 +306,35 @@ def delete_user_account(user: dict = Depends(require_user)):
         # Delete user's subcollections (Firestore doesn't auto-delete these)
         try:
             # Delete notifications subcollection
-            notifications_ref = (
-                db.collection("users").document(uid).collection("notifications")
-            )
-            notifications = notifications_ref.stream()
-            for notification in notifications:
-                notification.reference.delete()
+            await repo.delete_all(repo.notifications_collection(uid))
             print(f"Deleted notifications subcollection for user {uid}")
 
             # Delete study sessions subcollection
-            study_sessions_ref = (
-                db.collection("users").document(uid).collection("studySessions")
-            )
-            study_sessions = study_sessions_ref.stream()
-            for session in study_sessions:
-                session.reference.delete()
+            await repo.delete_all(repo.study_sessions_collection(uid))
             print(f"Deleted studySessions subcollection for user {uid}")
 
+            # Delete daily session metrics subcollection
+            await repo.delete_all(repo.daily_metrics_collection(uid))
+            print(f"Deleted dailyMetrics subcollection for user {uid}")
+
+            # Delete precomputed aggregates
+            await repo.delete_all(repo.aggregates_collection(uid))
+            print(f"Deleted aggregates subcollection for user {uid}")
+
             # Delete wellness checkins subcollection
-            wellness_ref = (
-                db.collection("users").document(uid).collection("wellness_checkins")
-            )
-            wellness_checkins = wellness_ref.stream()
-            for checkin in wellness_checkins:
-                checkin.reference.delete()
+            await repo.delete_all(repo.wellness_checkins_collection(uid))
             print(f"Deleted wellness_checkins subcollection for user {uid}")
 
             # Delete achievements subcollection
-            achievements_ref = (
-                db.collection("users").document(uid).collection("achievements")
-            )
-            achievements = achievements_ref.stream()
-            for achievement in achievements:
-                achievement.reference.delete()
+            await repo.delete_all(repo.achievements_collection(uid))
             print(f"Deleted achievements subcollection for user {uid}")
 
         except Exception as e:
             print(f"Error deleting subcollections: {str(e)}")
 
         # Finally, delete the main user document
-        db.collection("users").document(uid).delete()
+        await repo.user_doc(uid).delete()
+        settings_cache.invalidate(uid)
         print(f"Deleted main user document for user {uid}")
 
         return {
@@ -360,7 +348,7 @@ def delete_user_account(user: dict = Depends(require_user)):
 
 
 @router.post("/seed-test-data")
-def seed_test_data(user: dict = Depends(require_user)):
+async def seed_test_data(user: dict = Depends(require_user)):
     """Add test data for development/testing (FOR TESTING ONLY)"""
     uid = user["uid"]
     now = datetime.now(timezone.utc)
@@ -370,25 +358,26 @@ def seed_test_data(user: dict = Depends(require_user)):
         from datetime import timedelta
 
         study_time = now - timedelta(hours=2)  # 2 hours ago
-        db.collection("users").document(uid).collection("studySessions").add(
-            {
-                "duration_minutes": 75,
-                "subject": "Mathematics",
-                "task": "Calculus problems",
-                "notes": "Completed chapter 5",
-                "session_type": "focus",
-                "created_at": study_time,
-                "date": study_time.strftime("%Y-%m-%d"),
-                "year": study_time.year,
-                "month": study_time.month,
-            }
+        seeded_session = {
+            "duration_minutes": 75,
+            "subject": "Mathematics",
+            "task": "Calculus problems",
+            "notes": "Completed chapter 5",
+            "session_type": "focus",
+            "created_at": study_time,
+            "date": study_time.strftime("%Y-%m-%d"),
+            "year": study_time.year,
+            "month": study_time.month,
+        }
+        await study_stats.write_session(
+            uid, repo.study_sessions_collection(uid).document(), lambda _: seeded_session
         )
 
         # Add test wellness check-in to subcollection
         from datetime import timedelta
 
         yesterday = now - timedelta(days=1)
-        db.collection("users").document(uid).collection("wellness_checkins").add(
+        await repo.wellness_checkins_collection(uid).add(
             {
                 "date": yesterday.strftime("%Y-%m-%d"),
                 "mood": 8,  # Excellent mood
@@ -400,7 +389,7 @@ def seed_test_data(user: dict = Depends(require_user)):
         )
 
         # Add test achievement to subcollection
-        db.collection("users").document(uid).collection("achievements").add(
+        await repo.achievements_collection(uid).add(
             {
                 "achievement_id": "test_achievement",
                 "title": "Test Achievement",
@@ -427,7 +416,7 @@ def seed_test_data(user: dict = Depends(require_user)):
 
 
 @router.post("/test-wellness-checkin")
-def create_test_wellness_checkin(user: dict = Depends(require_user)):
+async def create_test_wellness_checkin(user: dict = Depends(require_user)):
     """Create a test wellness check-in for testing recent activity"""
     uid = user["uid"]
     now = datetime.now(timezone.utc)
@@ -437,7 +426,7 @@ def create_test_wellness_checkin(user: dict = Depends(require_user)):
 
         # Create check-in for yesterday
         yesterday = now - timedelta(days=1)
-        db.collection("users").document(uid).collection("wellness_checkins").add(
+        await repo.wellness_checkins_collection(uid).add(
             {
                 "date": yesterday.strftime("%Y-%m-%d"),
                 "mood": 9,  # Excellent mood
@@ -457,7 +446,7 @@ def create_test_wellness_checkin(user: dict = Depends(require_user)):
 
 
 @router.post("/test-achievement")
-def create_test_achievement(user: dict = Depends(require_user)):
+async def create_test_achievement(user: dict = Depends(require_user)):
     """Create a test achievement for testing recent activity"""
     uid = user["uid"]
     now = datetime.now(timezone.utc)
@@ -467,7 +456,7 @@ def create_test_achievement(user: dict = Depends(require_user)):
 
         # Create achievement from 2 days ago
         achievement_time = now - timedelta(days=2)
-        db.collection("users").document(uid).collection("achievements").add(
+        await repo.achievements_collection(uid).add(
             {
                 "achievement_id": f"test_achievement_{int(now.timestamp())}",
                 "title": "Test Achievement",
@@ -492,7 +481,7 @@ def create_test_achievement(user: dict = Depends(require_user)):
 
 
 @router.post("/earn-and-claim-achievement")
-def earn_and_claim_real_achievement(user: dict = Depends(require_user)):
+async def earn_and_claim_real_achievement(user: dict = Depends(require_user)):
     """Earn and claim a real achievement for testing recent activity"""
     uid = user["uid"]
     now = datetime.now(timezone.utc)
@@ -504,13 +493,8 @@ def earn_and_claim_real_achievement(user: dict = Depends(require_user)):
         achievement_time = now - timedelta(hours=1)  # 1 hour ago
 
         # First, create the achievement as earned
-        doc_ref = (
-            db.collection("users")
-            .document(uid)
-            .collection("achievements")
-            .document("early_bird")
-        )
-        doc_ref.set(
+        doc_ref = repo.achievements_collection(uid).document("early_bird")
+        await doc_ref.set(
             {
                 "earned": True,
                 "claimed": False,
@@ -523,7 +507,7 @@ def earn_and_claim_real_achievement(user: dict = Depends(require_user)):
 
         # Then claim it (this sets claimed_at)
         claim_time = now - timedelta(minutes=30)  # 30 minutes ago
-        doc_ref.update(
+        await doc_ref.update(
             {
                 "claimed": True,
                 "claimed_at": claim_time,
@@ -540,16 +524,13 @@ def earn_and_claim_real_achievement(user: dict = Depends(require_user)):
 
 
 @router.get("/debug-achievements")
-def debug_achievements(user: dict = Depends(require_user)):
+async def debug_achievements(user: dict = Depends(require_user)):
     """Debug endpoint to see what achievements exist in the database"""
     uid = user["uid"]
 
     try:
         # Get all achievements for this user
-        achievements_ref = (
-            db.collection("users").document(uid).collection("achievements")
-        )
-        achievements = achievements_ref.stream()
+        achievements = await repo.stream(repo.achievements_collection(uid))
 
         achievement_list = []
         for achievement in achievements:
@@ -575,7 +556,7 @@ def debug_achievements(user: dict = Depends(require_user)):
 
 
 @router.get("/recent-activity")
-def get_recent_activity(user: dict = Depends(require_user)):
+async def get_recent_activity(user: dict = Depends(require_user)):
     """Get user's recent activity from various collections"""
     uid = user["uid"]
     activities = []
@@ -583,13 +564,10 @@ def get_recent_activity(user: dict = Depends(require_user)):
     try:
         # Fetch recent study sessions from subcollection
         try:
-            study_sessions = (
-                db.collection("users")
-                .document(uid)
-                .collection("studySessions")
+            study_sessions = await repo.stream(
+                repo.study_sessions_collection(uid)
                 .order_by("created_at", direction=firestore.Query.DESCENDING)
                 .limit(5)
-                .stream()
             )
 
             for session in study_sessions:
@@ -618,13 +596,10 @@ def get_recent_activity(user: dict = Depends(require_user)):
 
         # Fetch recent wellness check-ins from subcollection
         try:
-            wellness_checkins = (
-                db.collection("users")
-                .document(uid)
-                .collection("wellness_checkins")
+            wellness_checkins = await repo.stream(
+                repo.wellness_checkins_collection(uid)
                 .order_by("date", direction=firestore.Query.DESCENDING)
                 .limit(5)
-                .stream()
             )
 
             for checkin in wellness_checkins:
@@ -667,12 +642,8 @@ def get_recent_activity(user: dict = Depends(require_user)):
         # Fetch recent achievements from subcollection
         try:
             # First get all claimed achievements (without ordering to avoid index requirement)
-            achievements = (
-                db.collection("users")
-                .document(uid)
-                .collection("achievements")
-                .where("claimed", "==", True)
-                .stream()
+            achievements = await repo.stream(
+                repo.achievements_collection(uid).where("claimed", "==", True)
             )
 
             achievement_count = 0
@@ -739,16 +710,15 @@ def get_recent_activity(user: dict = Depends(require_user)):
 
 
 @router.get("/pet-selection-status")
-def get_pet_selection_status(user: dict = Depends(require_user)):
+async def get_pet_selection_status(user: dict = Depends(require_user)):
     """Check if user has selected a pet (for first-time user detection)"""
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
+    exists, pet_settings = await settings_cache.user_field(uid, "pet_settings")
 
-    if not doc_snapshot.exists:
+    if not exists:
         return {"has_selected_pet": False, "selected_pet": None, "pet_name": None}
 
-    user_data = doc_snapshot.to_dict() or {}
-    pet_settings = user_data.get("pet_settings", {})
+    pet_settings = pet_settings if pet_settings is not None else {}
 
     return {
         "has_selected_pet": pet_settings.get("has_selected_pet", False),
@@ -758,7 +728,9 @@ def get_pet_selection_status(user: dict = Depends(require_user)):
 
 
 @router.post("/select-pet")
-def select_pet(payload: dict, user: dict = Depends(require_user)):
+async def select_pet(
+    payload: dict, user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     """Set user's selected pet and pet name"""
     uid = user["uid"]
     pet_key = payload.get("pet_key")
@@ -795,26 +767,24 @@ def select_pet(payload: dict, user: dict = Depends(require_user)):
         "selected_at": datetime.now(timezone.utc),
     }
 
-    db.collection("users").document(uid).set(
-        {"pet_settings": pet_settings},
-        merge=True,
-    )
+    update: Dict[str, Any] = {"pet_settings": pet_settings}
 
     # Also initialize pet status if not exists
-    doc_snapshot = db.collection("users").document(uid).get()
-    user_data = doc_snapshot.to_dict() or {}
+    user_data = await cache.get_dict(repo.user_doc(uid)) or {}
     if "pet_status" not in user_data:
         now = datetime.now(timezone.utc)
-        db.collection("users").document(uid).set(
-            {"pet_status": {**DEFAULT_PET_STATUS, "last_updated": now}},
-            merge=True,
-        )
+        update["pet_status"] = {**DEFAULT_PET_STATUS, "last_updated": now}
+
+    await cache.set(repo.user_doc(uid), update, merge=True)
+    settings_cache.invalidate(uid, "pet_settings")
 
     return {"ok": True, "message": "Pet selected successfully", "selected_pet": pet_key, "pet_name": pet_name}
 
 
 @router.post("/switch-pet")
-def switch_pet(payload: dict, user: dict = Depends(require_user)):
+async def switch_pet(
+    payload: dict, user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     """Switch user's pet to a different species (costs 10,000 coins)"""
     uid = user["uid"]
     pet_key = payload.get("pet_key")
@@ -828,7 +798,7 @@ def switch_pet(payload: dict, user: dict = Depends(require_user)):
         return {"ok": False, "message": "Invalid pet selection"}
 
     # Get current user data
-    doc_snapshot = db.collection("users").document(uid).get()
+    doc_snapshot = await cache.get(repo.user_doc(uid))
     if not doc_snapshot.exists:
         return {"ok": False, "message": "User profile not found"}
 
@@ -848,10 +818,12 @@ def switch_pet(payload: dict, user: dict = Depends(require_user)):
         "switched_at": datetime.now(timezone.utc),
     }
 
-    db.collection("users").document(uid).set(
+    await cache.set(
+        repo.user_doc(uid),
         {"pet_settings": updated_pet_settings},
         merge=True,
     )
+    settings_cache.invalidate(uid, "pet_settings")
 
     return {
         "ok": True,
@@ -862,7 +834,7 @@ def switch_pet(payload: dict, user: dict = Depends(require_user)):
 
 
 @router.put("/pet-name")
-def update_pet_name(payload: dict, user: dict = Depends(require_user)):
+async def update_pet_name(payload: dict, user: dict = Depends(require_user)):
     """Update user's pet name"""
     uid = user["uid"]
     pet_name = payload.get("pet_name")
@@ -878,10 +850,11 @@ def update_pet_name(payload: dict, user: dict = Depends(require_user)):
         return {"ok": False, "message": "Pet name must be 20 characters or less"}
 
     # Update user's pet settings
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"pet_settings": {"pet_name": pet_name.strip()}},
         merge=True,
     )
+    settings_cache.invalidate(uid, "pet_settings")
 
     return {
         "ok": True,
@@ -890,31 +863,23 @@ def update_pet_name(payload: dict, user: dict = Depends(require_user)):
     }
 
 
-def calculate_daily_deterioration(last_updated, current_time):
-    """Calculate how much stats should deteriorate based on days passed"""
-    if not last_updated:
-        return 0
-
-    # Calculate days passed
-    time_diff = current_time - last_updated
-    days_passed = time_diff.total_seconds() / (24 * 60 * 60)
-
-    # Deteriorate 15 points per day (requires feeding daily)
-    deterioration = int(days_passed * 15)
-
-    return deterioration
-
-
 @router.get("/pet-status")
-def get_pet_status(user: dict = Depends(require_user)):
-    """Get pet status with automatic daily deterioration"""
+async def get_pet_status(
+    user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
+    """Get pet status with automatic daily deterioration
+
+    Deterioration is computed on the fly here and persisted by the daily
+    ``pet_decay`` scheduler job, so reading the status never writes.
+    """
     uid = user["uid"]
-    doc_snapshot = db.collection("users").document(uid).get()
+    doc_snapshot = await cache.get(repo.user_doc(uid))
 
     if not doc_snapshot.exists:
         # Initialize with default status
         now = datetime.now(timezone.utc)
-        db.collection("users").document(uid).set(
+        await cache.set(
+            repo.user_doc(uid),
             {"pet_status": {**DEFAULT_PET_STATUS, "last_updated": now}},
             merge=True,
         )
@@ -925,71 +890,11 @@ def get_pet_status(user: dict = Depends(require_user)):
 
     # Apply daily deterioration
     now = datetime.now(timezone.utc)
-    last_updated = pet_status.get("last_updated")
-
-    # Check if soju counter needs to be reset (new day)
-    soju_last_reset = pet_status.get("soju_last_reset")
-    today_date = now.date()
-    needs_soju_reset = False
-
-    if soju_last_reset:
-        last_reset_date = (
-            soju_last_reset.date()
-            if hasattr(soju_last_reset, "date")
-            else datetime.fromisoformat(str(soju_last_reset)).date()
-        )
-        if last_reset_date < today_date:
-            needs_soju_reset = True
-    else:
-        needs_soju_reset = True
-
-    if last_updated and not pet_status.get("is_dead", False):
-        deterioration = calculate_daily_deterioration(last_updated, now)
-
-        if deterioration > 0 or needs_soju_reset:
-            # Apply deterioration
-            new_happiness = max(0, pet_status.get("happiness", 100) - deterioration)
-            new_health = max(0, pet_status.get("health", 100) - deterioration)
-
-            # Check if pet died
-            is_dead = new_happiness == 0 or new_health == 0
-
-            # Update database with new values
-            updated_status = {
-                "happiness": new_happiness,
-                "health": new_health,
-                "last_updated": now,
-                "is_dead": is_dead,
-                "soju_count": 0
-                if needs_soju_reset
-                else pet_status.get("soju_count", 0),
-                "soju_last_reset": now
-                if needs_soju_reset
-                else pet_status.get("soju_last_reset"),
-            }
-
-            db.collection("users").document(uid).set(
-                {"pet_status": updated_status},
-                merge=True,
-            )
-
-            return updated_status
-    elif needs_soju_reset:
-        # Reset soju counter even if no deterioration
-        updated_status = {**pet_status, "soju_count": 0, "soju_last_reset": now}
-
-        db.collection("users").document(uid).set(
-            {"pet_status": updated_status},
-            merge=True,
-        )
-
-        return updated_status
-
-    return pet_status
+    return decay_pet_status(pet_status, now) or pet_status
 
 
 @router.put("/pet-status")
-def update_pet_status(payload: dict, user: dict = Depends(require_user)):
+async def update_pet_status(payload: dict, user: dict = Depends(require_user)):
     """Update pet status (happiness/health/soju_count)"""
     uid = user["uid"]
     happiness = payload.get("happiness")
@@ -1022,7 +927,7 @@ def update_pet_status(payload: dict, user: dict = Depends(require_user)):
         updated_status["soju_count"] = int(soju_count)
         updated_status["soju_last_reset"] = now
 
-    db.collection("users").document(uid).set(
+    await repo.user_doc(uid).set(
         {"pet_status": updated_status},
         merge=True,
     )
@@ -1,13 +1,19 @@
+import base64
 from datetime import datetime, timezone, timedelta ,time
-from collections import defaultdict
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from google.cloud import firestore
 from pydantic import BaseModel, Field
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ..deps.doc_cache import get_doc_cache
+from ...core.doc_cache import RequestDocCache
+from ...core import repository as repo
+from ...core import daily_metrics, study_stats
+from ...core.session_buffer import session_buffer
+from ...core.settings_cache import BACKGROUNDS, settings_cache
 
 router = APIRouter(prefix="/study-sessions", tags=["study-sessions"])
 
@@ -94,6 +100,7 @@ class StudyStatsResponse(BaseModel):
     sessions_started_today: int = 0
     sessions_completed_today: int = 0
     study_streak: int = 0
+    longest_study_streak: int = 0
     daily_hours_past_week: List[DailyHours] = []
     subject_hours_past_week: List[SubjectHours] = []
 
@@ -106,23 +113,14 @@ class DailySessionMetrics(BaseModel):
     total_resets: int
 
 
-def _study_sessions_collection(uid: str):
-    """Get reference to user's study sessions collection"""
-    return db.collection("users").document(uid).collection("studySessions")
-
-
-def _daily_metrics_collection(uid: str):
-    """Get reference to user's daily metrics collection"""
-    return db.collection("users").document(uid).collection("dailyMetrics")
-
-def _add_study_time_to_task(uid: str, task_id: str, minutes: int):
+async def _add_study_time_to_task(uid: str, task_id: str, minutes: int):
     """Add study time to a task"""
     from google.cloud.firestore import Increment
-    task_ref = db.collection("users").document(uid).collection("tasks").document(task_id)
-    task_doc = task_ref.get()
+    task_ref = repo.tasks_collection(uid).document(task_id)
+    task_doc = await task_ref.get()
     
     if task_doc.exists:
-        task_ref.update({
+        await task_ref.update({
             "totalStudyMinutes": Increment(minutes),
             "updatedAt": datetime.now(timezone.utc)
         })
@@ -151,10 +149,6 @@ class SubjectResponse(BaseModel):
     updated_at: str
 
 
-def _subjects_collection(uid: str):
-    """Get reference to user's subjects collection"""
-    return db.collection("users").document(uid).collection("subjects")
-
 class RecurringTopicCreate(BaseModel):
     subject_id: Optional[str] = Field(None, description="ID of the parent subject (optional)")
     title: str = Field(..., min_length=1, max_length=200, description="Topic title")
@@ -179,11 +173,6 @@ class RecurringTopicResponse(BaseModel):
     updated_at: str
 
 
-def _recurring_topics_collection(uid: str):
-    """Get reference to user's recurring topics collection"""
-    return db.collection("users").document(uid).collection("recurringTopics")
-
-
 # ============================================================================
 # BACKGROUND PREFERENCE ENDPOINTS (UPDATED SECTION)
 # ============================================================================
@@ -199,41 +188,44 @@ SUCCESS_RESPONSE = {"ok": True, "message": "Operation completed successfully"} #
 def _background_doc_ref(uid: str):
     """Get reference to user's dedicated background settings document 
        in the userSettings subcollection."""
-    return db.collection("users").document(uid).collection("userSettings").document("backgrounds")
+    return repo.user_settings_doc(uid, "backgrounds")
 
 
 @router.get("/backgrounds", response_model=BackgroundResponse) # <-- FIX: Removed /preferences/
-def get_background_preference(user: dict = Depends(require_user)):
+async def get_background_preference(user: dict = Depends(require_user)):
     """Get the user's saved background ID"""
     uid = user["uid"]
-    doc_snapshot = _background_doc_ref(uid).get()
-    
-    if doc_snapshot.exists:
-        stored_id = doc_snapshot.to_dict().get("background_id", "none")
-        return BackgroundResponse(background_id=stored_id)
-    
-    # Return default if document does not exist
-    return BackgroundResponse(background_id="none")
+
+    async def load():
+        doc_snapshot = await _background_doc_ref(uid).get()
+        if doc_snapshot.exists:
+            return doc_snapshot.to_dict().get("background_id", "none")
+        # Default if document does not exist
+        return "none"
+
+    stored_id = await settings_cache.get_or_load(uid, BACKGROUNDS, load)
+    return BackgroundResponse(background_id=stored_id)
 
 
 @router.put("/backgrounds", response_model=Dict[str, Any]) # <-- FIX: Removed /preferences/
-def update_background_preference(
+async def update_background_preference(
     payload: BackgroundPreference, user: dict = Depends(require_user)
 ):
     """Update the user's background ID"""
     uid = user["uid"]
     
     # Save the new background_id into the dedicated document
-    _background_doc_ref(uid).set(
+    await _background_doc_ref(uid).set(
         {"background_id": payload.background_id},
         merge=True,
     )
+    settings_cache.invalidate(uid, BACKGROUNDS)
     
     return SUCCESS_RESPONSE
 
 
 @router.post("/subjects", response_model=SubjectResponse, status_code=201)
-def create_subject(
+async def create_subject(
     payload: SubjectCreate,
     user: dict = Depends(require_user)
 ):
@@ -247,10 +239,10 @@ def create_subject(
         "updated_at": now,
     }
     
-    doc_ref = _subjects_collection(uid).document()
-    doc_ref.set(subject_data)
+    doc_ref = repo.subjects_collection(uid).document()
+    await doc_ref.set(subject_data)
     
-    created_doc = doc_ref.get()
+    created_doc = await doc_ref.get()
     subject_dict = created_doc.to_dict()
     subject_dict["id"] = doc_ref.id
     subject_dict["created_at"] = subject_dict["created_at"].isoformat()
@@ -260,11 +252,11 @@ def create_subject(
 
 
 @router.get("/subjects", response_model=List[SubjectResponse])
-def list_subjects(user: dict = Depends(require_user)):
+async def list_subjects(user: dict = Depends(require_user)):
     """Get all subjects"""
     uid = user["uid"]
     
-    subjects = _subjects_collection(uid).stream()
+    subjects = await repo.stream(repo.subjects_collection(uid))
     
     result = []
     for subject in subjects:
@@ -283,15 +275,15 @@ def list_subjects(user: dict = Depends(require_user)):
 
 
 @router.get("/subjects/{subject_id}", response_model=SubjectResponse)
-def get_subject(
+async def get_subject(
     subject_id: str,
     user: dict = Depends(require_user)
 ):
     """Get a specific subject"""
     uid = user["uid"]
     
-    subject_ref = _subjects_collection(uid).document(subject_id)
-    subject_doc = subject_ref.get()
+    subject_ref = repo.subjects_collection(uid).document(subject_id)
+    subject_doc = await subject_ref.get()
     
     if not subject_doc.exists:
         raise HTTPException(status_code=404, detail="Subject not found")
@@ -305,7 +297,7 @@ def get_subject(
 
 
 @router.patch("/subjects/{subject_id}", response_model=SubjectResponse)
-def update_subject(
+async def update_subject(
     subject_id: str,
     payload: SubjectUpdate,
     user: dict = Depends(require_user)
@@ -313,8 +305,8 @@ def update_subject(
     """Update a subject"""
     uid = user["uid"]
     
-    subject_ref = _subjects_collection(uid).document(subject_id)
-    subject_doc = subject_ref.get()
+    subject_ref = repo.subjects_collection(uid).document(subject_id)
+    subject_doc = await subject_ref.get()
     
     if not subject_doc.exists:
         raise HTTPException(status_code=404, detail="Subject not found")
@@ -329,9 +321,9 @@ def update_subject(
         return SubjectResponse(**subject_data)
     
     update_data["updated_at"] = datetime.now(timezone.utc)
-    subject_ref.update(update_data)
+    await subject_ref.update(update_data)
     
-    updated_doc = subject_ref.get()
+    updated_doc = await subject_ref.get()
     subject_data = updated_doc.to_dict()
     subject_data["id"] = subject_id
     subject_data["created_at"] = subject_data["created_at"].isoformat()
@@ -341,20 +333,20 @@ def update_subject(
 
 
 @router.delete("/subjects/{subject_id}")
-def delete_subject(
+async def delete_subject(
     subject_id: str,
     user: dict = Depends(require_user)
 ):
     """Delete a subject"""
     uid = user["uid"]
     
-    subject_ref = _subjects_collection(uid).document(subject_id)
-    subject_doc = subject_ref.get()
+    subject_ref = repo.subjects_collection(uid).document(subject_id)
+    subject_doc = await subject_ref.get()
     
     if not subject_doc.exists:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    subject_ref.delete()
+    await subject_ref.delete()
     return {"message": "Subject deleted successfully"}
 
 
@@ -364,7 +356,7 @@ def delete_subject(
 
 
 @router.post("/recurring-topics", response_model=RecurringTopicResponse, status_code=201)
-def create_recurring_topic(
+async def create_recurring_topic(
     payload: RecurringTopicCreate,
     user: dict = Depends(require_user)
 ):
@@ -373,8 +365,8 @@ def create_recurring_topic(
     
     # Verify subject exists if provided
     if payload.subject_id:
-        subject_ref = _subjects_collection(uid).document(payload.subject_id)
-        if not subject_ref.get().exists:
+        subject_ref = repo.subjects_collection(uid).document(payload.subject_id)
+        if not (await subject_ref.get()).exists:
             raise HTTPException(status_code=404, detail="Subject not found")
     
     now = datetime.now(timezone.utc)
@@ -384,10 +376,10 @@ def create_recurring_topic(
         "updated_at": now,
     }
     
-    doc_ref = _recurring_topics_collection(uid).document()
-    doc_ref.set(topic_data)
+    doc_ref = repo.recurring_topics_collection(uid).document()
+    await doc_ref.set(topic_data)
     
-    created_doc = doc_ref.get()
+    created_doc = await doc_ref.get()
     topic_dict = created_doc.to_dict()
     topic_dict["id"] = doc_ref.id
     topic_dict["created_at"] = topic_dict["created_at"].isoformat()
@@ -397,19 +389,19 @@ def create_recurring_topic(
 
 
 @router.get("/recurring-topics", response_model=List[RecurringTopicResponse])
-def list_recurring_topics(
+async def list_recurring_topics(
     subject_id: Optional[str] = None,
     user: dict = Depends(require_user)
 ):
     """Get all recurring topics, optionally filtered by subject"""
     uid = user["uid"]
     
-    topics_ref = _recurring_topics_collection(uid)
+    topics_ref = repo.recurring_topics_collection(uid)
     
     if subject_id:
-        topics = topics_ref.where("subject_id", "==", subject_id).stream()
+        topics = await repo.stream(topics_ref.where("subject_id", "==", subject_id))
     else:
-        topics = topics_ref.stream()
+        topics = await repo.stream(topics_ref)
     
     result = []
     for topic in topics:
@@ -423,7 +415,7 @@ def list_recurring_topics(
 
 
 @router.patch("/recurring-topics/{topic_id}", response_model=RecurringTopicResponse)
-def update_recurring_topic(
+async def update_recurring_topic(
     topic_id: str,
     payload: RecurringTopicUpdate,
     user: dict = Depends(require_user)
@@ -431,8 +423,8 @@ def update_recurring_topic(
     """Update a recurring topic"""
     uid = user["uid"]
     
-    topic_ref = _recurring_topics_collection(uid).document(topic_id)
-    topic_doc = topic_ref.get()
+    topic_ref = repo.recurring_topics_collection(uid).document(topic_id)
+    topic_doc = await topic_ref.get()
     
     if not topic_doc.exists:
         raise HTTPException(status_code=404, detail="Recurring topic not found")
@@ -446,9 +438,9 @@ def update_recurring_topic(
         return RecurringTopicResponse(**topic_data)
     
     update_data["updated_at"] = datetime.now(timezone.utc)
-    topic_ref.update(update_data)
+    await topic_ref.update(update_data)
     
-    updated_doc = topic_ref.get()
+    updated_doc = await topic_ref.get()
     topic_data = updated_doc.to_dict()
     topic_data["id"] = topic_id
     topic_data["created_at"] = topic_data["created_at"].isoformat()
@@ -458,20 +450,20 @@ def update_recurring_topic(
 
 
 @router.delete("/recurring-topics/{topic_id}")
-def delete_recurring_topic(
+async def delete_recurring_topic(
     topic_id: str,
     user: dict = Depends(require_user)
 ):
     """Delete a recurring topic"""
     uid = user["uid"]
     
-    topic_ref = _recurring_topics_collection(uid).document(topic_id)
-    topic_doc = topic_ref.get()
+    topic_ref = repo.recurring_topics_collection(uid).document(topic_id)
+    topic_doc = await topic_ref.get()
     
     if not topic_doc.exists:
         raise HTTPException(status_code=404, detail="Recurring topic not found")
     
-    topic_ref.delete()
+    await topic_ref.delete()
     return {"message": "Recurring topic deleted successfully"}
 
 # ============================================================================
@@ -479,7 +471,7 @@ def delete_recurring_topic(
 # ============================================================================
 
 @router.post("/start", response_model=StudySessionResponse)
-def start_study_session(
+async def start_study_session(
     payload: StudySessionStart, user: dict = Depends(require_user)
 ):
     """Start a new study session with initial state"""
@@ -512,16 +504,14 @@ def start_study_session(
         "total_paused_duration_minutes": 0.0,
     }
     
-    doc_ref = _study_sessions_collection(uid).add(session_data)
-    session_id = doc_ref[1].id
-
-    
-    # Update daily metrics - increment sessions_started
-    _update_daily_metrics(uid, today, sessions_started_increment=1)
+    session_ref = repo.study_sessions_collection(uid).document()
+    session_id = session_ref.id
+    # Count the start in today's daily metrics along with the session write
+    _, session_dict = await study_stats.write_session(
+        uid, session_ref, lambda _: session_data, lambda before, after: {"sessions_started": 1}
+    )
+    session_buffer.remember(uid, session_id, session_dict)
     
-    # Get the created document to return
-    created_doc = doc_ref[1].get()
-    session_dict = created_doc.to_dict()
     session_dict["id"] = session_id
     session_dict["started_at"] = session_dict["started_at"].isoformat()
     session_dict["created_at"] = session_dict["created_at"].isoformat()
@@ -531,7 +521,7 @@ def start_study_session(
 
 
 @router.patch("/{session_id}", response_model=StudySessionResponse)
-def update_study_session(
+async def update_study_session(
     session_id: str,
     payload: StudySessionUpdate,
     user: dict = Depends(require_user)
@@ -539,25 +529,64 @@ def update_study_session(
     """Update a study session (pause, resume, complete, or update details)"""
     uid = user["uid"]
     
-    session_ref = _study_sessions_collection(uid).document(session_id)
-    session_doc = session_ref.get()
-    
-    if not session_doc.exists:
-        raise HTTPException(status_code=404, detail="Study session not found")
-    
-    session_data = session_doc.to_dict()
-    update_data = payload.model_dump(exclude_unset=True)
+    session_ref = repo.study_sessions_collection(uid).document(session_id)
+    payload_data = payload.model_dump(exclude_unset=True)
     
-    if not update_data:
+    if not payload_data:
         # No fields to update
+        session_data = await repo.get_dict(session_ref)
+        if session_data is None:
+            raise HTTPException(status_code=404, detail="Study session not found")
         session_data["id"] = session_id
         return _format_session_response(session_data, session_id)
     
+    # Timer ticks of a running session are held in memory until the next
+    # transition or checkpoint (see core/session_buffer.py)
+    buffered = session_buffer.update(uid, session_id, payload_data)
+    if buffered is not None:
+        return _format_session_response(buffered, session_id)
+    
     now = datetime.now(timezone.utc)
-    today = now.strftime("%Y-%m-%d")
-    update_data["updated_at"] = now
+    status = payload_data.get("status")
+    pending = session_buffer.take(uid, session_id)
+    
+    def _build_update(session_data):
+        if session_data is None:
+            raise HTTPException(status_code=404, detail="Study session not found")
+        update_data = {**pending, **payload_data, "updated_at": now}
+        _apply_status_change(session_data, update_data, now)
+        return update_data
+    
+    def _events(before, after):
+        # Count a pause or completion once, when the status actually changes
+        if status == "paused" and before.get("status") != "paused":
+            return {"total_pauses": 1}
+        if status == "completed" and before.get("status") != "completed":
+            return {"sessions_completed": 1}
+        return {}
+    
+    try:
+        session_data, updated_data = await study_stats.write_session(uid, session_ref, _build_update, _events)
+    except Exception:
+        # Keep the buffered timer fields for the next write or checkpoint
+        session_buffer.restore(uid, session_id, pending)
+        raise
+    session_buffer.remember(uid, session_id, updated_data)
+    
+    # If session completed and has task_id, update task's total study time
+    if status == "completed" and session_data.get("task_id"):
+        try:
+            task_id = session_data["task_id"]
+            duration = payload_data.get("actual_duration_minutes") or session_data.get("planned_duration_minutes", 0)
+            await _add_study_time_to_task(uid, task_id, duration)
+        except Exception as e:
+            print(f"Error updating task study time: {e}")
     
-    # Handle status changes with tracking
+    return _format_session_response(updated_data, session_id)
+
+
+def _apply_status_change(session_data: dict, update_data: dict, now: datetime):
+    """Add the pause/resume/complete tracking fields for a status change to update_data"""
     if "status" in update_data:
         status = update_data["status"]
         current_status = session_data.get("status")
@@ -568,15 +597,9 @@ def update_study_session(
             update_data["pause_count"] = current_pause_count + 1
             update_data["paused_at"] = now
             
-            # Update daily metrics
-            _update_daily_metrics(uid, today, pauses_increment=1)
-            
         elif status == "completed":
             update_data["completed_at"] = now
             
-            # Update daily metrics - increment sessions completed
-            _update_daily_metrics(uid, today, sessions_completed_increment=1)
-            
         elif status == "active":
             # Resuming from pause - calculate pause duration and add to total
             if current_status == "paused":
@@ -600,70 +623,49 @@ def update_study_session(
                     update_data["total_paused_duration_minutes"] = current_paused_duration + pause_duration_minutes
                 
                 update_data["paused_at"] = None
-    
-    # If session completed and has task_id, update task's total study time
-    if update_data.get("status") == "completed" and session_data.get("task_id"):
-        try:
-            task_id = session_data["task_id"]
-            duration = update_data.get("actual_duration_minutes") or session_data.get("planned_duration_minutes", 0)
-            _add_study_time_to_task(uid, task_id, duration)
-        except Exception as e:
-            print(f"Error updating task study time: {e}")
-    
-    session_ref.update(update_data)
-    
-    # Get updated document
-    updated_doc = session_ref.get()
-    session_data = updated_doc.to_dict()
-    session_data["id"] = session_id
-    
-    return _format_session_response(session_data, session_id)
 
 
 @router.post("/{session_id}/reset", response_model=StudySessionResponse)
-def reset_study_session(
+async def reset_study_session(
     session_id: str,
     user: dict = Depends(require_user)
 ):
     """Reset a study session (track reset count)"""
     uid = user["uid"]
     
-    session_ref = _study_sessions_collection(uid).document(session_id)
-    session_doc = session_ref.get()
-    
-    if not session_doc.exists:
-        raise HTTPException(status_code=404, detail="Study session not found")
-    
-    session_data = session_doc.to_dict()
+    session_ref = repo.study_sessions_collection(uid).document(session_id)
     now = datetime.now(timezone.utc)
-    today = now.strftime("%Y-%m-%d")
-    
-    # Increment reset count
-    current_reset_count = session_data.get("reset_count", 0)
-    
-    update_data = {
-        "reset_count": current_reset_count + 1,
-        "status": "active",  # Reset puts it back to active
-        "time_remaining_seconds": session_data.get("planned_duration_minutes", 25) * 60,
-        "paused_at": None,
-        "updated_at": now,
-    }
-    
-    session_ref.update(update_data)
+    # The reset replaces any buffered timer state
+    pending = session_buffer.take(uid, session_id)
+    
+    def _build_update(session_data):
+        if session_data is None:
+            raise HTTPException(status_code=404, detail="Study session not found")
+        return {
+            # Increment reset count
+            "reset_count": session_data.get("reset_count", 0) + 1,
+            "status": "active",  # Reset puts it back to active
+            "time_remaining_seconds": session_data.get("planned_duration_minutes", 25) * 60,
+            "paused_at": None,
+            "updated_at": now,
+        }
     
-    # Update daily metrics
-    _update_daily_metrics(uid, today, resets_increment=1)
+    try:
+        _, session_data = await study_stats.write_session(
+            uid, session_ref, _build_update, lambda before, after: {"total_resets": 1}
+        )
+    except Exception:
+        session_buffer.restore(uid, session_id, pending)
+        raise
+    session_buffer.remember(uid, session_id, session_data)
     
-    # Get updated document
-    updated_doc = session_ref.get()
-    session_data = updated_doc.to_dict()
     session_data["id"] = session_id
     
     return _format_session_response(session_data, session_id)
 
 
 @router.post("/", response_model=StudySessionResponse)
-def create_study_session(
+async def create_study_session(
     payload: StudySessionCreate, user: dict = Depends(require_user)
 ):
     """Create a completed study session record (legacy endpoint for backward compatibility)"""
@@ -695,65 +697,24 @@ def create_study_session(
         "total_paused_duration_minutes": 0.0,
     }
     
-    doc_ref = _study_sessions_collection(uid).add(session_data)
-    session_id = doc_ref[1].id
-    
-    # Update daily metrics
-    _update_daily_metrics(uid, today, sessions_started_increment=1, sessions_completed_increment=1)
+    session_ref = repo.study_sessions_collection(uid).document()
+    session_id = session_ref.id
+    _, session_dict = await study_stats.write_session(
+        uid,
+        session_ref,
+        lambda _: session_data,
+        lambda before, after: {"sessions_started": 1, "sessions_completed": 1},
+    )
     
-    # Get the created document to return
-    created_doc = doc_ref[1].get()
-    session_dict = created_doc.to_dict()
     session_dict["id"] = session_id
     
     return _format_session_response(session_dict, session_id)
 
 
-def _update_daily_metrics(
-    uid: str,
-    date: str,
-    sessions_started_increment: int = 0,
-    sessions_completed_increment: int = 0,
-    pauses_increment: int = 0,
-    resets_increment: int = 0
-):
-    """Update daily metrics in Firestore"""
-    metrics_ref = _daily_metrics_collection(uid).document(date)
-    
-    # Use transaction to ensure atomic updates
-    try:
-        metrics_doc = metrics_ref.get()
-        
-        if metrics_doc.exists:
-            current_data = metrics_doc.to_dict()
-            update_data = {
-                "sessions_started": current_data.get("sessions_started", 0) + sessions_started_increment,
-                "sessions_completed": current_data.get("sessions_completed", 0) + sessions_completed_increment,
-                "total_pauses": current_data.get("total_pauses", 0) + pauses_increment,
-                "total_resets": current_data.get("total_resets", 0) + resets_increment,
-                "updated_at": datetime.now(timezone.utc),
-            }
-            metrics_ref.update(update_data)
-        else:
-            # Create new metrics document
-            metrics_ref.set({
-                "date": date,
-                "sessions_started": sessions_started_increment,
-                "sessions_completed": sessions_completed_increment,
-                "total_pauses": pauses_increment,
-                "total_resets": resets_increment,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            })
-    except Exception as e:
-        # Log error but don't fail the request
-        print(f"Error updating daily metrics: {e}")
-
-
-def _get_daily_metrics(uid: str, date: str) -> DailySessionMetrics:
+async def _get_daily_metrics(uid: str, date: str) -> DailySessionMetrics:
     """Helper function to get daily metrics without dependency injection"""
-    metrics_ref = _daily_metrics_collection(uid).document(date)
-    metrics_doc = metrics_ref.get()
+    metrics_ref = repo.daily_metrics_collection(uid).document(date)
+    metrics_doc = await metrics_ref.get()
     
     if not metrics_doc.exists:
         # Return empty metrics
@@ -776,7 +737,7 @@ def _get_daily_metrics(uid: str, date: str) -> DailySessionMetrics:
 
 
 @router.get("/metrics/daily", response_model=DailySessionMetrics)
-def get_daily_metrics(
+async def get_daily_metrics(
     date: Optional[str] = None,
     user: dict = Depends(require_user)
 ):
@@ -786,8 +747,8 @@ def get_daily_metrics(
     if date is None:
         date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    metrics_ref = _daily_metrics_collection(uid).document(date)
-    metrics_doc = metrics_ref.get()
+    metrics_ref = repo.daily_metrics_collection(uid).document(date)
+    metrics_doc = await metrics_ref.get()
     
     if not metrics_doc.exists:
         # Return empty metrics
@@ -831,19 +792,19 @@ class TimerStatsResponse(BaseModel):
 
 
 @router.get("/today-summary", response_model=TodaySummaryResponse)
-def get_today_summary(user: dict = Depends(require_user)):
+async def get_today_summary(user: dict = Depends(require_user)):
     """Return today's total completed study minutes and session counts."""
     uid = user["uid"]
     now = datetime.now(timezone.utc)
     today = now.strftime("%Y-%m-%d")
 
     # Sum durations for today's completed sessions
-    sessions_ref = _study_sessions_collection(uid)
+    sessions_ref = repo.study_sessions_collection(uid)
     query = sessions_ref.where("date", "==", today)
 
     total_minutes = 0
     completed_count = 0
-    for doc in query.stream():
+    for doc in await repo.stream(query):
         data = doc.to_dict() or {}
         status = data.get("status")
         minutes = data.get("actual_duration_minutes") or 0
@@ -852,7 +813,7 @@ def get_today_summary(user: dict = Depends(require_user)):
             completed_count += 1
 
     # Get sessions_started from daily metrics
-    metrics = _get_daily_metrics(uid, today)
+    metrics = await _get_daily_metrics(uid, today)
 
     return TodaySummaryResponse(
         date=today,
@@ -863,184 +824,69 @@ def get_today_summary(user: dict = Depends(require_user)):
 
 
 @router.get("/timer-stats", response_model=TimerStatsResponse)
-def get_timer_stats(user: dict = Depends(require_user)):
+async def get_timer_stats(user: dict = Depends(require_user)):
     """Get comprehensive stats for the timer page - today's session statistics
     
-    Calculates:
+    Reads today's ``dailyMetrics`` rollup, which holds:
     - Total minutes of all sessions started today (planned durations)
-    - Total paused minutes (from completed and paused sessions)
+    - Total paused minutes, to which the running pauses are added here
     - Focus score: 100% - (paused_minutes / started_minutes * 100%)
     """
     uid = user["uid"]
     now = datetime.now(timezone.utc)
     today = now.strftime("%Y-%m-%d")
     
-    # Query today's sessions
-    sessions_ref = _study_sessions_collection(uid)
-    sessions_query = sessions_ref.where("date", "==", today)
-    
-    # Initialize counters
-    total_study_minutes = 0  # From completed sessions only
-    total_started_minutes = 0  # Sum of all planned durations
-    total_paused_minutes = 0  # Cumulative paused time
-    completed_count = 0
-    paused_count = 0
-    
-    # Process each session
-    print(f"DEBUG: Processing sessions for date: {today}")
-    for doc in sessions_query.stream():
-        data = doc.to_dict() or {}
-        status = data.get("status")
-        planned_minutes = data.get("planned_duration_minutes", 0)
-        actual_minutes = data.get("actual_duration_minutes")
-        total_paused_duration = data.get("total_paused_duration_minutes", 0.0)
-        paused_at = data.get("paused_at")
-        session_id = doc.id
-        
-        # Sum all planned durations for sessions started today
-        if isinstance(planned_minutes, (int, float)) and planned_minutes > 0:
-            total_started_minutes += planned_minutes  # Use float instead of int for precision
-            print(f"DEBUG: Session {session_id[:8]}...: status={status}, planned={planned_minutes} min ({planned_minutes*60:.0f} sec), adding to total_started")
-        
-        # Process based on status
-        if status == "completed":
-            # Count completed sessions and their actual study time
-            if isinstance(actual_minutes, (int, float)) and actual_minutes > 0:
-                total_study_minutes += int(actual_minutes)
-            completed_count += 1
-            
-            # Use tracked paused duration for completed sessions
-            # Cap to planned duration to prevent unrealistic values
-            paused_duration_to_use = total_paused_duration if isinstance(total_paused_duration, (int, float)) else 0.0
-            if isinstance(planned_minutes, (int, float)) and planned_minutes > 0:
-                original_paused = paused_duration_to_use
-                paused_duration_to_use = min(paused_duration_to_use, float(planned_minutes))
-                if original_paused > planned_minutes:
-                    print(f"DEBUG: Capped paused time for completed session {session_id[:8]}...: {original_paused:.2f} -> {paused_duration_to_use:.2f} (planned: {planned_minutes})")
-            
-            total_paused_minutes += paused_duration_to_use
-            paused_sec = paused_duration_to_use * 60
-            print(f"DEBUG: Completed session {session_id[:8]}...: paused={paused_duration_to_use:.2f} min ({paused_sec:.1f} sec)")
-        
-        elif status == "paused":
-            paused_count += 1
-            
-            # For currently paused sessions: use tracked paused duration + current pause time
-            paused_duration_so_far = total_paused_duration if isinstance(total_paused_duration, (int, float)) else 0.0
-            
-            # Add current pause duration (from paused_at to now)
-            # But cap it at the planned duration to prevent unrealistic values from old paused sessions
-            current_pause_minutes = 0.0
-            if paused_at:
-                if isinstance(paused_at, datetime):
-                    current_pause_minutes = (now - paused_at).total_seconds() / 60
-                elif isinstance(paused_at, str):
-                    # Parse ISO format string
-                    try:
-                        paused_dt = datetime.fromisoformat(paused_at.replace('Z', '+00:00'))
-                        current_pause_minutes = (now - paused_dt).total_seconds() / 60
-                    except (ValueError, AttributeError):
-                        current_pause_minutes = 0.0
-            
-                # Cap current pause duration at planned duration to prevent unrealistic values
-                # (e.g., if session was paused days ago and never resumed)
-                original_current_pause = current_pause_minutes
-                if isinstance(planned_minutes, (int, float)) and planned_minutes > 0:
-                    current_pause_minutes = min(current_pause_minutes, float(planned_minutes))
-                    if original_current_pause > planned_minutes:
-                        print(f"DEBUG: Capped current pause time for session {session_id[:8]}...: {original_current_pause:.2f} -> {current_pause_minutes:.2f} (planned: {planned_minutes})")
-            
-            session_paused_total = paused_duration_so_far + current_pause_minutes
-            
-            # Cap total paused time to planned duration (logical limit: can't pause more than session length)
-            if isinstance(planned_minutes, (int, float)) and planned_minutes > 0:
-                original_total = session_paused_total
-                session_paused_total = min(session_paused_total, float(planned_minutes))
-                if original_total > planned_minutes:
-                    print(f"DEBUG: Capped total paused time for session {session_id[:8]}...: {original_total:.2f} -> {session_paused_total:.2f} (planned: {planned_minutes})")
-            
-            total_paused_minutes += session_paused_total
-            paused_sec_total = session_paused_total * 60
-            print(f"DEBUG: Paused session {session_id[:8]}...: planned={planned_minutes} min, paused={session_paused_total:.2f} min ({paused_sec_total:.1f} sec)")
-        
-        elif status == "active":
-            # Active sessions may have paused time if they were paused and resumed
-            # Include their tracked paused duration in the calculation
-            # Cap to planned duration to prevent unrealistic values
-            if isinstance(total_paused_duration, (int, float)) and total_paused_duration > 0:
-                paused_duration_to_use = total_paused_duration
-                if isinstance(planned_minutes, (int, float)) and planned_minutes > 0:
-                    original_paused = paused_duration_to_use
-                    paused_duration_to_use = min(paused_duration_to_use, float(planned_minutes))
-                    if original_paused > planned_minutes:
-                        print(f"DEBUG: Capped paused time for active session {session_id[:8]}...: {original_paused:.2f} -> {paused_duration_to_use:.2f} (planned: {planned_minutes})")
-                
-                total_paused_minutes += paused_duration_to_use
-                paused_sec = paused_duration_to_use * 60
-                print(f"DEBUG: Active session {session_id[:8]}...: paused={paused_duration_to_use:.2f} min ({paused_sec:.1f} sec)")
+    metrics = await daily_metrics.load_daily_metrics(uid, today)
     
-    # Get additional metrics from daily metrics
-    metrics = _get_daily_metrics(uid, today)
+    total_started_minutes = metrics.get("started_minutes", 0)
+    total_paused_minutes = metrics.get("paused_minutes", 0) + daily_metrics.running_pause_minutes(metrics, now)
+    total_study_minutes = int(metrics.get("completed_minutes", 0))
     
-    # Calculate focus score: (timer running seconds - paused seconds) / total session seconds * 100
-    # Formula: (total_started_minutes - total_paused_minutes) / total_started_minutes * 100
-    # If paused seconds >= total session seconds, focus score is 0
+    # Focus score: (total session seconds - paused seconds) / total session seconds * 100
+    # Seconds keep short sessions precise; paused >= started gives 0
     if total_started_minutes > 0:
-        # Convert to seconds for more precise calculation (especially for short sessions)
         total_started_seconds = float(total_started_minutes) * 60
         total_paused_seconds = float(total_paused_minutes) * 60
-        
-        # Debug logging (show both minutes and seconds)
-        print(f"DEBUG Focus Score Calculation:")
-        print(f"  total_started: {total_started_minutes} minutes ({total_started_seconds:.1f} seconds)")
-        print(f"  total_paused: {total_paused_minutes:.2f} minutes ({total_paused_seconds:.1f} seconds)")
-        print(f"  paused >= started: {total_paused_seconds >= total_started_seconds}")
-        
-        # Check if paused time exceeds or equals total session time
         if total_paused_seconds >= total_started_seconds:
             focus_score = 0.0
-            print(f"  Result: 0% (paused time >= total session time)")
         else:
-            # Calculate: (running time - paused time) / total session time * 100
-            # Use seconds for precision, especially important for short sessions
             running_seconds = total_started_seconds - total_paused_seconds
             focus_score = round((running_seconds / total_started_seconds) * 100, 1)
-            print(f"  running: {running_seconds:.1f} seconds ({running_seconds/60:.2f} minutes)")
-            print(f"  Result: {focus_score}%")
     else:
         focus_score = 100.0  # No sessions started, perfect focus!
-        print(f"DEBUG Focus Score: 100% (no sessions started)")
     
     # Calculate hours from minutes
     total_study_hours = round(total_study_minutes / 60, 2)
     
     return TimerStatsResponse(
         date=today,
-        sessions_completed=completed_count,
-        sessions_paused=paused_count,
-        total_pause_count=metrics.total_pauses,
+        sessions_completed=metrics.get("completed_count", 0),
+        sessions_paused=metrics.get("paused_count", 0),
+        total_pause_count=metrics.get("total_pauses", 0),
         total_study_minutes=total_study_minutes,
         total_study_hours=total_study_hours,
-        sessions_started=metrics.sessions_started,
-        total_started_minutes=total_started_minutes,
+        sessions_started=metrics.get("sessions_started", 0),
+        total_started_minutes=int(total_started_minutes),
         total_paused_minutes=int(total_paused_minutes),
         focus_score=focus_score,
     )
 
 
 @router.get("/current", response_model=Optional[StudySessionResponse])
-def get_current_session(user: dict = Depends(require_user)):
+async def get_current_session(user: dict = Depends(require_user)):
     """Get the current active or paused session if one exists"""
     uid = user["uid"]
     
     # Query for sessions with status 'active' or 'paused', ordered by started_at desc
-    sessions_ref = _study_sessions_collection(uid)
-    active_sessions = sessions_ref.where("status", "in", ["active", "paused"]).order_by(
-        "started_at", direction=firestore.Query.DESCENDING
-    ).limit(1).stream()
+    sessions_ref = repo.study_sessions_collection(uid)
+    active_sessions = await repo.stream(
+        sessions_ref.where("status", "in", ["active", "paused"])
+        .order_by("started_at", direction=firestore.Query.DESCENDING)
+        .limit(1)
+    )
     
     for session in active_sessions:
-        session_data = session.to_dict()
+        session_data = session_buffer.overlay(uid, session.id, session.to_dict())
         session_data["id"] = session.id
         return _format_session_response(session_data, session.id)
     
@@ -1084,17 +930,19 @@ def _format_session_response(session_data: dict, session_id: str) -> StudySessio
 
 @router.get("/stats", response_model=StudyStatsResponse)
 @router.get("/stats/summary", response_model=StudyStatsResponse)
-def get_study_stats(user: dict = Depends(require_user)):
+async def get_study_stats(
+    user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     try:
         uid = user["uid"]
         
-        LOCAL_TZ = timezone(timedelta(hours=8))
+        timezone_name, local_tz = await study_stats.user_timezone(uid)
         now_utc = datetime.now(timezone.utc)
-        now_local = now_utc.astimezone(LOCAL_TZ)
+        now_local = now_utc.astimezone(local_tz)
 
         today = now_local.strftime("%Y-%m-%d")
         
-        today_dt_local = datetime.combine(now_local.date(), time.min, tzinfo=LOCAL_TZ)
+        today_dt_local = datetime.combine(now_local.date(), time.min, tzinfo=local_tz)
         today_dt = today_dt_local.astimezone(timezone.utc)
 
         week_ago_dt = today_dt - timedelta(days=7) 
@@ -1103,87 +951,32 @@ def get_study_stats(user: dict = Depends(require_user)):
         month_ago_dt = today_dt - timedelta(days=30)
         month_ago = month_ago_dt.strftime("%Y-%m-%d")
         
-        sessions_ref = _study_sessions_collection(uid)
-        all_sessions = sessions_ref.stream()
+        stats = await study_stats.load_study_stats(uid, cache)
         
         start_date_local = today_dt_local - timedelta(days=6)
         daily_minutes = {
             (start_date_local + timedelta(days=i)).strftime("%Y-%m-%d"): 0 
             for i in range(7) 
         }
-        subject_minutes_past_week = defaultdict(int) 
-        completed_study_dates = set() 
+        for session_date, minutes in stats["daily_minutes"].items():
+            if session_date >= week_ago and session_date in daily_minutes:
+                daily_minutes[session_date] += minutes
         
-        total_minutes = 0
-        total_sessions = 0
-        completed_sessions = 0
-        paused_sessions = 0
-        active_sessions = 0
-        sessions_this_week = 0
-        sessions_this_month = 0
+        # Only sessions with a valid subject are bucketed (filters out Uncategorized/legacy data)
+        subject_minutes_past_week = study_stats.subject_minutes_since(stats, week_ago)
         
-        for session in all_sessions:
-            session_data = session.to_dict()
-            total_sessions += 1
-            
-            # Get actual_duration_minutes from all sessions for total study hours
-            actual_duration = session_data.get("actual_duration_minutes")
-            # Fall back to duration_minutes for legacy sessions that don't have actual_duration_minutes
-            if actual_duration is None:
-                actual_duration = session_data.get("duration_minutes", 0)
-            
-            # Sum actual_duration_minutes from ALL sessions for total study hours
-            if actual_duration is not None and isinstance(actual_duration, (int, float)) and actual_duration > 0:
-                total_minutes += actual_duration
-            
-            session_date = session_data.get("date", "").strip() if session_data.get("date") else ""
-            status = session_data.get("status")
-            
-            # Track completed sessions for streak and other metrics
-            if status == "completed" and actual_duration is not None and isinstance(actual_duration, (int, float)) and actual_duration > 0:
-                completed_sessions += 1
-                if session_date:
-                    completed_study_dates.add(session_date) 
-                if session_date >= week_ago: 
-                    if session_date in daily_minutes:
-                        daily_minutes[session_date] += actual_duration
-                        
-                    # Only count sessions with a valid subject (filter out Uncategorized/legacy data)
-                    subject = session_data.get("subject")
-                    if subject and subject.strip():  # Only add if subject exists and is not empty
-                        subject_minutes_past_week[subject] += actual_duration
-            elif status == "paused":
-                paused_sessions += 1
-            elif status == "active":
-                active_sessions += 1
-            
-            if session_date >= week_ago:
-                sessions_this_week += 1
-            if session_date >= month_ago:
-                sessions_this_month += 1
-
-        completed_dates_dt = set()
-
-        for d in completed_study_dates:
-            try:
-                # Handle datetime or string with time part like "2025-10-31T00:00:00Z"
-                normalized_date = datetime.strptime(str(d)[:10], "%Y-%m-%d").date()
-                completed_dates_dt.add(normalized_date)
-            except Exception as e:
-                print(f"DEBUG: Failed to parse study date '{d}': {e}")
-        # Initialize streak counter
-        study_streak = 0
-        today_date = now_local.date()
-        # If the user didn't study today, start from yesterday
-        current_date_dt = today_date
-        if today_date not in completed_dates_dt:
-            current_date_dt -= timedelta(days=1)
-
-        # Count backward as long as consecutive days exist
-        while current_date_dt in completed_dates_dt:
-            study_streak += 1
-            current_date_dt -= timedelta(days=1)
-        daily_metrics = _get_daily_metrics(uid, today) 
+        total_minutes = stats["total_minutes"]
+        total_sessions = stats["total_sessions"]
+        completed_sessions = stats["completed_sessions"]
+        paused_sessions = stats["paused_sessions"]
+        active_sessions = stats["active_sessions"]
+        sessions_this_week = int(study_stats.sum_since(stats["daily_sessions"], week_ago))
+        sessions_this_month = int(study_stats.sum_since(stats["daily_sessions"], month_ago))
+
+        # Kept up to date on the aggregate as sessions complete
+        streak = await study_stats.load_streak(uid, stats, timezone_name)
+        study_streak = study_stats.current_streak(streak, now_local.date())
+        metrics_today = await _get_daily_metrics(uid, today)
         
         daily_hours_list = [
             {"date": date, "hours": round(minutes / 60, 2)}
@@ -1206,12 +999,13 @@ def get_study_stats(user: dict = Depends(require_user)):
             paused_sessions=paused_sessions,
             active_sessions=active_sessions,
             study_streak=study_streak, 
+            longest_study_streak=streak.get("longest", 0),
             daily_hours_past_week=daily_hours_list, 
             subject_hours_past_week=subject_hours_list,
-            total_pauses_today=daily_metrics.total_pauses,
-            total_resets_today=daily_metrics.total_resets,
-            sessions_started_today=daily_metrics.sessions_started,
-            sessions_completed_today=daily_metrics.sessions_completed,
+            total_pauses_today=metrics_today.total_pauses,
+            total_resets_today=metrics_today.total_resets,
+            sessions_started_today=metrics_today.sessions_started,
+            sessions_completed_today=metrics_today.sessions_completed,
         )
     except Exception as e:
         print(f"ERROR in get_study_stats: {e}")
@@ -1220,34 +1014,120 @@ def get_study_stats(user: dict = Depends(require_user)):
         raise HTTPException(status_code=500, detail=f"Error calculating study stats: {str(e)}")
 
 
+# Fields the list needs in the summary view (everything but notes)
+SUMMARY_FIELDS = [
+    field for field in StudySessionResponse.model_fields if field not in ("id", "notes")
+]
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
+def _encode_cursor(snapshot) -> str:
+    """Opaque token holding the sort key of the last session on a page"""
+    started_at = snapshot.get("started_at")
+    key = [snapshot.get("date"), started_at.isoformat(), snapshot.id]
+    return base64.urlsafe_b64encode(orjson.dumps(key)).decode("ascii")
+
+
+def _decode_cursor(uid: str, cursor: str) -> Dict[str, Any]:
+    try:
+        date, started_at, session_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+        return {
+            "date": date,
+            "started_at": datetime.fromisoformat(started_at),
+            "__name__": repo.study_sessions_collection(uid).document(session_id),
+        }
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _date_bounds(
+    date: Optional[str], date_from: Optional[str], date_to: Optional[str],
+    year: Optional[int], month: Optional[int],
+) -> tuple:
+    """Combine the date filters into one inclusive range on the ``date`` field"""
+    if month is not None and year is None:
+        raise HTTPException(status_code=400, detail="month requires year")
+    lower, upper = [date_from], [date_to]
+    if date:
+        lower.append(date)
+        upper.append(date)
+    if year is not None and month is None:
+        lower.append(f"{year:04d}-01-01")
+        upper.append(f"{year:04d}-12-31")
+    elif year is not None:
+        # Dates are compared as strings, so -31 closes every month
+        lower.append(f"{year:04d}-{month:02d}-01")
+        upper.append(f"{year:04d}-{month:02d}-31")
+    lower = [value for value in lower if value]
+    upper = [value for value in upper if value]
+    return (max(lower) if lower else None), (min(upper) if upper else None)
+
+
 @router.get("/", response_model=List[StudySessionResponse])
-def list_study_sessions(
-    skip: int = 0,
-    limit: int = 50,
+async def list_study_sessions(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200, description="Page size"),
+    cursor: Optional[str] = Query(
+        default=None, description="X-Next-Cursor header of the previous page"
+    ),
+    skip: int = Query(
+        default=0, ge=0, deprecated=True,
+        description="Offset pagination; skipped sessions are still read, use cursor instead",
+    ),
     status: Optional[str] = None,
-    date: Optional[str] = None,
+    date: Optional[str] = Query(default=None, pattern=DATE_PATTERN),
+    date_from: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="First date, inclusive"),
+    date_to: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="Last date, inclusive"),
+    year: Optional[int] = Query(default=None, ge=1970, le=9999),
+    month: Optional[int] = Query(default=None, ge=1, le=12),
+    view: str = Query(
+        default="full", pattern="^(full|summary)$", description="summary leaves out notes"
+    ),
     user: dict = Depends(require_user)
 ):
-    """Get study sessions with optional filtering"""
+    """Get study sessions, newest first, with optional filtering
+
+    Pages are ``limit`` sessions long. When more remain, the response
+    carries an ``X-Next-Cursor`` header to send as ``cursor`` for the next
+    page, so each page reads only its own sessions.
+    """
     uid = user["uid"]
     
-    sessions_ref = _study_sessions_collection(uid)
-    query = sessions_ref
+    lower, upper = _date_bounds(date, date_from, date_to, year, month)
+    if lower and upper and lower > upper:
+        return []
+    
+    query = repo.study_sessions_collection(uid)
     
     if status:
         query = query.where("status", "==", status)
-    
-    if date:
-        query = query.where("date", "==", date)
-    
-    query = query.order_by("started_at", direction=firestore.Query.DESCENDING)
-    query = query.limit(limit).offset(skip)
-    
-    sessions = query.stream()
+    if lower:
+        query = query.where("date", ">=", lower)
+    if upper:
+        query = query.where("date", "<=", upper)
+    
+    # Indexed in firestore.indexes.json; the date orders first so it can be ranged on
+    query = (
+        query.order_by("date", direction=firestore.Query.DESCENDING)
+        .order_by("started_at", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
+    )
+    if view == "summary":
+        query = query.select(SUMMARY_FIELDS)
+    if cursor:
+        query = query.start_after(_decode_cursor(uid, cursor))
+    elif skip:
+        query = query.offset(skip)
+    # Fetch one extra session to know whether another page exists
+    sessions = await repo.stream(query.limit(limit + 1))
+    
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(sessions[-1])
     
     result = []
     for session in sessions:
-        session_data = session.to_dict()
+        session_data = session_buffer.overlay(uid, session.id, session.to_dict())
         session_data["id"] = session.id
         result.append(_format_session_response(session_data, session.id))
     
@@ -1255,57 +1135,58 @@ def list_study_sessions(
 
 
 @router.get("/{session_id}", response_model=StudySessionResponse)
-def get_study_session(
+async def get_study_session(
     session_id: str,
     user: dict = Depends(require_user)
 ):
     """Get a specific study session"""
     uid = user["uid"]
     
-    session_ref = _study_sessions_collection(uid).document(session_id)
-    session_doc = session_ref.get()
+    session_ref = repo.study_sessions_collection(uid).document(session_id)
+    session_doc = await session_ref.get()
     
     if not session_doc.exists:
         raise HTTPException(status_code=404, detail="Study session not found")
     
-    session_data = session_doc.to_dict()
+    session_data = session_buffer.overlay(uid, session_id, session_doc.to_dict())
     session_data["id"] = session_id
     
     return _format_session_response(session_data, session_id)
 
 
-@router.delete("/{session_id}")
-def delete_study_session(
-    session_id: str,
-    user: dict = Depends(require_user)
-):
-    """Delete a study session"""
+# Registered before /{session_id}, which would otherwise match "reset"
+@router.delete("/reset")
+async def reset_study_sessions(user: dict = Depends(require_user)):
+    """Reset all study sessions - delete all sessions for the authenticated user"""
     uid = user["uid"]
     
-    session_ref = _study_sessions_collection(uid).document(session_id)
-    session_doc = session_ref.get()
+    print(f"DEBUG: Resetting study sessions for user {uid}")
     
-    if not session_doc.exists:
-        raise HTTPException(status_code=404, detail="Study session not found")
+    # Delete all study sessions
+    session_count = await repo.delete_all(repo.study_sessions_collection(uid))
+    await study_stats.reset_study_stats(uid)
+    await daily_metrics.clear_rollups(uid)
+    session_buffer.forget(uid)
+    print(f"DEBUG: Deleted {session_count} study sessions")
     
-    session_ref.delete()
-    return {"message": "Study session deleted successfully"}
+    return {"message": f"All study sessions have been reset successfully. Deleted {session_count} session(s)."}
 
 
-@router.delete("/reset")
-def reset_study_sessions(user: dict = Depends(require_user)):
-    """Reset all study sessions - delete all sessions for the authenticated user"""
+@router.delete("/{session_id}")
+async def delete_study_session(
+    session_id: str,
+    user: dict = Depends(require_user)
+):
+    """Delete a study session"""
     uid = user["uid"]
     
-    print(f"DEBUG: Resetting study sessions for user {uid}")
+    session_ref = repo.study_sessions_collection(uid).document(session_id)
     
-    # Delete all study sessions
-    sessions_ref = _study_sessions_collection(uid)
-    sessions = sessions_ref.stream()
-    session_count = 0
-    for session in sessions:
-        session.reference.delete()
-        session_count += 1
-    print(f"DEBUG: Deleted {session_count} study sessions")
+    def _delete(session_data):
+        if session_data is None:
+            raise HTTPException(status_code=404, detail="Study session not found")
+        return None
     
-    return {"message": f"All study sessions have been reset successfully. Deleted {session_count} session(s)."}
\ No newline at end of file
+    await study_stats.write_session(uid, session_ref, _delete)
+    session_buffer.forget(uid, session_id)
+    return {"message": "Study session deleted successfully"}
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-from datetime import date, datetime, timezone, timedelta
+from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, Iterable, List, Literal, Optional, cast
 from collections import defaultdict
+import asyncio
 import traceback
 from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel, ConfigDict, Field
+from google.cloud import firestore
+from google.cloud.firestore import FieldFilter
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ...core import repository as repo
+from ...core import task_stats
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -16,12 +20,6 @@ StatusLiteral = Literal["todo", "inProgress", "done"]
 PriorityLiteral = Literal["high", "medium", "low"]
 
 
-def _tasks_collection(uid: str):
-    """Return the Firestore collection reference for a user's tasks."""
-
-    return db.collection("users").document(uid).collection("tasks")
-
-
 def _utc_now() -> datetime:
     """Get the current UTC timestamp."""
 
@@ -98,67 +96,57 @@ def _to_task_response(data: Dict[str, Any]) -> TaskResponse:
     return TaskResponse(**response_data)
 
 
-def _filter_tasks(
-    items: Iterable[Dict[str, Any]],
+def _active_tasks_query(
+    uid: str,
     status: StatusLiteral | None = None,
     priority: PriorityLiteral | None = None,
-) -> List[Dict[str, Any]]:
-    """Filter tasks by optional ``status`` and ``priority`` values."""
-    filtered = []
-    for item in items:
-        if status and item.get("status") != status:
-            continue
-        if priority and item.get("priority") != priority:
-            continue
-        filtered.append(item)
-    return filtered
+):
+    """Query non-archived tasks, optionally filtered by ``status`` and ``priority``."""
+    query = repo.tasks_collection(uid).where(filter=FieldFilter("deletedAt", "==", None))
+    if status:
+        query = query.where(filter=FieldFilter("status", "==", status))
+    if priority:
+        query = query.where(filter=FieldFilter("priority", "==", priority))
+    return query
 
 
-def _sort_tasks(tasks: List[Dict[str, Any]], sort_by: str) -> None:
+def _order_tasks(query, sort_by: str):
+    """Order a task query using the denormalized sort keys kept on each task."""
     if sort_by == "priority":
-        order = {"high": 0, "medium": 1, "low": 2}
-        tasks.sort(key=lambda t: order.get(str(t.get("priority") or ""), 99))
-    elif sort_by == "dueDate":
-        tasks.sort(
-            key=lambda t: (
-                t.get("dueDate") is None,
-                t.get("dueDate") or "",
-                t.get("createdAt") or "",
-            )
-        )
-    else:
-        tasks.sort(key=lambda t: t.get("createdAt") or "", reverse=True)
+        return query.order_by("priorityRank")
+    if sort_by == "dueDate":
+        # Tasks without a due date sort last, ties broken by creation time
+        return query.order_by("dueDateSort").order_by("createdAt")
+    return query.order_by("createdAt", direction=firestore.Query.DESCENDING)
 
 
-def _parse_due_date(value: Optional[str]) -> Optional[date]:
-    """Parse ``YYYY-MM-DD`` strings into a date; return ``None`` on failure."""
-    if not value:
-        return None
-    try:
-        return datetime.strptime(value, "%Y-%m-%d").date()
-    except ValueError:
-        return None
+async def _count(query) -> int:
+    result = await query.count().get()
+    return int(result[0][0].value)
 
 
-def _calculate_stats(tasks: List[Dict[str, Any]]) -> Dict[str, int]:
-    today = _utc_now().date()
-
-    total = len(tasks)
-    completed = sum(1 for task in tasks if task.get("status") == "done")
-    due_today = 0
-    overdue = 0
-
-    for task in tasks:
-        if task.get("status") == "done":
-            continue
-        due = _parse_due_date(task.get("dueDate"))
-        if due is None:
-            continue
-        if due == today:
-            due_today += 1
-        elif due < today:
-            overdue += 1
+async def _calculate_stats(
+    uid: str,
+    status: StatusLiteral | None = None,
+    priority: PriorityLiteral | None = None,
+) -> Dict[str, int]:
+    """Count tasks with aggregation queries instead of reading them."""
+    today = _utc_now().date().isoformat()
+    base = _active_tasks_query(uid, priority=priority)
+
+    open_statuses = [s for s in ("todo", "inProgress") if status in (None, s)]
+    completed_query = base.where(filter=FieldFilter("status", "==", "done"))
+
+    counts = [_count(_active_tasks_query(uid, status, priority))]
+    counts.append(_count(completed_query) if status in (None, "done") else _zero())
+    if open_statuses:
+        open_query = base.where(filter=FieldFilter("status", "in", open_statuses))
+        counts.append(_count(open_query.where(filter=FieldFilter("dueDate", "==", today))))
+        counts.append(_count(open_query.where(filter=FieldFilter("dueDate", "<", today))))
+    else:
+        counts += [_zero(), _zero()]
 
+    total, completed, due_today, overdue = await asyncio.gather(*counts)
     return {
         "total": total,
         "completed": completed,
@@ -167,6 +155,10 @@ def _calculate_stats(tasks: List[Dict[str, Any]]) -> Dict[str, int]:
     }
 
 
+async def _zero() -> int:
+    return 0
+
+
 def _normalize_filter(value: Optional[str], allowed: Iterable[str]) -> Optional[str]:
     """Normalize query filter values coming from the UI.
 
@@ -229,9 +221,20 @@ class TaskBase(BaseModel):
     )
 
 
+def _check_due_date(value: str | None) -> str | None:
+    """Accept ``YYYY-MM-DD`` or nothing; stats compare due dates as strings."""
+    if value in (None, ""):
+        return None
+    if not task_stats.is_due_date(value):
+        raise ValueError("dueDate must be a date in YYYY-MM-DD format")
+    return value
+
+
 class TaskCreate(TaskBase):
     """Payload accepted when creating a task."""
 
+    _due_date = field_validator("dueDate")(_check_due_date)
+
 
 class TaskUpdate(BaseModel):
     """Fields that can be updated on an existing task."""
@@ -271,6 +274,8 @@ class TaskUpdate(BaseModel):
         description="Updated recurring topic/area label. Leave unset to keep current value.",
     )
 
+    _due_date = field_validator("dueDate")(_check_due_date)
+
 
 class TaskResponse(TaskBase):
     """Task payload returned by the API including metadata fields."""
@@ -303,7 +308,11 @@ class TaskListResponse(BaseModel):
         description="Filtered list of tasks for the authenticated user"
     )
     stats: Dict[str, int] = Field(
-        description="Summary statistics derived from the returned tasks"
+        description="Summary statistics for all tasks matching the filters"
+    )
+    nextCursor: str | None = Field(
+        default=None,
+        description="Cursor for the next page when ``limit`` was given and more tasks remain",
     )
 
 
@@ -313,7 +322,7 @@ class TaskListResponse(BaseModel):
     summary="List tasks",
     response_description="Tasks matching the supplied filters along with summary stats.",
 )
-def list_tasks(
+async def list_tasks(
     status: Optional[str] = Query(default=None, description='Task status or "all"'),
     priority: Optional[str] = Query(default=None, description='Task priority or "all"'),
     sortBy: str = Query(
@@ -321,42 +330,21 @@ def list_tasks(
         pattern="^(dueDate|priority)$",
         description="Sort key: dueDate, priority",
     ),
+    limit: Optional[int] = Query(
+        default=None, ge=1, le=200, description="Page size; omit to return every task"
+    ),
+    cursor: Optional[str] = Query(
+        default=None, description="nextCursor from the previous page"
+    ),
     user: dict = Depends(require_user),
 ):
-    """Return all active (non-archived) tasks for the authenticated user optionally filtered by status and priority."""
+    """Return all active (non-archived) tasks for the authenticated user optionally filtered by status and priority.
+
+    Pass ``limit`` to page through the results; ``nextCursor`` is then the
+    value to send as ``cursor`` for the following page.
+    """
 
     uid = user["uid"]
-    snapshots = _tasks_collection(uid).stream()
-    all_tasks_data = [_serialize_task_doc(doc) for doc in snapshots]
-    
-    # Auto-delete tasks older than 30 days
-    now = _utc_now()
-    cutoff_date = now - timedelta(days=30)
-    tasks_to_delete = []
-    for task in all_tasks_data:
-        deleted_at = task.get("deletedAt")
-        if deleted_at:
-            try:
-                deleted_dt = datetime.fromisoformat(deleted_at.replace("Z", "+00:00"))
-                if deleted_dt < cutoff_date:
-                    tasks_to_delete.append(task["id"])
-            except (ValueError, AttributeError):
-                continue
-    
-    # Permanently delete old archived tasks
-    if tasks_to_delete:
-        tasks_ref = _tasks_collection(uid)
-        for task_id in tasks_to_delete:
-            try:
-                tasks_ref.document(task_id).delete()
-            except Exception as e:
-                print(f"Error deleting old task {task_id}: {e}")
-    
-    # Filter out archived tasks (tasks with deletedAt set) and permanently deleted ones
-    tasks_data = [
-        task for task in all_tasks_data 
-        if not task.get("deletedAt") and task["id"] not in tasks_to_delete
-    ]
 
     status_norm = cast(
         StatusLiteral | None, _normalize_filter(status, ["todo", "inProgress", "done"])
@@ -365,12 +353,26 @@ def list_tasks(
         PriorityLiteral | None, _normalize_filter(priority, ["high", "medium", "low"])
     )
 
-    tasks_data = _filter_tasks(
-        tasks_data,
-        status=status_norm,
-        priority=priority_norm,
+    # Ordered queries leave out tasks without the sort keys
+    await task_stats.ensure_task_fields(uid)
+    query = _order_tasks(_active_tasks_query(uid, status_norm, priority_norm), sortBy)
+    if cursor:
+        cursor_snapshot = await repo.tasks_collection(uid).document(cursor).get()
+        if not cursor_snapshot.exists:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.start_after(cursor_snapshot)
+    if limit:
+        # Fetch one extra task to know whether another page exists
+        query = query.limit(limit + 1)
+
+    snapshots, stats = await asyncio.gather(
+        repo.stream(query), _calculate_stats(uid, status_norm, priority_norm)
     )
-    _sort_tasks(tasks_data, sortBy)
+    next_cursor = None
+    if limit and len(snapshots) > limit:
+        snapshots = snapshots[:limit]
+        next_cursor = snapshots[-1].id
+    tasks_data = [_serialize_task_doc(doc) for doc in snapshots]
 
     # Convert tasks to TaskResponse objects, with error handling
     task_responses = []
@@ -385,7 +387,7 @@ def list_tasks(
             continue
     
     return TaskListResponse(
-        tasks=task_responses, stats=_calculate_stats(tasks_data)
+        tasks=task_responses, stats=stats, nextCursor=next_cursor
     )
 
 
@@ -396,21 +398,22 @@ def list_tasks(
     summary="Create task",
     response_description="Details for the newly created task, including its generated id.",
 )
-def create_task(payload: TaskCreate, user: dict = Depends(require_user)):
+async def create_task(payload: TaskCreate, user: dict = Depends(require_user)):
     """Add a new task to the authenticated user's tasks collection."""
     uid = user["uid"]
-    tasks_ref = _tasks_collection(uid)
+    tasks_ref = repo.tasks_collection(uid)
     now = _utc_now()
 
     data = payload.model_dump()
     data["createdAt"] = now
     data["updatedAt"] = now
     data["totalStudyMinutes"] = 0
+    data.update(task_stats.index_fields(data))
 
     doc_ref = tasks_ref.document()
-    doc_ref.set(data)
+    await task_stats.write_task(uid, doc_ref, lambda _: data)
 
-    stored = doc_ref.get()
+    stored = await doc_ref.get()
     return _to_task_response(_serialize_task_doc(stored))
 
 
@@ -420,15 +423,11 @@ def create_task(payload: TaskCreate, user: dict = Depends(require_user)):
     summary="Get task stats",
     response_description="Counts of total, completed, due-today, and overdue tasks.",
 )
-def get_task_stats(user: dict = Depends(require_user)):
+async def get_task_stats(user: dict = Depends(require_user)):
     """Return aggregate statistics for the authenticated user's active (non-archived) tasks."""
 
     uid = user["uid"]
-    snapshots = _tasks_collection(uid).stream()
-    tasks = [_serialize_task_doc(doc) for doc in snapshots]
-    # Filter out archived tasks
-    tasks = [task for task in tasks if not task.get("deletedAt")]
-    return _calculate_stats(tasks)
+    return await _calculate_stats(uid)
 
 
 @router.patch(
@@ -437,7 +436,7 @@ def get_task_stats(user: dict = Depends(require_user)):
     summary="Update task",
     response_description="Updated task after applying the provided field changes.",
 )
-def update_task(
+async def update_task(
     task_id: str,
     payload: TaskUpdate,
     user: dict = Depends(require_user),
@@ -445,10 +444,7 @@ def update_task(
     """Apply partial updates to an existing task."""
 
     uid = user["uid"]
-    doc_ref = _tasks_collection(uid).document(task_id)
-    snapshot = doc_ref.get()
-    if not snapshot.exists:
-        raise HTTPException(status_code=404, detail="Task not found.")
+    doc_ref = repo.tasks_collection(uid).document(task_id)
 
     # Get all fields from payload that were explicitly set
     payload_dict = payload.model_dump(exclude_unset=True)
@@ -461,6 +457,9 @@ def update_task(
     
     # If no fields to update, return current task
     if not update_fields:
+        snapshot = await doc_ref.get()
+        if not snapshot.exists:
+            raise HTTPException(status_code=404, detail="Task not found.")
         try:
             return _to_task_response(_serialize_task_doc(snapshot))
         except Exception as e:
@@ -469,11 +468,20 @@ def update_task(
             raise HTTPException(status_code=500, detail=f"Error processing task: {str(e)}")
 
     update_fields["updatedAt"] = _utc_now()
+    update_fields.update(task_stats.index_fields(update_fields))
+
+    def _build_update(task_data):
+        if task_data is None:
+            raise HTTPException(status_code=404, detail="Task not found.")
+        return update_fields
     
     try:
-        doc_ref.update(update_fields)
-        refreshed = doc_ref.get()
+        # The status change and the completed-task count commit together
+        await task_stats.write_task(uid, doc_ref, _build_update)
+        refreshed = await doc_ref.get()
         return _to_task_response(_serialize_task_doc(refreshed))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error updating task: {e}")
         print(traceback.format_exc())
@@ -486,18 +494,18 @@ def update_task(
     summary="Archive task",
     response_description="Confirmation that the task was successfully archived.",
 )
-def delete_task(task_id: str, user: dict = Depends(require_user)):
+async def delete_task(task_id: str, user: dict = Depends(require_user)):
     """Archive a task by setting its deletedAt timestamp. Tasks are automatically permanently deleted after 30 days."""
 
     uid = user["uid"]
-    doc_ref = _tasks_collection(uid).document(task_id)
-    snapshot = doc_ref.get()
+    doc_ref = repo.tasks_collection(uid).document(task_id)
+    snapshot = await doc_ref.get()
     if not snapshot.exists:
         raise HTTPException(status_code=404, detail="Task not found.")
     
     # Archive the task by setting deletedAt timestamp
     now = _utc_now()
-    doc_ref.update({"deletedAt": now, "updatedAt": now})
+    await doc_ref.update({"deletedAt": now, "updatedAt": now})
     return {"success": True}
 
 class TaskDailyStatsResponse(BaseModel):
@@ -512,21 +520,17 @@ class TaskDailyStatsResponse(BaseModel):
     summary="Get archived tasks",
     response_description="Returns all archived (deleted) tasks for the authenticated user.",
 )
-def get_archived_tasks(user: dict = Depends(require_user)):
+async def get_archived_tasks(user: dict = Depends(require_user)):
     """Return all archived tasks (tasks with deletedAt set) for the authenticated user."""
 
     uid = user["uid"]
-    snapshots = _tasks_collection(uid).stream()
-    tasks_data = [_serialize_task_doc(doc) for doc in snapshots]
-    
-    # Filter to only archived tasks
-    archived_tasks = [task for task in tasks_data if task.get("deletedAt")]
-    
-    # Sort by deletedAt descending (most recently deleted first)
-    archived_tasks.sort(
-        key=lambda t: (t.get("deletedAt") is None, t.get("deletedAt") or ""),
-        reverse=True
+    # Most recently deleted first
+    query = (
+        repo.tasks_collection(uid)
+        .where(filter=FieldFilter("deletedAt", "!=", None))
+        .order_by("deletedAt", direction=firestore.Query.DESCENDING)
     )
+    archived_tasks = [_serialize_task_doc(doc) for doc in await repo.stream(query)]
     
     # Convert to TaskResponse objects
     task_responses = []
@@ -547,19 +551,19 @@ def get_archived_tasks(user: dict = Depends(require_user)):
     summary="Restore archived task",
     response_description="Restore an archived task by clearing its deletedAt timestamp.",
 )
-def restore_task(task_id: str, user: dict = Depends(require_user)):
+async def restore_task(task_id: str, user: dict = Depends(require_user)):
     """Restore an archived task by removing its deletedAt timestamp."""
 
     uid = user["uid"]
-    doc_ref = _tasks_collection(uid).document(task_id)
-    snapshot = doc_ref.get()
+    doc_ref = repo.tasks_collection(uid).document(task_id)
+    snapshot = await doc_ref.get()
     if not snapshot.exists:
         raise HTTPException(status_code=404, detail="Task not found.")
     
     # Restore the task by clearing deletedAt
     now = _utc_now()
-    doc_ref.update({"deletedAt": None, "updatedAt": now})
-    refreshed = doc_ref.get()
+    await doc_ref.update({"deletedAt": None, "updatedAt": now})
+    refreshed = await doc_ref.get()
     return _to_task_response(_serialize_task_doc(refreshed))
 
 
@@ -569,15 +573,18 @@ def restore_task(task_id: str, user: dict = Depends(require_user)):
     summary="Permanently delete task",
     response_description="Permanently delete a task from the database. This action cannot be undone.",
 )
-def permanent_delete_task(task_id: str, user: dict = Depends(require_user)):
+async def permanent_delete_task(task_id: str, user: dict = Depends(require_user)):
     """Permanently delete a task from the authenticated user's collection. This action cannot be undone."""
 
     uid = user["uid"]
-    doc_ref = _tasks_collection(uid).document(task_id)
-    snapshot = doc_ref.get()
-    if not snapshot.exists:
-        raise HTTPException(status_code=404, detail="Task not found.")
-    doc_ref.delete()
+    doc_ref = repo.tasks_collection(uid).document(task_id)
+
+    def _delete(task_data):
+        if task_data is None:
+            raise HTTPException(status_code=404, detail="Task not found.")
+        return None
+
+    await task_stats.write_task(uid, doc_ref, _delete)
     return {"success": True}
 
 @router.get(
@@ -586,7 +593,7 @@ def permanent_delete_task(task_id: str, user: dict = Depends(require_user)):
     summary="Get task creation and completion counts for each day in the past week",
     response_description="Returns a list of objects with ISO date, created count, and completed count per day for the last 7 days.",
 )
-def get_weekly_activity(user: dict = Depends(require_user)):
+async def get_weekly_activity(user: dict = Depends(require_user)):
     uid = user["uid"]
     today = _utc_now().date()
     start_date = today - timedelta(days=6)
@@ -595,7 +602,7 @@ def get_weekly_activity(user: dict = Depends(require_user)):
     created_counts = defaultdict(int)
     completed_counts = defaultdict(int)
 
-    snapshots = _tasks_collection(uid).stream()
+    snapshots = await repo.stream(repo.tasks_collection(uid))
     for doc in snapshots:
         data = _serialize_task_doc(doc)
         
@@ -8,7 +8,9 @@ from google.cloud import firestore
 from pydantic import BaseModel, ConfigDict, Field
 
 from ..deps.auth import require_user
-from ...core.firebase import db
+from ..deps.doc_cache import get_doc_cache
+from ...core import repository as repo
+from ...core.doc_cache import RequestDocCache
 
 router = APIRouter(prefix="/wellness", tags=["wellness"])
 
@@ -100,20 +102,6 @@ class SubmitCheckInResponse(BaseModel):
     updatedTotalCheckIns: int
 
 
-def _summary_doc(uid: str):
-    return (
-        db.collection("users").document(uid).collection("wellness").document("summary")
-    )
-
-
-def _checkins_collection(uid: str):
-    return db.collection("users").document(uid).collection("wellness_checkins")
-
-
-def _pet_history_collection(uid: str):
-    return db.collection("users").document(uid).collection("wellness_pet_history")
-
-
 def _isoformat(dt: datetime | None) -> str | None:
     if not dt:
         return None
@@ -195,11 +183,16 @@ def _merge_summary(raw: Dict[str, Any] | None) -> Dict[str, Any]:
     return summary
 
 
-def _ensure_summary(
-    uid: str, transaction: firestore.Transaction | None = None
+async def _ensure_summary(
+    uid: str,
+    transaction: firestore.AsyncTransaction | None = None,
+    cache: RequestDocCache | None = None,
 ) -> Dict[str, Any]:
-    doc_ref = _summary_doc(uid)
-    snapshot = doc_ref.get(transaction=transaction) if transaction else doc_ref.get()
+    doc_ref = repo.wellness_summary_doc(uid)
+    if cache is not None and transaction is None:
+        snapshot = await cache.get(doc_ref)
+    else:
+        snapshot = await doc_ref.get(transaction=transaction)
     if snapshot.exists:
         return _merge_summary(snapshot.to_dict() or {})
 
@@ -207,7 +200,7 @@ def _ensure_summary(
     if transaction:
         transaction.set(doc_ref, summary)
     else:
-        doc_ref.set(summary)
+        await doc_ref.set(summary)
     return summary
 
 
@@ -238,10 +231,12 @@ def _serialize_checkin(doc) -> CheckInEntry:
     response_model=OverviewResponse,
     summary="Get wellness overview",
 )
-def get_wellness_overview(user: dict = Depends(require_user)):
+async def get_wellness_overview(
+    user: dict = Depends(require_user), cache: RequestDocCache = Depends(get_doc_cache)
+):
     """Return streak and cumulative check-in stats for the authenticated user."""
     uid = user["uid"]
-    summary = _ensure_summary(uid)
+    summary = await _ensure_summary(uid, cache=cache)
     return OverviewResponse(**summary["overview"])
 
 
@@ -250,7 +245,7 @@ def get_wellness_overview(user: dict = Depends(require_user)):
     response_model=MonthlyCheckinsResponse,
     summary="List check-ins for a selected month",
 )
-def get_monthly_checkins(
+async def get_monthly_checkins(
     month: str | None = Query(
         None,
         description="Target month. Accepts numeric values (e.g., 10) or YYYY-MM format.",
@@ -261,13 +256,13 @@ def get_monthly_checkins(
     """Return all check-ins that fall within the requested month."""
     uid = user["uid"]
     month_int, year_int = _resolve_month_year(month, year)
-    checkins_ref = _checkins_collection(uid)
+    checkins_ref = repo.wellness_checkins_collection(uid)
     query = (
         checkins_ref.where("year", "==", year_int)
         .where("month", "==", month_int)
         .order_by("date", direction=firestore.Query.DESCENDING)
     )
-    checkins = [_serialize_checkin(doc) for doc in query.stream()]
+    checkins = [_serialize_checkin(doc) for doc in await repo.stream(query)]
     checkin_dates = [entry.date for entry in checkins if entry.date]
 
     return MonthlyCheckinsResponse(
@@ -281,7 +276,7 @@ def get_monthly_checkins(
     response_model=PetHistoryResponse,
     summary="Get pet history for a specific date",
 )
-def get_pet_history(
+async def get_pet_history(
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
     user: dict = Depends(require_user),
 ):
@@ -290,7 +285,7 @@ def get_pet_history(
     target_date = _parse_date(date)
     formatted_date = target_date.strftime("%Y-%m-%d")
 
-    doc = _pet_history_collection(uid).document(formatted_date).get()
+    doc = await repo.wellness_pet_history_collection(uid).document(formatted_date).get()
     if not doc.exists:
         raise HTTPException(
             status_code=404, detail="No pet history for the requested date."
@@ -306,35 +301,25 @@ def get_pet_history(
     response_model=Dict[str, str],
     summary="Reset wellness data",
 )
-def reset_wellness_data(user: dict = Depends(require_user)):
+async def reset_wellness_data(user: dict = Depends(require_user)):
     """Reset all wellness data (streaks, check-ins, pet history) for the authenticated user."""
     uid = user["uid"]
     
     print(f"DEBUG: Resetting wellness data for user {uid}")
     
     # Delete all wellness check-ins
-    checkins_ref = _checkins_collection(uid)
-    checkins = checkins_ref.stream()
-    checkin_count = 0
-    for checkin in checkins:
-        checkin.reference.delete()
-        checkin_count += 1
+    checkin_count = await repo.delete_all(repo.wellness_checkins_collection(uid))
     print(f"DEBUG: Deleted {checkin_count} check-ins")
     
     # Delete all pet history
-    pet_history_ref = _pet_history_collection(uid)
-    pet_history = pet_history_ref.stream()
-    pet_count = 0
-    for pet in pet_history:
-        pet.reference.delete()
-        pet_count += 1
+    pet_count = await repo.delete_all(repo.wellness_pet_history_collection(uid))
     print(f"DEBUG: Deleted {pet_count} pet history records")
     
     # Delete the summary document (if it exists)
-    summary_ref = _summary_doc(uid)
-    summary_snapshot = summary_ref.get()
+    summary_ref = repo.wellness_summary_doc(uid)
+    summary_snapshot = await summary_ref.get()
     if summary_snapshot.exists:
-        summary_ref.delete()
+        await summary_ref.delete()
         print(f"DEBUG: Deleted summary document")
     else:
         print(f"DEBUG: No summary document found to delete")
@@ -347,7 +332,7 @@ def reset_wellness_data(user: dict = Depends(require_user)):
     response_model=SubmitCheckInResponse,
     summary="Submit a wellness check-in",
 )
-def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
+async def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
     """Create or update the current user's check-in for the supplied date."""
     try:
         uid = user["uid"]
@@ -356,12 +341,12 @@ def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
         timestamp = datetime.now(timezone.utc)
         print(f"DEBUG: Processing check-in for user {uid}, date {payload.date}")
 
-        checkins_ref = _checkins_collection(uid)
+        checkins_ref = repo.wellness_checkins_collection(uid)
         checkin_doc = checkins_ref.document(payload.date)
-        summary_doc = _summary_doc(uid)
+        summary_doc = repo.wellness_summary_doc(uid)
         print(f"DEBUG: Created Firebase references")
 
-        transaction = db.transaction()
+        transaction = repo.transaction()
         print(f"DEBUG: Created transaction")
 
     except HTTPException:
@@ -371,7 +356,7 @@ def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
         raise HTTPException(status_code=500, detail=f"Setup error: {str(e)}")
 
     # Check if document exists before transaction
-    existing_doc = checkin_doc.get()
+    existing_doc = await checkin_doc.get()
     is_new_entry = not existing_doc.exists
 
     # Prevent duplicate check-ins for the same date
@@ -382,9 +367,9 @@ def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
             detail=f"You've already checked in for {payload.date}. You can only check in once per day."
         )
 
-    @firestore.transactional
-    def _perform(transaction: firestore.Transaction):
-        summary = _ensure_summary(uid, transaction=transaction)
+    @firestore.async_transactional
+    async def _perform(transaction: firestore.AsyncTransaction):
+        summary = await _ensure_summary(uid, transaction=transaction)
         overview = summary["overview"]
         today_checkin = summary["todayCheckIn"]
         checkin_dates: List[str] = list(summary.get("checkInDates") or [])
@@ -451,7 +436,7 @@ def submit_checkin(payload: CheckInPayload, user: dict = Depends(require_user)):
 
     try:
         print(f"DEBUG: Executing transaction")
-        result = _perform(transaction)
+        result = await _perform(transaction)
         overview = result["overview"]
         print(f"DEBUG: Transaction completed successfully")
     except Exception as e:
@@ -478,12 +463,12 @@ class WeeklyCheckinsResponse(BaseModel):
     endDate: Optional[str] = None
 
 @router.get("/checkins/weekly", response_model=WeeklyCheckinsResponse)
-def get_weekly_checkins(
+async def get_weekly_checkins(
     user: dict = Depends(require_user),
 ):
     """Return all check-ins from the past 7 days (including today)."""
     uid = user["uid"]
-    checkins_ref = _checkins_collection(uid)
+    checkins_ref = repo.wellness_checkins_collection(uid)
 
     now = datetime.utcnow()
     seven_days_ago = now - timedelta(days=6)
@@ -494,7 +479,7 @@ def get_weekly_checkins(
         .order_by("timestamp", direction=firestore.Query.ASCENDING)
     )
 
-    checkins = [_serialize_checkin(doc) for doc in query.stream()]
+    checkins = [_serialize_checkin(doc) for doc in await repo.stream(query)]
     checkin_dates = [entry.date for entry in checkins if entry.date]
 
     return WeeklyCheckinsResponse(
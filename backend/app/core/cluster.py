@@ -0,0 +1,199 @@
+"""Pub/sub backends for running the real-time layer on several nodes.
+
+``SOCKETIO_MESSAGE_QUEUE`` picks the backend:
+
+- ``redis://...`` (or ``rediss://``): any Redis-compatible server; needs the
+  ``redis`` package.
+- ``memory://``: an in-process stand-in. Every node created in the same
+  process shares it, which is enough for tests and local experiments.
+- unset: single-node mode, no backend.
+
+A backend provides publish/subscribe on named channels and a lease used for
+leader election. ``BackendClientManager`` runs Socket.IO's pub/sub client
+manager on top of it, so ``sio.emit`` reaches sockets on every node.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+
+NODE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class MemoryBackend:
+    """Process-local pub/sub and leases shared by every instance."""
+
+    _channels: Dict[str, List[asyncio.Queue]] = {}
+    _leases: Dict[str, Tuple[str, float]] = {}
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for queue in list(self._channels.get(channel, ())):
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._channels.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._channels[channel].remove(queue)
+
+    async def acquire_lease(self, key: str, holder: str, ttl: float) -> bool:
+        now = time.monotonic()
+        current, expires_at = self._leases.get(key, (None, 0.0))
+        if current not in (None, holder) and expires_at > now:
+            return False
+        self._leases[key] = (holder, now + ttl)
+        return True
+
+    async def release_lease(self, key: str, holder: str) -> None:
+        if self._leases.get(key, (None,))[0] == holder:
+            del self._leases[key]
+
+    async def close(self) -> None:
+        pass
+
+
+# Take the lease if it is free, or extend it if we already hold it
+_ACQUIRE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend:
+    """Pub/sub and leases on a Redis-compatible server."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("SOCKETIO_MESSAGE_QUEUE is a redis:// URL but the redis package is not installed")
+        self.redis = aioredis.Redis.from_url(url)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self.redis.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+
+    async def acquire_lease(self, key: str, holder: str, ttl: float) -> bool:
+        return bool(await self.redis.eval(_ACQUIRE_LEASE, 1, key, holder, int(ttl * 1000)))
+
+    async def release_lease(self, key: str, holder: str) -> None:
+        await self.redis.eval(_RELEASE_LEASE, 1, key, holder)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_backend(url: Optional[str] = SOCKETIO_MESSAGE_QUEUE):
+    """The backend for ``url``, or ``None`` in single-node mode."""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {url!r}")
+
+
+class BackendClientManager(AsyncPubSubManager):
+    """Socket.IO client manager that relays emits through a cluster backend."""
+
+    name = "cluster"
+
+    def __init__(self, backend, channel: str = "socketio", **kwargs):
+        super().__init__(channel=channel, **kwargs)
+        self.backend = backend
+
+    async def _publish(self, data):
+        await self.backend.publish(self.channel, orjson.dumps(data))
+
+    async def _listen(self):
+        async for message in self.backend.subscribe(self.channel):
+            yield message
+
+
+class LeaderElection:
+    """Keeps trying to hold ``key``'s lease; calls back when leadership changes.
+
+    The lease lasts ``ttl`` seconds and is renewed every ``renew_every``, so
+    a node that dies is replaced within ``ttl``.
+    """
+
+    def __init__(
+        self,
+        backend,
+        key: str,
+        on_elected: Callable[[], Awaitable[None]],
+        on_deposed: Callable[[], Awaitable[None]],
+        holder: str = NODE_ID,
+        ttl: float = 15.0,
+        renew_every: float = 5.0,
+    ):
+        self.backend = backend
+        self.key = key
+        self.holder = holder
+        self.ttl = ttl
+        self.renew_every = renew_every
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.is_leader = False
+        self.elections = 0
+
+    async def run(self) -> None:
+        while True:
+            try:
+                leading = await self.backend.acquire_lease(self.key, self.holder, self.ttl)
+            except Exception as e:
+                print(f"Leader election for {self.key} failed: {e}")
+                leading = False
+            if leading and not self.is_leader:
+                self.is_leader = True
+                self.elections += 1
+                print(f"{self.holder} is now the leader for {self.key}")
+                await self.on_elected()
+            elif not leading and self.is_leader:
+                self.is_leader = False
+                print(f"{self.holder} lost the leadership for {self.key}")
+                await self.on_deposed()
+            await asyncio.sleep(self.renew_every)
+
+    async def resign(self) -> None:
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        await self.on_deposed()
+        try:
+            await self.backend.release_lease(self.key, self.holder)
+        except Exception as e:
+            print(f"Could not release the {self.key} lease: {e}")
@@ -0,0 +1,215 @@
+"""Per-day rollup of study sessions for the timer page.
+
+``users/{uid}/dailyMetrics/{date}`` keeps the day's event counters
+(sessions started and completed, pauses, resets) and a rollup of the
+sessions started that day: started, paused and completed minutes plus a
+count per status. ``write_session`` in ``study_stats`` applies both in the
+same transaction as the session write with ``firestore.Increment``: the
+events the caller reports, and the rollup by removing the session's old
+contribution and adding its new one.
+
+Sessions that are paused right now keep accruing paused time without being
+written, so the rollup also lists them under ``open_pauses`` with what is
+needed to add their running pause on read. ``/study-sessions/timer-stats``
+is then one document read.
+
+Documents written before the rollup existed have no ``rollup_version``; they
+are rebuilt from that day's sessions on first read.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from google.cloud import firestore
+
+from . import repository as repo
+
+ROLLUP_VERSION = 1
+
+EVENT_FIELDS = ("sessions_started", "sessions_completed", "total_pauses", "total_resets")
+
+ROLLUP_FIELDS = (
+    "started_minutes",
+    "paused_minutes",
+    "completed_minutes",
+    "active_count",
+    "paused_count",
+    "completed_count",
+)
+STATUS_COUNT_FIELDS = {
+    "active": "active_count",
+    "paused": "paused_count",
+    "completed": "completed_count",
+}
+OPEN_PAUSES = "open_pauses"
+
+
+def daily_metrics_doc(uid: str, date: str):
+    """Get reference to user's metrics document for a day"""
+    return repo.daily_metrics_collection(uid).document(date)
+
+
+def _positive(value: Any) -> float:
+    return value if isinstance(value, (int, float)) and value > 0 else 0
+
+
+def _capped(paused_minutes: float, planned_minutes: float) -> float:
+    # A session cannot be paused for longer than it was planned
+    return min(paused_minutes, float(planned_minutes)) if planned_minutes > 0 else paused_minutes
+
+
+def session_rollup(session: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Return what a single session adds to its day's rollup."""
+    contribution = {field: 0 for field in ROLLUP_FIELDS}
+    if not session:
+        return contribution
+
+    planned = _positive(session.get("planned_duration_minutes"))
+    status = session.get("status")
+    contribution["started_minutes"] = planned
+    if status in STATUS_COUNT_FIELDS:
+        # Paused time of cancelled sessions does not count against focus
+        contribution["paused_minutes"] = _capped(_positive(session.get("total_paused_duration_minutes")), planned)
+    if status == "completed":
+        contribution["completed_minutes"] = int(_positive(session.get("actual_duration_minutes")))
+    if status in STATUS_COUNT_FIELDS:
+        contribution[STATUS_COUNT_FIELDS[status]] = 1
+    return contribution
+
+
+def open_pause(session: Dict[str, Any]) -> Dict[str, Any]:
+    """What the rollup needs to add the running pause of a paused session."""
+    return {
+        "paused_at": session.get("paused_at"),
+        "paused_minutes": _positive(session.get("total_paused_duration_minutes")),
+        "planned_minutes": _positive(session.get("planned_duration_minutes")),
+    }
+
+
+def write_rollup(
+    transaction,
+    uid: str,
+    session_id: str,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+) -> None:
+    """Add the change from ``before`` to ``after`` to the day rollups in ``transaction``."""
+    deltas: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for session, sign in ((before, -1), (after, 1)):
+        date = str((session or {}).get("date") or "").strip()
+        if not date:
+            continue
+        for field, value in session_rollup(session).items():
+            deltas[date][field] += sign * value
+        if session.get("status") == "paused":
+            # Re-set below when still paused on the same day
+            deltas[date][OPEN_PAUSES] = 0
+
+    after_date = str((after or {}).get("date") or "").strip()
+    for date, fields in deltas.items():
+        changes: Dict[str, Any] = {
+            field: firestore.Increment(value) for field, value in fields.items() if field != OPEN_PAUSES and value
+        }
+        if date == after_date and after.get("status") == "paused":
+            changes[OPEN_PAUSES] = {session_id: open_pause(after)}
+        elif OPEN_PAUSES in fields:
+            changes[OPEN_PAUSES] = {session_id: firestore.DELETE_FIELD}
+        if changes:
+            changes["updated_at"] = datetime.now(timezone.utc)
+            transaction.set(daily_metrics_doc(uid, date), changes, merge=True)
+
+
+def write_events(transaction, uid: str, date: str, increments: Dict[str, int]) -> None:
+    """Add session events (``EVENT_FIELDS``) to a day's counters in ``transaction``."""
+    changes: Dict[str, Any] = {
+        field: firestore.Increment(value) for field, value in increments.items() if value
+    }
+    if changes:
+        changes["date"] = date
+        changes["updated_at"] = datetime.now(timezone.utc)
+        transaction.set(daily_metrics_doc(uid, date), changes, merge=True)
+
+
+def _minutes_since(moment: Any, now: datetime) -> float:
+    if isinstance(moment, str):
+        try:
+            moment = datetime.fromisoformat(moment.replace("Z", "+00:00"))
+        except ValueError:
+            return 0.0
+    if not isinstance(moment, datetime):
+        return 0.0
+    return max(0.0, (now - moment).total_seconds() / 60)
+
+
+def running_pause_minutes(metrics: Dict[str, Any], now: datetime | None = None) -> float:
+    """Paused minutes accrued since the open pauses began, not yet in ``paused_minutes``."""
+    now = now or datetime.now(timezone.utc)
+    extra = 0.0
+    for pause in (metrics.get(OPEN_PAUSES) or {}).values():
+        planned = pause.get("planned_minutes", 0)
+        paused = pause.get("paused_minutes", 0)
+        current = _capped(_minutes_since(pause.get("paused_at"), now), planned)
+        extra += _capped(paused + current, planned) - _capped(paused, planned)
+    return extra
+
+
+async def rebuild_rollup(uid: str, date: str) -> Dict[str, Any]:
+    """Recompute a day's rollup from that day's sessions and save it.
+
+    The event counters in the same document are left alone.
+    """
+    doc_ref = daily_metrics_doc(uid, date)
+    query = repo.study_sessions_collection(uid).where("date", "==", date)
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        metrics = await repo.get_dict(doc_ref, transaction=transaction) or {"date": date}
+        rollup: Dict[str, Any] = {field: 0 for field in ROLLUP_FIELDS}
+        pauses = {}
+        async for doc in await transaction.get(query):
+            session = doc.to_dict() or {}
+            for field, value in session_rollup(session).items():
+                rollup[field] += value
+            if session.get("status") == "paused":
+                pauses[doc.id] = open_pause(session)
+        rollup[OPEN_PAUSES] = pauses
+        rollup["rollup_version"] = ROLLUP_VERSION
+        rollup["updated_at"] = datetime.now(timezone.utc)
+        transaction.set(doc_ref, {"date": date, **rollup}, merge=["date", *rollup])
+        return {**metrics, **rollup}
+
+    return await _run(repo.transaction())
+
+
+async def clear_rollups(uid: str) -> int:
+    """Drop the rollup of every day, e.g. after the sessions were deleted.
+
+    The event counters stay; a cleared day is rebuilt from its (remaining)
+    sessions on the next read. Returns the number of documents changed.
+    """
+    cleared = {field: firestore.DELETE_FIELD for field in (*ROLLUP_FIELDS, OPEN_PAUSES, "rollup_version")}
+    changed = 0
+    write_batch = repo.batch()
+    pending = 0
+    async for doc in repo.daily_metrics_collection(uid).stream():
+        write_batch.update(doc.reference, cleared)
+        pending += 1
+        changed += 1
+        if pending == repo.BATCH_LIMIT:
+            await write_batch.commit()
+            write_batch = repo.batch()
+            pending = 0
+    if pending:
+        await write_batch.commit()
+    return changed
+
+
+async def load_daily_metrics(uid: str, date: str) -> Dict[str, Any]:
+    """Read a day's metrics document, building its rollup on first use."""
+    metrics = await repo.get_dict(daily_metrics_doc(uid, date))
+    if metrics is None:
+        return {"date": date, **{field: 0 for field in ROLLUP_FIELDS}, OPEN_PAUSES: {}}
+    if metrics.get("rollup_version") != ROLLUP_VERSION:
+        return await rebuild_rollup(uid, date)
+    return metrics
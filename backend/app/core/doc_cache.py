@@ -0,0 +1,75 @@
+"""Per-request memo of Firestore document snapshots.
+
+A handler (and the helpers it calls) often reads the same document, usually
+the user's root document, more than once. ``RequestDocCache`` remembers each
+snapshot by path for the life of one request; writes made through it drop
+the cached snapshot so the next read sees the new data. It is not shared
+between requests, so there is nothing to expire or keep coherent across
+users. Use it through the ``get_doc_cache`` dependency in
+``app/api/deps/doc_cache.py``.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from .firebase import async_db
+
+
+class RequestDocCache:
+    """Document snapshots read during one request, by path."""
+
+    def __init__(self):
+        self._snapshots: Dict[str, Any] = {}
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, doc_ref):
+        """Snapshot of ``doc_ref``, read at most once per request."""
+        snapshot = self._snapshots.get(doc_ref.path)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        snapshot = await doc_ref.get()
+        self._snapshots[doc_ref.path] = snapshot
+        return snapshot
+
+    async def get_dict(self, doc_ref) -> Optional[Dict[str, Any]]:
+        """Data of ``doc_ref``, or ``None`` when it does not exist."""
+        snapshot = await self.get(doc_ref)
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict() or {}
+
+    async def get_many(self, doc_refs) -> List[Optional[Dict[str, Any]]]:
+        """Data of several documents, fetching the ones not read yet in one round trip.
+
+        Same contract as ``repository.get_many``.
+        """
+        doc_refs = list(doc_refs)
+        missing = [ref for ref in doc_refs if ref.path not in self._snapshots]
+        self.hits += len(doc_refs) - len(missing)
+        if missing:
+            self.misses += len(missing)
+            async for snapshot in async_db.get_all(missing):
+                self._snapshots[snapshot.reference.path] = snapshot
+        found = []
+        for ref in doc_refs:
+            snapshot = self._snapshots.get(ref.path)
+            found.append((snapshot.to_dict() or {}) if snapshot is not None and snapshot.exists else None)
+        return found
+
+    async def set(self, doc_ref, data: Dict[str, Any], merge: bool = False) -> None:
+        self.invalidate(doc_ref)
+        await doc_ref.set(data, merge=merge)
+
+    async def update(self, doc_ref, data: Dict[str, Any]) -> None:
+        self.invalidate(doc_ref)
+        await doc_ref.update(data)
+
+    async def delete(self, doc_ref) -> None:
+        self.invalidate(doc_ref)
+        await doc_ref.delete()
+
+    def invalidate(self, doc_ref) -> None:
+        self._snapshots.pop(doc_ref.path, None)
@@ -1,10 +1,22 @@
-"""Email service for sending notifications to users."""
+"""Email service for sending notifications to users.
 
+Request handlers and jobs should use ``mail_queue.enqueue`` (or
+``email_service.queue_email``), which hands the message to a pool of
+background worker threads and returns immediately. Each worker keeps its
+authenticated SMTP session open and sends many messages over it. Failed
+sends are retried with exponential backoff.
+"""
+
+import heapq
 import os
+import queue
 import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pathlib import Path
 
@@ -26,6 +38,19 @@ SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", SMTP_USER)
 SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "WAD2 Project")
+# Plain, unauthenticated SMTP for a local debugging server, e.g.
+#   python -m aiosmtpd -n -l localhost:1025   (with SMTP_HOST=localhost SMTP_PORT=1025)
+SMTP_DEBUG = os.getenv("SMTP_DEBUG", "false").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Outbound mail queue
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "10000"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "4"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "2"))
+# Close an idle SMTP session after this long, and recycle busy ones after N messages
+EMAIL_IDLE_TIMEOUT_SECONDS = float(os.getenv("EMAIL_IDLE_TIMEOUT_SECONDS", "60"))
+EMAIL_MESSAGES_PER_CONNECTION = int(os.getenv("EMAIL_MESSAGES_PER_CONNECTION", "100"))
 
 
 class EmailService:
@@ -38,6 +63,45 @@ class EmailService:
         self.password = SMTP_PASSWORD
         self.from_email = SMTP_FROM_EMAIL
         self.from_name = SMTP_FROM_NAME
+        self.debug = SMTP_DEBUG
+        self.timeout = SMTP_TIMEOUT
+
+    @property
+    def configured(self) -> bool:
+        return self.debug or bool(self.username and self.password)
+
+    def build_message(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+    ) -> MIMEMultipart:
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = f"{self.from_name} <{self.from_email}>"
+        msg["To"] = to_email
+
+        # Add text and HTML parts
+        if text_content:
+            part1 = MIMEText(text_content, "plain")
+            msg.attach(part1)
+
+        part2 = MIMEText(html_content, "html")
+        msg.attach(part2)
+        return msg
+
+    def connect(self) -> smtplib.SMTP:
+        """Open an SMTP session, authenticated unless in debug mode."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if not self.debug:
+                server.starttls()
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
 
     def send_email(
         self,
@@ -47,7 +111,10 @@ class EmailService:
         text_content: Optional[str] = None,
     ) -> bool:
         """
-        Send an email to a recipient.
+        Send an email to a recipient right away, on a new connection.
+
+        Prefer ``queue_email`` from request handlers; this blocks until the
+        SMTP conversation is over.
 
         Args:
             to_email: Recipient email address
@@ -58,29 +125,13 @@ class EmailService:
         Returns:
             True if email was sent successfully, False otherwise
         """
-        if not self.username or not self.password:
+        if not self.configured:
             print("⚠️  Email credentials not configured. Skipping email send.")
             return False
 
         try:
-            # Create message
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = f"{self.from_name} <{self.from_email}>"
-            msg["To"] = to_email
-
-            # Add text and HTML parts
-            if text_content:
-                part1 = MIMEText(text_content, "plain")
-                msg.attach(part1)
-
-            part2 = MIMEText(html_content, "html")
-            msg.attach(part2)
-
-            # Send email
-            with smtplib.SMTP(self.host, self.port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
+            msg = self.build_message(to_email, subject, html_content, text_content)
+            with self.connect() as server:
                 server.send_message(msg)
 
             print(f"✅ Email sent successfully to {to_email}")
@@ -90,6 +141,259 @@ class EmailService:
             print(f"❌ Failed to send email to {to_email}: {str(e)}")
             return False
 
+    def queue_email(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+    ) -> bool:
+        """Hand an email to the background mail queue. Returns False if it was not accepted."""
+        return mail_queue.enqueue(to_email, subject, html_content, text_content)
+
+
+@dataclass(order=True)
+class OutboundEmail:
+    not_before: float
+    to_email: str = field(compare=False)
+    subject: str = field(compare=False)
+    html_content: str = field(compare=False)
+    text_content: Optional[str] = field(compare=False, default=None)
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+    attempts: int = field(compare=False, default=0)
+
+
+class MailQueue:
+    """Bounded outbound queue drained by worker threads with persistent SMTP sessions."""
+
+    def __init__(
+        self,
+        service: EmailService,
+        workers: int = EMAIL_WORKERS,
+        max_size: int = EMAIL_QUEUE_MAX_SIZE,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS,
+        retry_base_seconds: float = EMAIL_RETRY_BASE_SECONDS,
+        idle_timeout: float = EMAIL_IDLE_TIMEOUT_SECONDS,
+        messages_per_connection: int = EMAIL_MESSAGES_PER_CONNECTION,
+    ):
+        self.service = service
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.idle_timeout = idle_timeout
+        self.messages_per_connection = max(1, messages_per_connection)
+        self._queue: "queue.Queue[Optional[OutboundEmail]]" = queue.Queue(maxsize=max_size)
+        # Messages waiting out a retry backoff, ordered by not_before
+        self._retry_heap: List[OutboundEmail] = []
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._retry_wakeup = threading.Event()
+        self._stopping = False
+        # Metrics
+        self.enqueued = 0
+        self.rejected = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.connections_opened = 0
+        self.in_flight = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._send_time_total = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"mail-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            retry_thread = threading.Thread(target=self._retry_loop, name="mail-retry", daemon=True)
+            retry_thread.start()
+            self._threads.append(retry_thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Let the workers finish what is already queued, then stop them.
+
+        Messages waiting out a retry backoff get one last attempt right away.
+        Whatever is still unsent when ``timeout`` runs out is counted as failed.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+            retrying, self._retry_heap = self._retry_heap, []
+        if not threads:
+            return
+        self._retry_wakeup.set()
+        deadline = time.monotonic() + timeout
+        unsent = 0
+        for message in retrying:
+            try:
+                self._queue.put(message, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                unsent += 1
+        for _ in range(self.workers):
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                # Still full at the deadline; what is left is counted below
+                break
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # Workers that did not finish in time are abandoned with the process
+        while True:
+            try:
+                message = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if message is not None:
+                unsent += 1
+        with self._lock:
+            unsent += len(self._retry_heap)
+            self._retry_heap = []
+            self.failed += unsent
+        if unsent:
+            print(f"❌ Mail queue stopped with {unsent} unsent email(s)")
+
+    def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        block: bool = False,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Queue an email. With ``block=True`` wait (up to ``timeout``) for room
+        in a full queue instead of dropping the message; bulk senders use this
+        for backpressure."""
+        if not self.service.configured:
+            print("⚠️  Email credentials not configured. Skipping email send.")
+            return False
+        self.start()
+        message = OutboundEmail(
+            not_before=0.0,
+            to_email=to_email,
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content,
+        )
+        try:
+            self._queue.put(message, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            print(f"❌ Mail queue full, dropping email to {to_email}")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.sent
+            return {
+                "workers": len([t for t in self._threads if t.name.startswith("mail-worker")]),
+                "queue_depth": self._queue.qsize(),
+                "retry_pending": len(self._retry_heap),
+                "in_flight": self.in_flight,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "connections_opened": self.connections_opened,
+                "avg_latency_seconds": round(self._latency_total / done, 3) if done else None,
+                "max_latency_seconds": round(self._latency_max, 3),
+                "avg_send_seconds": round(self._send_time_total / done, 3) if done else None,
+            }
+
+    def _schedule_retry(self, message: OutboundEmail, error: Exception) -> None:
+        if message.attempts >= self.max_attempts or self._stopping:
+            # No more backoffs once stopping; the process is going away
+            with self._lock:
+                self.failed += 1
+            print(f"❌ Failed to send email to {message.to_email} after {message.attempts} attempt(s): {error}")
+            return
+        delay = self.retry_base_seconds * (2 ** (message.attempts - 1))
+        message.not_before = time.monotonic() + delay
+        with self._lock:
+            self.retries += 1
+            heapq.heappush(self._retry_heap, message)
+        self._retry_wakeup.set()
+
+    def _retry_loop(self) -> None:
+        """Move messages whose backoff has elapsed back onto the queue."""
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                now = time.monotonic()
+                due = []
+                while self._retry_heap and self._retry_heap[0].not_before <= now:
+                    due.append(heapq.heappop(self._retry_heap))
+                wait = self._retry_heap[0].not_before - now if self._retry_heap else None
+            for message in due:
+                self._queue.put(message)
+            self._retry_wakeup.wait(wait)
+            self._retry_wakeup.clear()
+
+    def _worker(self) -> None:
+        server: Optional[smtplib.SMTP] = None
+        sent_on_connection = 0
+        while True:
+            try:
+                message = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                server = self._close(server)
+                continue
+            if message is None:
+                self._close(server)
+                return
+
+            with self._lock:
+                self.in_flight += 1
+            message.attempts += 1
+            started = time.monotonic()
+            try:
+                if server is None or sent_on_connection >= self.messages_per_connection:
+                    self._close(server)
+                    server = self.service.connect()
+                    sent_on_connection = 0
+                    with self._lock:
+                        self.connections_opened += 1
+                msg = self.service.build_message(
+                    message.to_email, message.subject, message.html_content, message.text_content
+                )
+                server.send_message(msg)
+                sent_on_connection += 1
+                finished = time.monotonic()
+                with self._lock:
+                    self.sent += 1
+                    latency = finished - message.enqueued_at
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+                    self._send_time_total += finished - started
+                print(f"✅ Email sent successfully to {message.to_email}")
+            except Exception as e:
+                # Drop the session; it may be the cause (timeouts, disconnects)
+                server = self._close(server)
+                self._schedule_retry(message, e)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    @staticmethod
+    def _close(server: Optional[smtplib.SMTP]) -> None:
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+        return None
+
 
 # Email templates
 
@@ -454,4 +758,5 @@ WAD2 Project Team
 
 # Initialize email service
 email_service = EmailService()
+mail_queue = MailQueue(email_service)
 
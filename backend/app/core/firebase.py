@@ -1,4 +1,4 @@
-from firebase_admin import credentials, firestore, initialize_app
+from firebase_admin import credentials, firestore, firestore_async, initialize_app
 import firebase_admin
 
 if not firebase_admin._apps:
@@ -6,3 +6,4 @@ if not firebase_admin._apps:
     initialize_app(cred)
 
 db = firestore.client()
+async_db = firestore_async.client()
@@ -0,0 +1,52 @@
+"""Periodic maintenance and reminder jobs run by the scheduler.
+
+Schedules are cron expressions in UTC (the app's users are on UTC+8).
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from .pet_care import persist_pet_decay
+from .reminder_fanout import fan_out_reminder
+from .scheduler import Scheduler
+from .task_purge import purge_archived_tasks
+
+
+async def pet_decay_job() -> int:
+    """Persist daily pet deterioration and reset soju counters."""
+    updated = await persist_pet_decay(datetime.now(timezone.utc))
+    print(f"Pet decay applied to {updated} pet(s)")
+    return updated
+
+
+async def task_purge_job() -> int:
+    """Permanently delete tasks archived for more than 30 days."""
+    deleted = await purge_archived_tasks()
+    if deleted:
+        print(f"Purged {deleted} archived task(s)")
+    return deleted
+
+
+async def daily_checkin_reminder_job() -> int:
+    """Remind users to do their daily wellness check-in."""
+    result = await asyncio.to_thread(fan_out_reminder, "daily_checkin")
+    print(f"Daily check-in reminders: {result.as_dict()}")
+    return result.recipients
+
+
+async def study_reminder_job() -> int:
+    """Remind users to start a study session."""
+    result = await asyncio.to_thread(fan_out_reminder, "study_reminder")
+    print(f"Study reminders: {result.as_dict()}")
+    return result.recipients
+
+
+def register_jobs(scheduler: Scheduler) -> None:
+    # Midnight UTC, when the soju counter's UTC day rolls over
+    scheduler.add_job("pet_decay", pet_decay_job, "0 0 * * *", jitter_seconds=30)
+    scheduler.add_job("task_purge", task_purge_job, "15 * * * *", jitter_seconds=120)
+    # 09:00 and 20:00 in UTC+8
+    scheduler.add_job("study_reminder", study_reminder_job, "0 1 * * *", jitter_seconds=60, lease_seconds=1800)
+    scheduler.add_job(
+        "daily_checkin_reminder", daily_checkin_reminder_job, "0 12 * * *", jitter_seconds=60, lease_seconds=1800
+    )
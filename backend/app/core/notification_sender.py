@@ -23,15 +23,29 @@ def _notifications_collection(uid: str):
     return _user_doc(uid).collection("notifications")
 
 
-def get_user_email(uid: str) -> Optional[str]:
-    """Get user's email address from Firebase Auth or user document."""
+def _get_user_data(uid: str) -> Optional[Dict[str, Any]]:
+    """Read the user's root document once; None if it does not exist."""
+    user_doc = _user_doc(uid).get()
+    return (user_doc.to_dict() or {}) if user_doc.exists else None
+
+
+def get_user_name(user_data: Optional[Dict[str, Any]]) -> str:
+    """Name to greet the user with in emails."""
+    user_data = user_data or {}
+    return user_data.get("displayName") or user_data.get("name") or "there"
+
+
+def get_user_email(uid: str, user_data: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Get user's email address from Firebase Auth or user document.
+
+    Pass ``user_data`` when the user document has already been read.
+    """
     try:
         # Try to get from user document first
-        user_doc = _user_doc(uid).get()
-        if user_doc.exists:
-            user_data = user_doc.to_dict() or {}
-            if "email" in user_data and user_data["email"]:
-                return user_data["email"]
+        if user_data is None:
+            user_data = _get_user_data(uid)
+        if user_data and user_data.get("email"):
+            return user_data["email"]
         
         # If not found in Firestore, get from Firebase Auth
         try:
@@ -48,32 +62,58 @@ def get_user_email(uid: str) -> Optional[str]:
         return None
 
 
-def get_user_notification_settings(uid: str) -> Dict[str, bool]:
+DEFAULT_NOTIFICATION_SETTINGS = {
+    "notifications": True,
+    "study_reminders": True,
+    "daily_checkin": True,
+    "achievement_notifications": False,
+    "social_updates": False,
+}
+
+
+def notification_settings_from(user_data: Optional[Dict[str, Any]]) -> Dict[str, bool]:
+    """Notification settings stored on a user document, with defaults filled in."""
+    settings = (user_data or {}).get("notification_settings") or {}
+    return {key: settings.get(key, default) for key, default in DEFAULT_NOTIFICATION_SETTINGS.items()}
+
+
+def get_user_notification_settings(uid: str, user_data: Optional[Dict[str, Any]] = None) -> Dict[str, bool]:
     """Get user's notification settings."""
     try:
-        user_doc = _user_doc(uid).get()
-        if user_doc.exists:
-            user_data = user_doc.to_dict() or {}
-            settings = user_data.get("notification_settings", {})
-            return {
-                "notifications": settings.get("notifications", True),
-                "study_reminders": settings.get("study_reminders", True),
-                "daily_checkin": settings.get("daily_checkin", True),
-                "achievement_notifications": settings.get("achievement_notifications", False),
-                "social_updates": settings.get("social_updates", False),
-            }
-        return {
-            "notifications": True,
-            "study_reminders": True,
-            "daily_checkin": True,
-            "achievement_notifications": False,
-            "social_updates": False,
-        }
+        if user_data is None:
+            user_data = _get_user_data(uid)
+        return notification_settings_from(user_data)
     except Exception as e:
         print(f"Error getting notification settings: {e}")
         return {}
 
 
+def daily_checkin_notification(now: datetime) -> Dict[str, Any]:
+    """In-app notification document for the daily check-in reminder."""
+    return {
+        "type": "daily_checkin",
+        "title": "Daily Wellness Check-in",
+        "message": "Don't forget to complete your daily check-in to maintain your streak!",
+        "is_read": False,
+        "created_at": now,
+        "action_url": "/checkin",
+        "metadata": {},
+    }
+
+
+def study_reminder_notification(now: datetime) -> Dict[str, Any]:
+    """In-app notification document for the study session reminder."""
+    return {
+        "type": "study_reminder",
+        "title": "Study Session Time",
+        "message": "It's time to start your focused study session!",
+        "is_read": False,
+        "created_at": now,
+        "action_url": "/timer",
+        "metadata": {},
+    }
+
+
 def send_achievement_notification(
     uid: str,
     achievement_title: str,
@@ -96,7 +136,8 @@ def send_achievement_notification(
     """
     try:
         # Check if user has achievement notifications enabled
-        settings = get_user_notification_settings(uid)
+        user_data = _get_user_data(uid) or {}
+        settings = get_user_notification_settings(uid, user_data)
         if not settings.get("achievement_notifications"):
             print(f"Achievement notifications disabled for user {uid}")
             return False
@@ -120,20 +161,15 @@ def send_achievement_notification(
         print(f"✅ In-app notification created for user {uid}")
         
         # Send email notification
-        user_email = get_user_email(uid)
+        user_email = get_user_email(uid, user_data)
         if user_email:
-            # Get user name (you might want to store this in user document)
-            user_doc = _user_doc(uid).get()
-            user_name = "there"
-            if user_doc.exists:
-                user_data = user_doc.to_dict() or {}
-                user_name = user_data.get("displayName") or user_data.get("name") or "there"
+            user_name = get_user_name(user_data)
             
             subject, html_content, text_content = get_achievement_email_template(
                 user_name, achievement_title, achievement_icon, achievement_description
             )
             
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=user_email,
                 subject=subject,
                 html_content=html_content,
@@ -159,38 +195,26 @@ def send_daily_checkin_reminder(uid: str) -> bool:
     """
     try:
         # Check if user has daily check-in reminders enabled
-        settings = get_user_notification_settings(uid)
+        user_data = _get_user_data(uid) or {}
+        settings = get_user_notification_settings(uid, user_data)
         if not settings.get("daily_checkin"):
             print(f"Daily check-in reminders disabled for user {uid}")
             return False
         
         # Create in-app notification
-        now = datetime.now(timezone.utc)
-        notification_data = {
-            "type": "daily_checkin",
-            "title": "Daily Wellness Check-in",
-            "message": "Don't forget to complete your daily check-in to maintain your streak!",
-            "is_read": False,
-            "created_at": now,
-            "action_url": "/checkin",
-            "metadata": {},
-        }
+        notification_data = daily_checkin_notification(datetime.now(timezone.utc))
         
         _notifications_collection(uid).add(notification_data)
         print(f"✅ Daily check-in notification created for user {uid}")
         
         # Send email notification
-        user_email = get_user_email(uid)
+        user_email = get_user_email(uid, user_data)
         if user_email:
-            user_doc = _user_doc(uid).get()
-            user_name = "there"
-            if user_doc.exists:
-                user_data = user_doc.to_dict() or {}
-                user_name = user_data.get("displayName") or user_data.get("name") or "there"
+            user_name = get_user_name(user_data)
             
             subject, html_content, text_content = get_daily_checkin_reminder_template(user_name)
             
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=user_email,
                 subject=subject,
                 html_content=html_content,
@@ -216,38 +240,26 @@ def send_study_reminder(uid: str) -> bool:
     """
     try:
         # Check if user has study reminders enabled
-        settings = get_user_notification_settings(uid)
+        user_data = _get_user_data(uid) or {}
+        settings = get_user_notification_settings(uid, user_data)
         if not settings.get("study_reminders"):
             print(f"Study reminders disabled for user {uid}")
             return False
         
         # Create in-app notification
-        now = datetime.now(timezone.utc)
-        notification_data = {
-            "type": "study_reminder",
-            "title": "Study Session Time",
-            "message": "It's time to start your focused study session!",
-            "is_read": False,
-            "created_at": now,
-            "action_url": "/timer",
-            "metadata": {},
-        }
+        notification_data = study_reminder_notification(datetime.now(timezone.utc))
         
         _notifications_collection(uid).add(notification_data)
         print(f"✅ Study reminder notification created for user {uid}")
         
         # Send email notification
-        user_email = get_user_email(uid)
+        user_email = get_user_email(uid, user_data)
         if user_email:
-            user_doc = _user_doc(uid).get()
-            user_name = "there"
-            if user_doc.exists:
-                user_data = user_doc.to_dict() or {}
-                user_name = user_data.get("displayName") or user_data.get("name") or "there"
+            user_name = get_user_name(user_data)
             
             subject, html_content, text_content = get_study_reminder_template(user_name)
             
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=user_email,
                 subject=subject,
                 html_content=html_content,
@@ -275,7 +287,8 @@ def send_social_update(uid: str, friend_name: str = "A friend", action: str = "c
     """
     try:
         # Check if user has social updates enabled
-        settings = get_user_notification_settings(uid)
+        user_data = _get_user_data(uid) or {}
+        settings = get_user_notification_settings(uid, user_data)
         if not settings.get("social_updates"):
             print(f"Social updates disabled for user {uid}")
             return False
@@ -299,15 +312,11 @@ def send_social_update(uid: str, friend_name: str = "A friend", action: str = "c
         print(f"✅ Social update notification created for user {uid}")
         
         # Send email notification
-        user_email = get_user_email(uid)
+        user_email = get_user_email(uid, user_data)
         if user_email:
-            user_doc = _user_doc(uid).get()
-            user_name = "there"
-            if user_doc.exists:
-                user_data = user_doc.to_dict() or {}
-                user_name = user_data.get("displayName") or user_data.get("name") or "there"
+            user_name = get_user_name(user_data)
             
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=user_email,
                 subject=f"🎉 {friend_name} {action}",
                 html_content=f"""
@@ -380,7 +389,7 @@ def send_social_update(uid: str, friend_name: str = "A friend", action: str = "c
                 """,
                 text_content=f"Hi {user_name},\n\n{friend_name} {action}!\n\nCheck out what's happening in your social hub.\n\nBest regards,\nWAD2 Project Team"
             )
-            print(f"✅ Social update email sent to {user_email}")
+            print(f"✅ Social update email queued for {user_email}")
         
         return True
         
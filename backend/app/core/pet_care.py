@@ -0,0 +1,101 @@
+"""Daily pet deterioration and soju counter reset.
+
+Pets lose ``DAILY_DETERIORATION`` happiness and health per day since their
+``last_updated`` timestamp, and the daily soju counter resets when the UTC date
+changes. ``decay_pet_status`` is pure, so ``GET /profile/pet-status`` can
+show the current values without writing. The ``pet_decay`` scheduler job
+persists them for every living pet once a day.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from google.cloud.firestore import FieldFilter
+
+from . import repository as repo
+
+# Deteriorate 15 points per day (requires feeding daily)
+DAILY_DETERIORATION = 15
+
+
+def calculate_daily_deterioration(last_updated, current_time):
+    """Calculate how much stats should deteriorate based on days passed"""
+    if not last_updated:
+        return 0
+
+    # Calculate days passed
+    time_diff = current_time - last_updated
+    days_passed = time_diff.total_seconds() / (24 * 60 * 60)
+
+    return int(days_passed * DAILY_DETERIORATION)
+
+
+def _needs_soju_reset(pet_status: Dict[str, Any], now: datetime) -> bool:
+    soju_last_reset = pet_status.get("soju_last_reset")
+    if not soju_last_reset:
+        return True
+    last_reset_date = (
+        soju_last_reset.date()
+        if hasattr(soju_last_reset, "date")
+        else datetime.fromisoformat(str(soju_last_reset)).date()
+    )
+    return last_reset_date < now.date()
+
+
+def decay_pet_status(pet_status: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+    """Return the pet status as of ``now``, or ``None`` if nothing changed.
+
+    ``last_updated`` only moves forward by the whole points that were applied,
+    so leftover fractions of a day still count towards the next point.
+    """
+    last_updated = pet_status.get("last_updated")
+    needs_soju_reset = _needs_soju_reset(pet_status, now)
+
+    if last_updated and not pet_status.get("is_dead", False):
+        deterioration = calculate_daily_deterioration(last_updated, now)
+
+        if deterioration > 0 or needs_soju_reset:
+            new_happiness = max(0, pet_status.get("happiness", 100) - deterioration)
+            new_health = max(0, pet_status.get("health", 100) - deterioration)
+
+            return {
+                "happiness": new_happiness,
+                "health": new_health,
+                "last_updated": last_updated + timedelta(days=deterioration / DAILY_DETERIORATION),
+                # Check if pet died
+                "is_dead": new_happiness == 0 or new_health == 0,
+                "soju_count": 0 if needs_soju_reset else pet_status.get("soju_count", 0),
+                "soju_last_reset": now if needs_soju_reset else pet_status.get("soju_last_reset"),
+            }
+    elif needs_soju_reset:
+        # Reset soju counter even if no deterioration
+        return {**pet_status, "soju_count": 0, "soju_last_reset": now}
+
+    return None
+
+
+async def persist_pet_decay(now: datetime) -> int:
+    """Apply ``decay_pet_status`` to every living pet. Returns pets updated."""
+    query = (
+        repo.users_collection()
+        .where(filter=FieldFilter("pet_status.is_dead", "==", False))
+        .select(["pet_status"])
+    )
+    updated = 0
+    batch = repo.batch()
+    pending = 0
+    async for user in query.stream():
+        pet_status = (user.to_dict() or {}).get("pet_status") or {}
+        new_status = decay_pet_status(pet_status, now)
+        if new_status is None:
+            continue
+        batch.set(user.reference, {"pet_status": new_status}, merge=True)
+        pending += 1
+        updated += 1
+        if pending == repo.BATCH_LIMIT:
+            await batch.commit()
+            batch = repo.batch()
+            pending = 0
+    if pending:
+        await batch.commit()
+    return updated
@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 class AnimationStates(Enum):
     """Animation states for the pet"""
@@ -9,3 +9,34 @@ class AnimationStates(Enum):
     GRABBED = "grabbed"
     FALLING = "falling"
     LANDED = "landed"
+
+
+# Sprite sheet rows for each animation, served by /pet/config
+# Format: { row, frames, fps, loop, colStart }
+ANIMATION_TABLE = {
+    "idle":     {"row": 0, "frames": 8, "fps": 6,  "loop": True,  "colStart": 0},
+    "idle2":    {"row": 1, "frames": 8, "fps": 6,  "loop": True,  "colStart": 0},
+    "clean":    {"row": 2, "frames": 8, "fps": 8,  "loop": True,  "colStart": 0},
+    "clean2":   {"row": 3, "frames": 8, "fps": 8,  "loop": True,  "colStart": 0},
+    "walk":     {"row": 4, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
+    "walk2":    {"row": 5, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
+    "walk_left":  {"row": 4, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
+    "walk_right": {"row": 5, "frames": 8, "fps": 10, "loop": True,  "colStart": 0},
+    "sleep":    {"row": 6, "frames": 6, "fps": 5,  "loop": True,  "colStart": 0},
+    "grabbed":  {"row": 7, "frames": 6, "fps": 8,  "loop": True,  "colStart": 0},
+    "jump":     {"row": 8, "frames": 8, "fps": 12, "loop": False, "colStart": 0},
+    "falling":  {"row": 9, "frames": 8, "fps": 12, "loop": True,  "colStart": 0},
+    "scared":   {"row": 9, "frames": 8, "fps": 10, "loop": False, "colStart": 0},
+    "idle_to_sleep": {"row": 6, "frames": 3, "fps": 5, "loop": False, "colStart": 0},
+    "sleep_to_idle": {"row": 6, "frames": 3, "fps": 5, "loop": False, "colStart": 3},
+}
+
+
+def _animation_names():
+    names = [state.value for state in AnimationStates]
+    return names + [name for name in ANIMATION_TABLE if name not in names]
+
+
+# Numeric animation ids: AnimationStates first, then the rest of the table.
+# The vector engine's animation codes and binary frames both use these.
+AnimationId = IntEnum("AnimationId", [(name.upper(), code) for code, name in enumerate(_animation_names())])
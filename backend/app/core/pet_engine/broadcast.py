@@ -0,0 +1,157 @@
+"""Delta-compressed pet state broadcasting.
+
+Each Socket.IO room gets a stream of messages for the pet it is watching:
+
+- ``pet_update``: a keyframe with the full state, sent when a client joins,
+  every ``KEYFRAME_INTERVAL_TICKS`` ticks while the state keeps changing,
+  and on demand (e.g. grab/release).
+- ``pet_delta``: only the fields that changed since the previous message.
+
+Every message carries ``seq``, which increases by one per message in the
+room. A client that sees a gap ignores deltas until the next keyframe.
+Ticks where nothing changed (a sleeping or idle pet) send nothing.
+Members that joined as binary get a full ``codec`` frame of the same state
+and ``seq`` instead.
+
+The broadcaster only builds messages; the caller emits them.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Tuple
+
+# 5 seconds at the 10 Hz update rate
+KEYFRAME_INTERVAL_TICKS = 50
+# Sub-pixel movement is invisible, so it does not count as a change
+POSITION_DECIMALS = 1
+
+Message = Tuple[str, Dict[str, Any]]
+
+_MISSING = object()
+
+
+def quantize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Round float fields so sub-pixel jitter is not reported as a change."""
+    return {
+        key: round(value, POSITION_DECIMALS) if isinstance(value, float) else value
+        for key, value in state.items()
+    }
+
+
+def diff_state(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of ``current`` that are new or differ from ``previous``."""
+    return {key: value for key, value in current.items() if previous.get(key, _MISSING) != value}
+
+
+@dataclass
+class RoomStream:
+    seq: int = 0
+    last_state: Optional[Dict[str, Any]] = None
+    ticks_since_keyframe: int = 0
+    members: Set[str] = field(default_factory=set)
+    binary_members: Set[str] = field(default_factory=set)
+
+
+class PetBroadcaster:
+    """Tracks per-room state and sequence numbers for pet updates."""
+
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL_TICKS):
+        self.keyframe_interval = keyframe_interval
+        self._rooms: Dict[str, RoomStream] = {}
+        self._room_by_sid: Dict[str, str] = {}
+        # Metrics
+        self.keyframes = 0
+        self.deltas = 0
+        self.unchanged = 0
+
+    def join(self, sid: str, room: str, state: Dict[str, Any], binary: bool = False) -> Dict[str, Any]:
+        """Register ``sid`` in ``room`` and return the keyframe payload to send it.
+
+        The keyframe is the state the room last saw, with the room's current
+        ``seq``, so the new client can apply the next delta directly.
+        """
+        self.leave(sid)
+        stream = self._rooms.setdefault(room, RoomStream())
+        stream.members.add(sid)
+        if binary:
+            stream.binary_members.add(sid)
+        self._room_by_sid[sid] = room
+        if stream.last_state is None:
+            stream.last_state = quantize_state(state)
+        return {**stream.last_state, "seq": stream.seq, "keyframe": True}
+
+    def leave(self, sid: str) -> Optional[str]:
+        """Forget ``sid``; rooms without members are dropped. Returns the room left."""
+        room = self._room_by_sid.pop(sid, None)
+        if room is None:
+            return None
+        stream = self._rooms.get(room)
+        if stream is not None:
+            stream.members.discard(sid)
+            stream.binary_members.discard(sid)
+            if not stream.members:
+                del self._rooms[room]
+        return room
+
+    def room_of(self, sid: str) -> Optional[str]:
+        return self._room_by_sid.get(sid)
+
+    def has_members(self, room: str) -> bool:
+        stream = self._rooms.get(room)
+        return bool(stream and stream.members)
+
+    def encodings(self, room: str) -> Tuple[bool, bool]:
+        """Whether ``room`` has (JSON, binary) members."""
+        stream = self._rooms.get(room)
+        if stream is None:
+            return False, False
+        binary = len(stream.binary_members)
+        return len(stream.members) > binary, binary > 0
+
+    def snapshot(self, room: str) -> Optional[Dict[str, Any]]:
+        """The full state last sent to ``room``, with its ``seq``."""
+        stream = self._rooms.get(room)
+        if stream is None or stream.last_state is None:
+            return None
+        return {**stream.last_state, "seq": stream.seq}
+
+    def next_message(self, room: str, state: Dict[str, Any], force_keyframe: bool = False) -> Optional[Message]:
+        """The message to emit to ``room`` for ``state``, or ``None`` if there is none.
+
+        Rooms nobody has joined get nothing.
+        """
+        stream = self._rooms.get(room)
+        if stream is None or not stream.members:
+            return None
+
+        current = quantize_state(state)
+        stream.ticks_since_keyframe += 1
+        if stream.last_state is None:
+            force_keyframe = True
+        changes = {} if force_keyframe else diff_state(stream.last_state, current)
+
+        if not force_keyframe and not changes:
+            self.unchanged += 1
+            return None
+
+        stream.seq += 1
+        stream.last_state = current
+        if force_keyframe or stream.ticks_since_keyframe >= self.keyframe_interval:
+            stream.ticks_since_keyframe = 0
+            self.keyframes += 1
+            return "pet_update", {**current, "seq": stream.seq, "keyframe": True}
+
+        self.deltas += 1
+        return "pet_delta", {**changes, "seq": stream.seq}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rooms": len(self._rooms),
+            "clients": len(self._room_by_sid),
+            "binary_clients": sum(len(stream.binary_members) for stream in self._rooms.values()),
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "unchanged_ticks": self.unchanged,
+        }
+
+
+pet_broadcaster = PetBroadcaster()
@@ -0,0 +1,54 @@
+"""Fixed-timestep simulation clock.
+
+Pet physics moves by per-step velocities, so the simulation has to advance
+in equal steps no matter how often or how late the update loop wakes up.
+``SimulationClock.advance`` adds real elapsed time to an accumulator and
+returns how many whole steps to run. A loop that falls far behind (e.g.
+after the event loop was blocked) runs at most ``max_catch_up`` steps and
+drops the rest instead of spiralling.
+"""
+
+from typing import Any, Dict
+
+# 10 steps per second
+STEP_SECONDS = 0.1
+MAX_CATCH_UP_STEPS = 5
+
+
+class SimulationClock:
+    def __init__(self, step: float = STEP_SECONDS, max_catch_up: int = MAX_CATCH_UP_STEPS):
+        if step <= 0:
+            raise ValueError("step must be positive")
+        self.step = step
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        # Metrics
+        self.steps = 0
+        self.dropped_steps = 0
+
+    @property
+    def sim_time(self) -> float:
+        """Simulated seconds since the clock started."""
+        return self.steps * self.step
+
+    def advance(self, elapsed: float) -> int:
+        """Account for ``elapsed`` real seconds; returns the steps to run now."""
+        self.accumulator += max(0.0, elapsed)
+        due = int(self.accumulator / self.step)
+        self.accumulator -= due * self.step
+        if due > self.max_catch_up:
+            self.dropped_steps += due - self.max_catch_up
+            due = self.max_catch_up
+        self.steps += due
+        return due
+
+    def until_next_step(self) -> float:
+        """Real seconds until another step is due."""
+        return max(0.0, self.step - self.accumulator)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "step_seconds": self.step,
+            "steps": self.steps,
+            "dropped_steps": self.dropped_steps,
+        }
@@ -0,0 +1,71 @@
+"""Compact binary pet frames.
+
+Clients that connect with ``{encoding: "binary"}`` in their auth payload get
+``pet_frame`` events instead of ``pet_update`` / ``pet_delta``. Each event
+carries one fixed-layout little-endian frame with the full state:
+
+    version u8 | seq u32 | x f32 | y f32 | animation u8 | flags u8 | frame u16
+
+``animation`` is an ``AnimationId`` (listed under ``animation_ids`` in
+``/pet/config``) and flags bit 0 is ``is_grabbed``. Every frame is complete,
+so binary clients never wait for a keyframe after a gap.
+"""
+
+import struct
+from typing import Any, Dict
+
+from .animation_states import AnimationId
+
+FRAME_EVENT = "pet_frame"
+FRAME_VERSION = 1
+FRAME = struct.Struct("<BIffBBH")
+FRAME_FIELDS = ("version", "seq", "x", "y", "animation", "flags", "frame")
+FLAG_GRABBED = 0x01
+
+_ANIMATION_IDS = {animation.name.lower(): animation.value for animation in AnimationId}
+_ANIMATION_NAMES = {value: name for name, value in _ANIMATION_IDS.items()}
+
+
+def binary_room(room: str) -> str:
+    """Room of the binary clients watching the same pet as ``room``."""
+    return f"{room}:bin"
+
+
+def encode_frame(state: Dict[str, Any]) -> bytes:
+    """Pack a ``to_dict()``-shaped state with its ``seq`` into a frame."""
+    return FRAME.pack(
+        FRAME_VERSION,
+        state["seq"] & 0xFFFFFFFF,
+        state["x"],
+        state["y"],
+        _ANIMATION_IDS[state["animation"]],
+        FLAG_GRABBED if state["is_grabbed"] else 0,
+        state["frame"],
+    )
+
+
+def decode_frame(data: bytes) -> Dict[str, Any]:
+    """Inverse of ``encode_frame`` (floats come back as float32)."""
+    version, seq, x, y, animation, flags, frame = FRAME.unpack(data)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported pet frame version {version}")
+    return {
+        "seq": seq,
+        "x": x,
+        "y": y,
+        "animation": _ANIMATION_NAMES[animation],
+        "frame": frame,
+        "is_grabbed": bool(flags & FLAG_GRABBED),
+    }
+
+
+def frame_format() -> Dict[str, Any]:
+    """The frame layout, published through ``/pet/config``."""
+    return {
+        "event": FRAME_EVENT,
+        "version": FRAME_VERSION,
+        "struct": FRAME.format,
+        "size": FRAME.size,
+        "fields": list(FRAME_FIELDS),
+        "flags": {"is_grabbed": FLAG_GRABBED},
+    }
@@ -0,0 +1,139 @@
+"""Encode-once fan-out of pet events.
+
+Every pet event of a tick is serialized once, with orjson for the JSON part,
+into Socket.IO packet parts. Each part is wrapped in an Engine.IO packet,
+which caches its own encoding, so every socket in the room is sent the same
+bytes. ``PetFanout`` times serialization and fan-out separately for each
+tick and reports them through ``/api/metrics``.
+
+In a cluster (``pet_engine/node.py``) the leader encodes and publishes the
+parts, and every node sends them to its own sockets with ``send_encoded``.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import engineio
+import orjson
+import socketio
+
+
+class _OrjsonJSON:
+    """The parts of the ``json`` module Socket.IO packets use, backed by orjson."""
+
+    @staticmethod
+    def dumps(obj, **_kwargs) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    @staticmethod
+    def loads(data, **_kwargs):
+        return orjson.loads(data)
+
+
+class OrjsonPacket(socketio.packet.Packet):
+    json = _OrjsonJSON
+
+
+EncodedEvent = List[Union[str, bytes]]
+# (room, event, payload)
+RoomMessage = Tuple[str, str, Any]
+# (room, encoded event)
+EncodedMessage = Tuple[str, EncodedEvent]
+
+
+def encode_event(event: str, payload: Any, namespace: str = "/") -> EncodedEvent:
+    """Socket.IO packet parts for ``event``: one string, plus one per binary attachment.
+
+    Pet payloads are either a flat JSON object or one binary frame, so plain
+    JSON events skip the packet class's search for nested attachments.
+    """
+    if not isinstance(payload, (bytes, bytearray)):
+        prefix = str(socketio.packet.EVENT) if namespace == "/" else f"{socketio.packet.EVENT}{namespace},"
+        return [prefix + _OrjsonJSON.dumps([event, payload])]
+    encoded = OrjsonPacket(socketio.packet.EVENT, namespace=namespace, data=[event, payload]).encode()
+    return encoded if isinstance(encoded, list) else [encoded]
+
+
+@dataclass
+class TimingStat:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "last_ms": round(self.last * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PetFanout:
+    """Sends each tick's pet events, encoding each one once."""
+
+    def __init__(self, namespace: str = "/"):
+        self.namespace = namespace
+        self.serialize = TimingStat()
+        self.fanout = TimingStat()
+        # Metrics
+        self.ticks = 0
+        self.messages = 0
+        self.packets_sent = 0
+        self.bytes_encoded = 0
+
+    def encode(self, messages: Sequence[RoomMessage]) -> List[EncodedMessage]:
+        """Encode every ``(room, event, payload)`` once."""
+        started = time.perf_counter()
+        encoded = []
+        for room, event, payload in messages:
+            parts = encode_event(event, payload, self.namespace)
+            self.bytes_encoded += sum(len(part) for part in parts)
+            encoded.append((room, parts))
+        self.ticks += 1
+        self.messages += len(messages)
+        self.serialize.record(time.perf_counter() - started)
+        return encoded
+
+    async def send_encoded(self, sio: socketio.AsyncServer, encoded: Sequence[EncodedMessage]) -> None:
+        """Send already encoded events to the sockets of each room on this node."""
+        started = time.perf_counter()
+        sends = []
+        for room, parts in encoded:
+            participants = list(sio.manager.get_participants(self.namespace, room))
+            if not participants:
+                continue
+            packets = [engineio.packet.Packet(engineio.packet.MESSAGE, part) for part in parts]
+            for _sid, eio_sid in participants:
+                for packet in packets:
+                    sends.append(sio.eio.send_packet(eio_sid, packet))
+        if sends:
+            await asyncio.gather(*sends)
+        self.packets_sent += len(sends)
+        self.fanout.record(time.perf_counter() - started)
+
+    async def broadcast(self, sio: socketio.AsyncServer, messages: Sequence[RoomMessage]) -> None:
+        """Encode every ``(room, event, payload)`` once and send it to the room's sockets."""
+        if messages:
+            await self.send_encoded(sio, self.encode(messages))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "messages": self.messages,
+            "packets_sent": self.packets_sent,
+            "bytes_encoded": self.bytes_encoded,
+            "serialize": self.serialize.as_dict(),
+            "fanout": self.fanout.as_dict(),
+        }
+
+
+pet_fanout = PetFanout()
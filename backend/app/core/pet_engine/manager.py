@@ -0,0 +1,168 @@
+"""Registry of per-user pet simulations.
+
+Each owner (a Firebase uid, or the socket id of an unauthenticated
+connection) has its own pet, a slot in a shared ``PetEngine``. The update
+loop feeds real elapsed time to a ``SimulationClock``, and every fixed step
+it yields runs one vectorized step over the pets that have a connected
+viewer;
+pets nobody has watched or touched for ``PET_IDLE_SECONDS`` are dropped and
+start fresh when their owner returns.
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .clock import SimulationClock
+from .vector_engine import PetEngine, PetHandle
+
+PET_IDLE_SECONDS = float(os.getenv("PET_IDLE_SECONDS", "300"))
+# Seed the simulation's random behaviour, e.g. to replay a session
+PET_SIM_SEED = int(os.environ["PET_SIM_SEED"]) if os.getenv("PET_SIM_SEED") else None
+# "stream": step pets at 10 Hz and stream deltas (broadcast.py)
+# "transitions": emit only segment changes for clients to extrapolate (transitions.py)
+PET_SYNC_MODE = os.getenv("PET_SYNC_MODE", "stream").lower()
+
+
+def pet_room(owner: str) -> str:
+    """Socket.IO room of the clients watching ``owner``'s pet."""
+    return f"pet:{owner}"
+
+
+@dataclass(slots=True)
+class PetEntry:
+    slot: int
+    last_active: float
+    sids: Set[str] = field(default_factory=set)
+
+
+class PetManager:
+    """Keeps one pet per owner and the sockets watching it."""
+
+    def __init__(
+        self,
+        idle_seconds: float = PET_IDLE_SECONDS,
+        engine: Optional[PetEngine] = None,
+        clock: Optional[SimulationClock] = None,
+    ):
+        self.idle_seconds = idle_seconds
+        self.engine = engine if engine is not None else PetEngine(seed=PET_SIM_SEED)
+        self.clock = clock if clock is not None else SimulationClock()
+        self._pets: Dict[str, PetEntry] = {}
+        self._owner_by_sid: Dict[str, str] = {}
+        # Metrics
+        self.created = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._pets)
+
+    def _entry(self, owner: str) -> PetEntry:
+        entry = self._pets.get(owner)
+        if entry is None:
+            entry = PetEntry(slot=self.engine.add(), last_active=time.monotonic())
+            self.engine.ticking[entry.slot] = False
+            self._pets[owner] = entry
+            self.created += 1
+        return entry
+
+    def get(self, owner: str) -> PetHandle:
+        """``owner``'s pet, created on first use."""
+        entry = self._entry(owner)
+        entry.last_active = time.monotonic()
+        return PetHandle(self.engine, entry.slot)
+
+    def reset(self, owner: str, canvas_width: int, canvas_height: int) -> PetHandle:
+        """Replace ``owner``'s pet with a fresh one for the given canvas."""
+        entry = self._entry(owner)
+        self.engine.remove(entry.slot)
+        entry.slot = self.engine.add(canvas_width, canvas_height)
+        self.engine.ticking[entry.slot] = bool(entry.sids)
+        entry.last_active = time.monotonic()
+        return PetHandle(self.engine, entry.slot)
+
+    def attach(self, sid: str, owner: str) -> PetHandle:
+        """Start streaming ``owner``'s pet to ``sid``."""
+        self.detach(sid)
+        entry = self._entry(owner)
+        entry.sids.add(sid)
+        entry.last_active = time.monotonic()
+        self.engine.ticking[entry.slot] = True
+        self._owner_by_sid[sid] = owner
+        return PetHandle(self.engine, entry.slot)
+
+    def detach(self, sid: str) -> Optional[str]:
+        """Stop streaming to ``sid``. Returns the owner it was watching."""
+        owner = self._owner_by_sid.pop(sid, None)
+        if owner is not None:
+            entry = self._pets.get(owner)
+            if entry is not None:
+                entry.sids.discard(sid)
+                entry.last_active = time.monotonic()
+                self.engine.ticking[entry.slot] = bool(entry.sids)
+        return owner
+
+    def remove(self, owner: str) -> None:
+        """Drop ``owner``'s pet now, e.g. when an anonymous socket disconnects."""
+        entry = self._pets.pop(owner, None)
+        if entry is not None:
+            self.engine.remove(entry.slot)
+            for sid in entry.sids:
+                self._owner_by_sid.pop(sid, None)
+
+    def owner_of(self, sid: str) -> Optional[str]:
+        return self._owner_by_sid.get(sid)
+
+    def sockets(self) -> Dict[str, str]:
+        """Owner watched by each attached socket."""
+        return dict(self._owner_by_sid)
+
+    def advance(self, elapsed: float) -> List[Tuple[str, PetHandle]]:
+        """Run the fixed steps due after ``elapsed`` real seconds.
+
+        Returns the watched pets, or nothing if no step was due.
+        """
+        steps = self.clock.advance(elapsed)
+        if not steps:
+            return []
+        for _ in range(steps):
+            self.engine.step(self.clock.step)
+        return [
+            (owner, PetHandle(self.engine, entry.slot))
+            for owner, entry in self._pets.items()
+            if entry.sids
+        ]
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Drop unwatched pets idle for longer than ``idle_seconds``."""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.idle_seconds
+        idle = [
+            owner for owner, entry in self._pets.items()
+            if not entry.sids and entry.last_active < cutoff
+        ]
+        for owner in idle:
+            self.engine.remove(self._pets.pop(owner).slot)
+        self.evicted += len(idle)
+        return idle
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "mode": "stream",
+            "pets": len(self._pets),
+            "watched_pets": sum(1 for entry in self._pets.values() if entry.sids),
+            "sockets": len(self._owner_by_sid),
+            "engine_capacity": self.engine.capacity,
+            **self.clock.stats(),
+            "created": self.created,
+            "evicted": self.evicted,
+        }
+
+
+if PET_SYNC_MODE == "transitions":
+    from .transitions import TransitionPetManager
+
+    pet_manager = TransitionPetManager(idle_seconds=PET_IDLE_SECONDS, seed=PET_SIM_SEED)
+else:
+    pet_manager = PetManager()
@@ -0,0 +1,101 @@
+"""Coalescing and rate limiting of ``move_pet`` drag events.
+
+Browsers send drag positions at mouse-move rate. ``MoveCoalescer`` keeps
+only the latest position of each socket until the next flush, which applies
+them once per simulation step, so a flood of events costs at most one write
+per step. Each socket also has a token bucket; events over its rate still
+replace the queued position (the newest one is where the drag is) and are
+counted as ``rate_limited``.
+
+``grab_pet`` toggles go through the same bucket, since each one forces a
+keyframe. One over the rate is held, newest state wins, and applied with
+the next flush rather than dropped, so a release is never lost.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+from ..throttle import TokenBucket
+
+# Sustained drag events per second per socket, and the burst allowed above that
+PET_MOVE_RATE = float(os.getenv("PET_MOVE_RATE", "60"))
+PET_MOVE_BURST = float(os.getenv("PET_MOVE_BURST", "30"))
+
+Position = Tuple[float, float]
+
+
+class MoveCoalescer:
+    """Latest drag position of each socket, behind a per-socket token bucket."""
+
+    def __init__(self, rate: float = PET_MOVE_RATE, burst: float = PET_MOVE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._pending: Dict[str, Position] = {}
+        self._pending_grabs: Dict[str, bool] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Metrics
+        self.received = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.grabs_deferred = 0
+
+    def _allow(self, sid: str) -> bool:
+        bucket = self._buckets.get(sid)
+        if bucket is None:
+            bucket = self._buckets[sid] = TokenBucket(self.rate, self.burst)
+        if bucket.allow():
+            return True
+        self.rate_limited += 1
+        return False
+
+    def submit(self, sid: str, x: float, y: float) -> bool:
+        """Queue ``sid``'s latest position. False if the socket is over its rate."""
+        self.received += 1
+        allowed = self._allow(sid)
+        if sid in self._pending:
+            self.coalesced += 1
+        self._pending[sid] = (x, y)
+        return allowed
+
+    def grab(self, sid: str, grabbed: bool) -> bool:
+        """Whether to apply ``sid``'s grab now; otherwise it is held for ``drain_grabs``."""
+        if self._allow(sid):
+            self._pending_grabs.pop(sid, None)
+            return True
+        self._pending_grabs[sid] = grabbed
+        self.grabs_deferred += 1
+        return False
+
+    def pop(self, sid: str) -> Optional[Position]:
+        """Take ``sid``'s queued position, e.g. to apply it before a release."""
+        return self._pending.pop(sid, None)
+
+    def drain(self) -> Dict[str, Position]:
+        """Take every queued position."""
+        pending, self._pending = self._pending, {}
+        self.flushed += len(pending)
+        return pending
+
+    def drain_grabs(self) -> Dict[str, bool]:
+        """Take every held grab state; apply them after the positions from ``drain``."""
+        grabs, self._pending_grabs = self._pending_grabs, {}
+        return grabs
+
+    def forget(self, sid: str) -> None:
+        self._pending.pop(sid, None)
+        self._pending_grabs.pop(sid, None)
+        self._buckets.pop(sid, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "rate_limited": self.rate_limited,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "pending": len(self._pending),
+            "grabs_deferred": self.grabs_deferred,
+        }
+
+
+move_coalescer = MoveCoalescer()
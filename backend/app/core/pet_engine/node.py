@@ -0,0 +1,235 @@
+"""Single-node and clustered operation of the pet simulation.
+
+Without a message queue the node owns everything: socket events and HTTP
+calls change the local simulation directly and the update loop fans frames
+out to local sockets.
+
+With ``SOCKETIO_MESSAGE_QUEUE`` set (``core/cluster.py``) any number of
+nodes share the backend, and one of them, elected with a renewable lease,
+runs the simulation:
+
+- Every node forwards the socket events and pet API calls it receives to
+  the leader as commands on ``pet:commands``.
+- The leader encodes each tick's frames once and publishes them on
+  ``pet:frames`` with the changed pet states. Every node sends the frames
+  to its own sockets, and followers keep the states as a read-only mirror
+  for ``GET /pet/state``.
+- A newly elected leader asks every node to announce its sockets again, so
+  the pets those sockets watch resume. Pet positions restart from a fresh
+  state after a failover.
+"""
+
+import asyncio
+import base64
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import orjson
+import socketio
+
+from ..cluster import NODE_ID, LeaderElection, create_backend
+from .fanout import EncodedMessage, RoomMessage, pet_fanout
+from .manager import PET_IDLE_SECONDS
+
+COMMANDS_CHANNEL = "pet:commands"
+FRAMES_CHANNEL = "pet:frames"
+LEADER_KEY = "pet:leader"
+MIRROR_PRUNE_SECONDS = 30
+
+Apply = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def _pack_parts(parts: Sequence) -> List:
+    return [{"b": base64.b64encode(part).decode("ascii")} if isinstance(part, bytes) else part for part in parts]
+
+
+def _unpack_parts(parts: Sequence) -> List:
+    return [base64.b64decode(part["b"]) if isinstance(part, dict) else part for part in parts]
+
+
+class PetNode:
+    """Routes pet commands to the simulation and its frames to sockets."""
+
+    def __init__(self, backend=None, fanout=pet_fanout, idle_seconds: float = 300, node_id: str = NODE_ID):
+        self.backend = backend
+        self.node_id = node_id
+        self.fanout = fanout
+        self.idle_seconds = idle_seconds
+        self.sio: Optional[socketio.AsyncServer] = None
+        self._apply: Optional[Apply] = None
+        self._simulation: Optional[Callable[[], Awaitable[None]]] = None
+        self._simulation_task: Optional[asyncio.Task] = None
+        self._background: Sequence[Callable[[], Awaitable[None]]] = ()
+        self._tasks: List[asyncio.Task] = []
+        self.election = (
+            LeaderElection(backend, LEADER_KEY, self._on_elected, self._on_deposed, holder=node_id)
+            if backend is not None else None
+        )
+        # Attach commands of this node's sockets, replayed for a new leader
+        self.local: Dict[str, Dict[str, Any]] = {}
+        # owner -> (state, received at), filled from the leader's frames
+        self.mirror: Dict[str, tuple] = {}
+        self._last_prune = time.monotonic()
+        # Metrics
+        self.commands_forwarded = 0
+        self.commands_applied = 0
+        self.frames_published = 0
+        self.frames_relayed = 0
+
+    @property
+    def clustered(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.election is None or self.election.is_leader
+
+    def bind(
+        self,
+        sio: socketio.AsyncServer,
+        apply: Apply,
+        simulation: Callable[[], Awaitable[None]],
+        background: Sequence[Callable[[], Awaitable[None]]] = (),
+    ) -> None:
+        """Wire the node to its server, command handler and update loop.
+
+        ``background`` loops run on every node, leader or not.
+        """
+        self.sio = sio
+        self._apply = apply
+        self._simulation = simulation
+        self._background = background
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(loop()) for loop in self._background]
+        if not self.clustered:
+            self._start_simulation()
+            return
+        self._tasks += [
+            asyncio.create_task(self._listen_commands()),
+            asyncio.create_task(self._listen_frames()),
+            asyncio.create_task(self.election.run()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.election is not None:
+            await self.election.resign()
+        self._stop_simulation()
+
+    # Leadership
+
+    def _start_simulation(self) -> None:
+        if self._simulation_task is None:
+            self._simulation_task = asyncio.create_task(self._simulation())
+
+    def _stop_simulation(self) -> None:
+        if self._simulation_task is not None:
+            self._simulation_task.cancel()
+            self._simulation_task = None
+
+    async def _on_elected(self) -> None:
+        self.mirror.clear()
+        self._start_simulation()
+        # Sockets attached while another node led are not in our registry
+        await self._publish(COMMANDS_CHANNEL, {"name": "announce", "args": {}})
+
+    async def _on_deposed(self) -> None:
+        self._stop_simulation()
+        await self._apply("detach_all", {})
+
+    # Commands
+
+    async def command(self, name: str, **args) -> None:
+        """Run ``name`` on the simulation, here or on the leader."""
+        if name == "attach":
+            self.local[args["sid"]] = args
+        elif name == "detach":
+            self.local.pop(args["sid"], None)
+        if self.is_leader:
+            self.commands_applied += 1
+            await self._apply(name, args)
+        else:
+            self.commands_forwarded += 1
+            await self._publish(COMMANDS_CHANNEL, {"name": name, "args": args})
+
+    async def _listen_commands(self) -> None:
+        async for message in self.backend.subscribe(COMMANDS_CHANNEL):
+            try:
+                data = orjson.loads(message)
+                if data["name"] == "announce":
+                    for args in list(self.local.values()):
+                        await self.command("attach", **args)
+                elif self.is_leader and data["node"] != self.node_id:
+                    self.commands_applied += 1
+                    await self._apply(data["name"], data["args"])
+            except Exception as e:
+                print(f"Pet command error: {e}")
+
+    # Frames
+
+    async def send(self, messages: Sequence[RoomMessage], states: Optional[Dict[str, Dict]] = None) -> None:
+        """Send ``messages`` to their rooms on every node (leader only)."""
+        if not messages:
+            return
+        encoded = self.fanout.encode(messages)
+        if self.clustered:
+            self.frames_published += 1
+            await self._publish(FRAMES_CHANNEL, {
+                "frames": [(room, _pack_parts(parts)) for room, parts in encoded],
+                "states": states or {},
+            })
+        await self.fanout.send_encoded(self.sio, encoded)
+
+    async def _listen_frames(self) -> None:
+        async for message in self.backend.subscribe(FRAMES_CHANNEL):
+            try:
+                data = orjson.loads(message)
+                if data["node"] == self.node_id:
+                    continue
+                encoded: List[EncodedMessage] = [(room, _unpack_parts(parts)) for room, parts in data["frames"]]
+                await self.fanout.send_encoded(self.sio, encoded)
+                self.frames_relayed += 1
+                self._update_mirror(data["states"])
+            except Exception as e:
+                print(f"Pet frame relay error: {e}")
+
+    def _update_mirror(self, states: Dict[str, Dict]) -> None:
+        now = time.monotonic()
+        for owner, state in states.items():
+            self.mirror[owner] = (state, now)
+        if now - self._last_prune >= MIRROR_PRUNE_SECONDS:
+            cutoff = now - self.idle_seconds
+            self.mirror = {owner: entry for owner, entry in self.mirror.items() if entry[1] >= cutoff}
+            self._last_prune = now
+
+    def mirrored_state(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Last state of ``owner``'s pet published by the leader."""
+        entry = self.mirror.get(owner)
+        return entry[0] if entry else None
+
+    async def _publish(self, channel: str, data: Dict[str, Any]) -> None:
+        data["node"] = self.node_id
+        try:
+            await self.backend.publish(channel, orjson.dumps(data))
+        except Exception as e:
+            print(f"Pet publish to {channel} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "node": self.node_id,
+            "clustered": self.clustered,
+            "leader": self.is_leader,
+            "elections": self.election.elections if self.election else 0,
+            "local_sockets": len(self.local),
+            "mirrored_pets": len(self.mirror),
+            "commands_forwarded": self.commands_forwarded,
+            "commands_applied": self.commands_applied,
+            "frames_published": self.frames_published,
+            "frames_relayed": self.frames_relayed,
+        }
+
+
+pet_node = PetNode(create_backend(), idle_seconds=PET_IDLE_SECONDS)
@@ -1,12 +1,23 @@
-from typing import Dict
+from typing import Dict, Optional
 import random
 from datetime import datetime
-import time
+
+# Transition timers compare sums of float steps, e.g. 10 x 0.1 vs 1.0
+TIME_EPSILON = 1e-9
 
 class PetState:
-    """Manages the pet's state with physics similar to InteractablePet"""
+    """Manages the pet's state with physics similar to InteractablePet
+
+    Velocities are in pixels per update, so ``update_position`` is meant to
+    be called with a fixed ``dt`` (see ``clock.SimulationClock``). Timers run
+    on simulated time, and ``seed`` makes the random behaviour replayable.
+    """
     
-    def __init__(self, canvas_width: int = 800, canvas_height: int = 600):
+    def __init__(self, canvas_width: int = 800, canvas_height: int = 600, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        # Simulated seconds, advanced by update_position
+        self.sim_time: float = 0.0
+
         # Position
         self.x: float = 100
         self.y: float = canvas_height - 100
@@ -30,7 +41,7 @@ class PetState:
         self.is_roaming = False
         self.roam_target_x = None
         self.roam_timer = 0
-        self.roam_cooldown = random.randint(3, 8)
+        self.roam_cooldown = self.rng.randint(3, 8)
         
         # Sleep behavior
         self.is_sleeping = False
@@ -99,14 +110,16 @@ class PetState:
     def update_position(self, dt: float = 0.1):
         """Main update loop (combines update() and on_tick() logic)"""
         
+        self.sim_time += dt
+
         # Don't update if grabbed (like InteractablePet event handlers)
         if self.is_grabbed:
             return
         
         # Handle animation transitions
-        if self.transition_start_time:
-            elapsed = time.time() - self.transition_start_time
-            if elapsed >= self.transition_duration:
+        if self.transition_start_time is not None:
+            elapsed = self.sim_time - self.transition_start_time
+            if elapsed >= self.transition_duration - TIME_EPSILON:
                 self.finish_transition()
             return
         
@@ -141,15 +154,15 @@ class PetState:
     
     def start_roaming(self):
         """Start walking to a random location with sprite animations"""
-        self.roam_target_x = random.randint(100, self.canvas_width - 100)
+        self.roam_target_x = self.rng.randint(100, self.canvas_width - 100)
         self.is_roaming = True
 
         # Set animation and velocity based on direction
         # Use walk (row 4) or walk2 (row 5) animations
         if self.roam_target_x > self.x:
-            self.current_animation = random.choice(["walk_right", "walk2"])
+            self.current_animation = self.rng.choice(["walk_right", "walk2"])
         else:
-            self.current_animation = random.choice(["walk_left", "walk"])
+            self.current_animation = self.rng.choice(["walk_left", "walk"])
 
         self.reset_movement()
     
@@ -160,19 +173,19 @@ class PetState:
             self.is_roaming = False
             self.v_x = 0
             # Randomly choose idle animation (idle, idle2, or clean)
-            self.current_animation = random.choice(["idle", "idle2", "clean", "clean2"])
+            self.current_animation = self.rng.choice(["idle", "idle2", "clean", "clean2"])
             self.reset_movement()
             self.roam_timer = 0
-            self.roam_cooldown = random.randint(3, 8)
+            self.roam_cooldown = self.rng.randint(3, 8)
 
             # 30% chance to sleep after walking
-            if random.random() < 0.3:
+            if self.rng.random() < 0.3:
                 self.go_to_sleep()
     
     def go_to_sleep(self):
         """Transition to sleep"""
         self.current_animation = "idle_to_sleep"
-        self.transition_start_time = time.time()
+        self.transition_start_time = self.sim_time
         self.transition_duration = 1.0
     
     def finish_transition(self):
@@ -180,7 +193,7 @@ class PetState:
         if self.current_animation == "idle_to_sleep":
             self.current_animation = "sleep"
             self.is_sleeping = True
-            self.sleep_duration = random.randint(5, 10)
+            self.sleep_duration = self.rng.randint(5, 10)
             self.sleep_timer = 0
         elif self.current_animation == "sleep_to_idle":
             self.current_animation = "idle"
@@ -192,7 +205,7 @@ class PetState:
         """Wake up from sleep"""
         self.is_sleeping = False
         self.current_animation = "sleep_to_idle"
-        self.transition_start_time = time.time()
+        self.transition_start_time = self.sim_time
         self.transition_duration = 1.0
     
     def set_grabbed(self, grabbed: bool):
@@ -0,0 +1,393 @@
+"""Event-driven pet simulation for client-side prediction.
+
+With ``PET_SYNC_MODE=transitions`` the server stops streaming positions at
+10 Hz. Each pet's behaviour is a sequence of segments (rest, walk to a
+target, fall, nap ...). Each segment has a closed-form motion, and the
+server only emits ``pet_transition`` when a new segment starts:
+
+    {"seq", "t", "animation", "x", "y", "vx", "ay", "target_x",
+     "duration", "floor_y", "is_grabbed"}
+
+``t`` is the segment start in epoch milliseconds and ``duration`` is the
+number of seconds until the server's next transition (``null``: until the
+user does something). Clients extrapolate from it:
+
+    x(τ) = x + vx·τ            clamped to [0, canvas_width - pet size]
+    y(τ) = y + ½·ay·τ²         clamped to floor_y
+
+``vx`` and ``ay`` are in px/s and px/s². They are the ``/pet/config``
+physics block (per-tick ``walk_speed`` and ``gravity``) scaled by its
+``tick_rate``. Segment ends are kept in a timer heap, so the server wakes
+only when some pet's next transition is due.
+
+The rules follow ``PetState``: rest for 3-8 s, walk to a random target,
+nap 30% of the time (1 s transitions around 5-10 s of sleep), and fall
+when released above the floor.
+"""
+
+import asyncio
+import heapq
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .clock import STEP_SECONDS
+from .vector_engine import (
+    GRAVITY,
+    PET_SIZE,
+    ROAM_ARRIVAL_DISTANCE,
+    SLEEP_CHANCE,
+    TRANSITION_SECONDS,
+    WALK_SPEED,
+)
+
+TICK_RATE = round(1 / STEP_SECONDS)
+WALK_SPEED_PX_S = WALK_SPEED * TICK_RATE
+GRAVITY_PX_S2 = GRAVITY * TICK_RATE ** 2
+REST_ANIMATIONS = ("idle", "idle2", "clean", "clean2")
+# Wake up at least this often to evict idle pets
+EVICT_INTERVAL_SECONDS = 30
+
+Emit = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(slots=True)
+class Segment:
+    animation: str
+    x: float
+    y: float
+    started: float
+    started_ms: int
+    vx: float = 0.0
+    ay: float = 0.0
+    target_x: Optional[float] = None
+    duration: Optional[float] = None
+
+
+@dataclass(slots=True)
+class TransitionPet:
+    canvas_width: float
+    canvas_height: float
+    segment: Segment
+    rest_seconds: float
+    last_active: float
+    seq: int = 0
+    grabbed: bool = False
+    sids: Set[str] = field(default_factory=set)
+
+    @property
+    def floor_y(self) -> float:
+        return self.canvas_height - PET_SIZE
+
+    def position_at(self, now: float) -> Tuple[float, float]:
+        seg = self.segment
+        elapsed = max(0.0, now - seg.started)
+        if seg.duration is not None:
+            elapsed = min(elapsed, seg.duration)
+        x = min(max(seg.x + seg.vx * elapsed, 0.0), self.canvas_width - PET_SIZE)
+        y = seg.y + 0.5 * seg.ay * elapsed * elapsed
+        if seg.ay:
+            y = min(y, self.floor_y)
+        return x, y
+
+
+class TransitionPetHandle:
+    """One pet in a ``TransitionPetManager``, with ``PetState``'s interface."""
+
+    __slots__ = ("manager", "owner")
+
+    def __init__(self, manager: "TransitionPetManager", owner: str):
+        self.manager = manager
+        self.owner = owner
+
+    @property
+    def x(self) -> float:
+        return self.manager.position(self.owner)[0]
+
+    @property
+    def y(self) -> float:
+        return self.manager.position(self.owner)[1]
+
+    @property
+    def is_grabbed(self) -> bool:
+        return self.manager.pet(self.owner).grabbed
+
+    @property
+    def current_animation(self) -> str:
+        return self.manager.pet(self.owner).segment.animation
+
+    def set_position(self, x: float, y: float) -> None:
+        self.manager.set_position(self.owner, x, y)
+
+    def set_grabbed(self, grabbed: bool) -> None:
+        self.manager.set_grabbed(self.owner, grabbed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.manager.to_dict(self.owner)
+
+
+class TransitionPetManager:
+    """Per-owner pets advanced by a timer heap of scheduled transitions.
+
+    Has the same registry interface as ``PetManager``; ``run`` replaces the
+    fixed-step update loop.
+    """
+
+    def __init__(self, idle_seconds: float = 300, seed: Optional[int] = None):
+        self.idle_seconds = idle_seconds
+        self.rng = random.Random(seed)
+        self._pets: Dict[str, TransitionPet] = {}
+        self._owner_by_sid: Dict[str, str] = {}
+        # (due, tiebreak, owner, seq); entries for an older seq are stale
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = 0
+        self._changed: Set[str] = set()
+        self._wake: Optional[asyncio.Event] = None
+        # Metrics
+        self.created = 0
+        self.evicted = 0
+        self.transitions = 0
+        self.stale_timers = 0
+
+    def __len__(self) -> int:
+        return len(self._pets)
+
+    # Segments
+
+    def _start(self, owner: str, pet: TransitionPet, segment: Segment) -> None:
+        """Make ``segment`` current, schedule its end and queue the emit."""
+        pet.segment = segment
+        pet.seq += 1
+        self.transitions += 1
+        if segment.duration is not None:
+            self._counter += 1
+            heapq.heappush(self._heap, (segment.started + segment.duration, self._counter, owner, pet.seq))
+        self._changed.add(owner)
+        if self._wake is not None:
+            self._wake.set()
+
+    @staticmethod
+    def _segment(animation: str, x: float, y: float, now: float, **motion) -> Segment:
+        started_ms = int((time.time() - (time.monotonic() - now)) * 1000)
+        return Segment(animation, x, y, now, started_ms, **motion)
+
+    def _rest(self, pet: TransitionPet, x: float, y: float, now: float, animation: str = "idle") -> Segment:
+        return self._segment(animation, x, y, now, duration=pet.rest_seconds)
+
+    def _walk(self, pet: TransitionPet, x: float, y: float, now: float) -> Segment:
+        target = self.rng.randint(100, int(pet.canvas_width) - 100)
+        if target > x:
+            animation, vx = self.rng.choice(["walk_right", "walk2"]), WALK_SPEED_PX_S
+        else:
+            animation, vx = self.rng.choice(["walk_left", "walk"]), -WALK_SPEED_PX_S
+        duration = max(0.0, abs(target - x) - ROAM_ARRIVAL_DISTANCE) / WALK_SPEED_PX_S
+        return self._segment(animation, x, y, now, vx=vx, target_x=target, duration=duration)
+
+    def _fall(self, pet: TransitionPet, x: float, y: float, now: float) -> Segment:
+        duration = math.sqrt(2 * (pet.floor_y - y) / GRAVITY_PX_S2)
+        return self._segment("falling", x, y, now, ay=GRAVITY_PX_S2, duration=duration)
+
+    def _settle(self, pet: TransitionPet, x: float, y: float, now: float) -> Segment:
+        """Fall if above the floor, otherwise rest."""
+        if y < pet.floor_y:
+            return self._fall(pet, x, y, now)
+        return self._rest(pet, x, pet.floor_y, now)
+
+    def _next_segment(self, pet: TransitionPet, now: float) -> Segment:
+        """The segment that follows the current one once its duration is up."""
+        seg = pet.segment
+        x, y = pet.position_at(now)
+        if seg.animation in REST_ANIMATIONS:
+            return self._walk(pet, x, y, now)
+        if seg.target_x is not None:
+            # Arrived: rest (or nap) before the next walk
+            pet.rest_seconds = self.rng.randint(3, 8)
+            animation = self.rng.choice(list(REST_ANIMATIONS))
+            if self.rng.random() < SLEEP_CHANCE:
+                return self._segment("idle_to_sleep", x, y, now, duration=TRANSITION_SECONDS)
+            return self._rest(pet, x, y, now, animation)
+        if seg.animation == "idle_to_sleep":
+            return self._segment("sleep", x, y, now, duration=self.rng.randint(5, 10))
+        if seg.animation == "sleep":
+            return self._segment("sleep_to_idle", x, y, now, duration=TRANSITION_SECONDS)
+        # sleep_to_idle finished or landed from a fall
+        return self._rest(pet, x, min(y, pet.floor_y), now)
+
+    def _fire_due(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, _, owner, seq = heapq.heappop(heap)
+            pet = self._pets.get(owner)
+            if pet is None or pet.seq != seq or pet.grabbed:
+                self.stale_timers += 1
+                continue
+            self._start(owner, pet, self._next_segment(pet, due))
+
+    # Registry (PetManager's interface)
+
+    def pet(self, owner: str) -> TransitionPet:
+        pet = self._pets.get(owner)
+        if pet is None:
+            pet = self._new_pet(owner, 800, 600)
+        return pet
+
+    def _new_pet(self, owner: str, canvas_width: float, canvas_height: float) -> TransitionPet:
+        now = time.monotonic()
+        rest_seconds = self.rng.randint(3, 8)
+        pet = TransitionPet(
+            canvas_width=canvas_width,
+            canvas_height=canvas_height,
+            segment=self._segment("idle", 100, canvas_height - PET_SIZE, now, duration=rest_seconds),
+            rest_seconds=rest_seconds,
+            last_active=now,
+        )
+        if owner not in self._pets:
+            self.created += 1
+        self._pets[owner] = pet
+        self._start(owner, pet, pet.segment)
+        return pet
+
+    def get(self, owner: str) -> TransitionPetHandle:
+        self.pet(owner).last_active = time.monotonic()
+        return TransitionPetHandle(self, owner)
+
+    def reset(self, owner: str, canvas_width: int, canvas_height: int) -> TransitionPetHandle:
+        sids = self._pets[owner].sids if owner in self._pets else set()
+        self._new_pet(owner, canvas_width, canvas_height).sids = sids
+        return TransitionPetHandle(self, owner)
+
+    def attach(self, sid: str, owner: str) -> TransitionPetHandle:
+        self.detach(sid)
+        pet = self.pet(owner)
+        pet.sids.add(sid)
+        pet.last_active = time.monotonic()
+        self._owner_by_sid[sid] = owner
+        return TransitionPetHandle(self, owner)
+
+    def detach(self, sid: str) -> Optional[str]:
+        owner = self._owner_by_sid.pop(sid, None)
+        pet = self._pets.get(owner) if owner is not None else None
+        if pet is not None:
+            pet.sids.discard(sid)
+            pet.last_active = time.monotonic()
+        return owner
+
+    def remove(self, owner: str) -> None:
+        pet = self._pets.pop(owner, None)
+        if pet is not None:
+            for sid in pet.sids:
+                self._owner_by_sid.pop(sid, None)
+
+    def owner_of(self, sid: str) -> Optional[str]:
+        return self._owner_by_sid.get(sid)
+
+    def sockets(self) -> Dict[str, str]:
+        """Owner watched by each attached socket."""
+        return dict(self._owner_by_sid)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.idle_seconds
+        idle = [owner for owner, pet in self._pets.items() if not pet.sids and pet.last_active < cutoff]
+        for owner in idle:
+            del self._pets[owner]
+        self.evicted += len(idle)
+        return idle
+
+    # Per-pet operations
+
+    def position(self, owner: str) -> Tuple[float, float]:
+        return self.pet(owner).position_at(time.monotonic())
+
+    def set_position(self, owner: str, x: float, y: float) -> None:
+        pet = self.pet(owner)
+        now = time.monotonic()
+        if pet.grabbed:
+            # Dragging: move the held pet without telling anyone
+            pet.segment.x, pet.segment.y, pet.segment.started = x, y, now
+        else:
+            self._start(owner, pet, self._settle(pet, x, y, now))
+
+    def set_grabbed(self, owner: str, grabbed: bool) -> None:
+        pet = self.pet(owner)
+        now = time.monotonic()
+        x, y = pet.position_at(now)
+        pet.grabbed = grabbed
+        if grabbed:
+            self._start(owner, pet, self._segment("grabbed", x, y, now))
+        else:
+            self._start(owner, pet, self._settle(pet, x, y, now))
+
+    def to_dict(self, owner: str) -> Dict[str, Any]:
+        pet = self.pet(owner)
+        x, y = pet.position_at(time.monotonic())
+        return {"x": x, "y": y, "animation": pet.segment.animation, "frame": 0, "is_grabbed": pet.grabbed}
+
+    def transition(self, owner: str) -> Dict[str, Any]:
+        """The ``pet_transition`` payload for ``owner``'s current segment."""
+        pet = self.pet(owner)
+        seg = pet.segment
+        return {
+            "seq": pet.seq,
+            "t": seg.started_ms,
+            "animation": seg.animation,
+            "x": seg.x,
+            "y": seg.y,
+            "vx": seg.vx,
+            "ay": seg.ay,
+            "target_x": seg.target_x,
+            "duration": seg.duration,
+            "floor_y": pet.floor_y,
+            "is_grabbed": pet.grabbed,
+        }
+
+    async def run(self, emit: Emit) -> None:
+        """Fire transitions as they come due and ``emit(owner, payload)`` each change."""
+        self._wake = asyncio.Event()
+        last_eviction = time.monotonic()
+        while True:
+            try:
+                self._wake.clear()
+                now = time.monotonic()
+                self._fire_due(now)
+
+                changed, self._changed = self._changed, set()
+                emits = [
+                    emit(owner, self.transition(owner))
+                    for owner in changed
+                    if owner in self._pets and self._pets[owner].sids
+                ]
+                if emits:
+                    await asyncio.gather(*emits)
+
+                if now - last_eviction >= EVICT_INTERVAL_SECONDS:
+                    evicted = self.evict_idle(now)
+                    if evicted:
+                        print(f"Evicted {len(evicted)} idle pet(s)")
+                    last_eviction = now
+
+                timeout = EVICT_INTERVAL_SECONDS
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - time.monotonic()))
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                print(f"Pet transition error: {e}")
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "transitions",
+            "pets": len(self._pets),
+            "watched_pets": sum(1 for pet in self._pets.values() if pet.sids),
+            "sockets": len(self._owner_by_sid),
+            "scheduled_timers": len(self._heap),
+            "transitions": self.transitions,
+            "stale_timers": self.stale_timers,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
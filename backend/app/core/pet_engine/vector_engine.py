@@ -0,0 +1,321 @@
+"""Struct-of-arrays pet physics for stepping many pets at once.
+
+``PetEngine`` stores every pet's position, velocity, acceleration,
+animation code and timers in NumPy arrays indexed by slot, and ``step``
+advances all of them with a handful of vectorized operations instead of
+one ``PetState.update_position`` call per pet. The rules are the same as
+``PetState``'s (same order within a tick, same random ranges), so a single
+pet behaves exactly like the scalar one given the same random draws.
+Timers run on the engine's simulated time, so a seeded engine stepped with
+the same ``dt`` sequence replays exactly.
+
+``PetHandle`` wraps one slot with the parts of the ``PetState`` interface
+the routes and socket handlers use.
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .animation_states import AnimationId
+from .pet_state import TIME_EPSILON
+
+# Animation codes are the AnimationId values, so frames encode them as is
+ANIMATIONS = tuple(animation.name.lower() for animation in AnimationId)
+ANIMATION_CODES = {name: code for code, name in enumerate(ANIMATIONS)}
+
+IDLE = ANIMATION_CODES["idle"]
+SLEEP = ANIMATION_CODES["sleep"]
+GRABBED = ANIMATION_CODES["grabbed"]
+FALLING = ANIMATION_CODES["falling"]
+IDLE_TO_SLEEP = ANIMATION_CODES["idle_to_sleep"]
+SLEEP_TO_IDLE = ANIMATION_CODES["sleep_to_idle"]
+
+WALK_SPEED = 2.0
+GRAVITY = 0.8
+PET_SIZE = 100.0
+TRANSITION_SECONDS = 1.0
+# Roaming stops within this many pixels of the target
+ROAM_ARRIVAL_DISTANCE = 10
+SLEEP_CHANCE = 0.3
+
+# random.choice() candidates, in PetState's order
+WALK_RIGHT_CHOICES = np.array([ANIMATION_CODES["walk_right"], ANIMATION_CODES["walk2"]], dtype=np.int8)
+WALK_LEFT_CHOICES = np.array([ANIMATION_CODES["walk_left"], ANIMATION_CODES["walk"]], dtype=np.int8)
+REST_CHOICES = np.array([ANIMATION_CODES[name] for name in ("idle", "idle2", "clean", "clean2")], dtype=np.int8)
+
+
+def _lookup(*names: str) -> np.ndarray:
+    """Boolean table indexed by animation code: ``table[anim]`` is a mask."""
+    table = np.zeros(len(ANIMATIONS), dtype=bool)
+    table[[ANIMATION_CODES[name] for name in names]] = True
+    return table
+
+
+# PetState.reset_movement groups
+_MOVES_LEFT = _lookup("walk_left", "walk")
+_MOVES_RIGHT = _lookup("walk_right", "walk2")
+_FALLS = _lookup("falling")
+_STILL = _lookup("idle", "idle2", "sleep", "grabbed", "clean", "clean2")
+# Animations that never start a fall / never count towards roaming
+_NO_FALL = _lookup("falling", "sleep", "idle_to_sleep", "sleep_to_idle")
+_NO_ROAM = _NO_FALL
+
+
+class PetEngine:
+    """Fixed-capacity arrays of pets that grow on demand. Slots are reused."""
+
+    def __init__(self, capacity: int = 64, seed: Optional[int] = None, rng: Optional[np.random.Generator] = None):
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        # Simulated seconds, advanced by step()
+        self.sim_time = 0.0
+        self.capacity = 0
+        self._free: list = []
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity: int) -> None:
+        def grow(name: str, dtype, fill) -> None:
+            array = np.full(capacity, fill, dtype=dtype)
+            if self.capacity:
+                array[:self.capacity] = getattr(self, name)
+            setattr(self, name, array)
+
+        for name in ("x", "y", "vx", "vy", "ax", "ay", "roam_target", "roam_timer", "roam_cooldown",
+                     "sleep_timer", "sleep_duration", "canvas_width", "canvas_height", "size"):
+            grow(name, np.float64, 0.0)
+        grow("transition_start", np.float64, np.nan)
+        grow("transition_duration", np.float64, TRANSITION_SECONDS)
+        grow("anim", np.int8, IDLE)
+        grow("frame", np.int16, 0)
+        for name in ("active", "ticking", "grabbed", "roaming", "sleeping"):
+            grow(name, bool, False)
+
+        self._free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.capacity - len(self._free)
+
+    # Slot management
+
+    def add(self, canvas_width: float = 800, canvas_height: float = 600) -> int:
+        """Create a pet like ``PetState(canvas_width, canvas_height)``; returns its slot."""
+        if not self._free:
+            self._allocate(self.capacity * 2)
+        slot = self._free.pop()
+        self.x[slot] = 100
+        self.y[slot] = canvas_height - 100
+        self.vx[slot] = self.vy[slot] = self.ax[slot] = self.ay[slot] = 0
+        self.anim[slot] = IDLE
+        self.frame[slot] = 0
+        self.grabbed[slot] = False
+        self.canvas_width[slot] = canvas_width
+        self.canvas_height[slot] = canvas_height
+        self.size[slot] = PET_SIZE
+        self.roaming[slot] = False
+        self.roam_target[slot] = 0
+        self.roam_timer[slot] = 0
+        self.roam_cooldown[slot] = self.rng.integers(3, 9)
+        self.sleeping[slot] = False
+        self.sleep_timer[slot] = 0
+        self.sleep_duration[slot] = 0
+        self.transition_start[slot] = np.nan
+        self.transition_duration[slot] = TRANSITION_SECONDS
+        self.active[slot] = True
+        self.ticking[slot] = True
+        return slot
+
+    def remove(self, slot: int) -> None:
+        if not self.active[slot]:
+            return
+        self.active[slot] = False
+        self.ticking[slot] = False
+        self._free.append(slot)
+
+    # Per-pet operations (PetState.set_grabbed / set_position / to_dict)
+
+    def set_position(self, slot: int, x: float, y: float) -> None:
+        self.x[slot] = x
+        self.y[slot] = y
+
+    def set_grabbed(self, slot: int, grabbed: bool) -> None:
+        self.grabbed[slot] = grabbed
+        if grabbed:
+            self.anim[slot] = GRABBED
+            self.roaming[slot] = False
+            self.sleeping[slot] = False
+            self.transition_start[slot] = np.nan
+            self.vx[slot] = self.vy[slot] = self.ax[slot] = self.ay[slot] = 0
+        elif self.y[slot] < self.canvas_height[slot] - self.size[slot]:
+            # Above ground: fall, starting from rest
+            self.anim[slot] = FALLING
+            self.vy[slot] = 0
+            self.ay[slot] = GRAVITY
+        else:
+            self.anim[slot] = IDLE
+            self._reset_movement(self._mask(slot))
+
+    def to_dict(self, slot: int) -> Dict[str, Any]:
+        return {
+            "x": float(self.x[slot]),
+            "y": float(self.y[slot]),
+            "animation": ANIMATIONS[self.anim[slot]],
+            "frame": int(self.frame[slot]),
+            "is_grabbed": bool(self.grabbed[slot]),
+        }
+
+    def _mask(self, slot: int) -> np.ndarray:
+        mask = np.zeros(self.capacity, dtype=bool)
+        mask[slot] = True
+        return mask
+
+    # Vectorized rules
+
+    def _reset_movement(self, mask: np.ndarray) -> None:
+        """``PetState.reset_movement`` for every pet in ``mask``."""
+        if not mask.any():
+            return
+        anim = self.anim
+        left = mask & _MOVES_LEFT[anim]
+        right = mask & _MOVES_RIGHT[anim]
+        falls = mask & _FALLS[anim]
+        level = left | right | (mask & _STILL[anim])
+        self.vx[left] = -WALK_SPEED
+        self.vx[right] = WALK_SPEED
+        self.vx[mask & (_FALLS[anim] | _STILL[anim])] = 0
+        self.vy[level] = 0
+        self.ax[level | falls] = 0
+        self.ay[level] = 0
+        self.ay[falls] = GRAVITY
+
+    def _start_transition(self, mask: np.ndarray, animation: int, now: float) -> None:
+        self.anim[mask] = animation
+        self.transition_start[mask] = now
+        self.transition_duration[mask] = TRANSITION_SECONDS
+
+    def step(self, dt: float = 0.1) -> None:
+        """Advance every ticking, ungrabbed pet by ``dt`` (``PetState.update_position``)."""
+        self.sim_time += dt
+        now = self.sim_time
+        rng = self.rng
+        live = self.active & self.ticking & ~self.grabbed
+
+        # Animation transitions hold the pet until they finish
+        in_transition = live & ~np.isnan(self.transition_start)
+        if in_transition.any():
+            done = in_transition & (now - self.transition_start >= self.transition_duration - TIME_EPSILON)
+            fell_asleep = done & (self.anim == IDLE_TO_SLEEP)
+            woke_up = done & (self.anim == SLEEP_TO_IDLE)
+            if fell_asleep.any():
+                self.anim[fell_asleep] = SLEEP
+                self.sleeping[fell_asleep] = True
+                self.sleep_duration[fell_asleep] = rng.integers(5, 11, int(fell_asleep.sum()))
+                self.sleep_timer[fell_asleep] = 0
+            self.anim[woke_up] = IDLE
+            self.transition_start[done] = np.nan
+            self._reset_movement(done)
+            live &= ~in_transition
+
+        # Sleeping pets only count down
+        asleep = live & self.sleeping
+        if asleep.any():
+            np.add(self.sleep_timer, dt, out=self.sleep_timer, where=asleep)
+            waking = asleep & (self.sleep_timer >= self.sleep_duration)
+            if waking.any():
+                self.sleeping[waking] = False
+                self._start_transition(waking, SLEEP_TO_IDLE, now)
+            live &= ~asleep
+
+        if not live.any():
+            return
+
+        # do_movement: integrate, keep on screen, land on the floor
+        np.add(self.vx, self.ax, out=self.vx, where=live)
+        np.add(self.vy, self.ay, out=self.vy, where=live)
+        np.add(self.x, self.vx, out=self.x, where=live)
+        np.add(self.y, self.vy, out=self.y, where=live)
+        np.maximum(self.x, 0, out=self.x, where=live)
+        np.minimum(self.x, self.canvas_width - self.size, out=self.x, where=live)
+
+        floor = self.canvas_height - self.size
+        below = live & (self.y > floor)
+        np.copyto(self.y, floor, where=below)
+        np.copyto(self.vy, 0.0, where=below)
+        landed = below & (self.anim == FALLING)
+        if landed.any():
+            self.anim[landed] = IDLE
+            self.ay[landed] = 0
+            self._reset_movement(landed)
+
+        # Start falling when above the floor
+        airborne = live & (self.y < floor) & ~_NO_FALL[self.anim] & ~self.roaming
+        if airborne.any():
+            self.anim[airborne] = FALLING
+            self._reset_movement(airborne)
+
+        # Roam after the cooldown when resting on the floor
+        resting = live & (self.y >= floor) & ~self.roaming & ~_NO_ROAM[self.anim]
+        np.add(self.roam_timer, dt, out=self.roam_timer, where=resting)
+        start = resting & (self.roam_timer >= self.roam_cooldown)
+        if start.any():
+            slots = np.flatnonzero(start)
+            targets = rng.integers(100, self.canvas_width[slots].astype(np.int64) - 100 + 1)
+            pick = rng.integers(0, 2, len(slots))
+            self.roam_target[slots] = targets
+            self.anim[slots] = np.where(
+                targets > self.x[slots], WALK_RIGHT_CHOICES[pick], WALK_LEFT_CHOICES[pick]
+            )
+            self.roaming[slots] = True
+            self._reset_movement(start)
+
+        # Stop roaming at the target, maybe nap
+        arrived = live & self.roaming & (np.abs(self.x - self.roam_target) < ROAM_ARRIVAL_DISTANCE)
+        if arrived.any():
+            slots = np.flatnonzero(arrived)
+            count = len(slots)
+            self.roaming[slots] = False
+            self.vx[slots] = 0
+            self.anim[slots] = REST_CHOICES[rng.integers(0, len(REST_CHOICES), count)]
+            self._reset_movement(arrived)
+            self.roam_timer[slots] = 0
+            self.roam_cooldown[slots] = rng.integers(3, 9, count)
+            napping = slots[rng.random(count) < SLEEP_CHANCE]
+            if len(napping):
+                self.anim[napping] = IDLE_TO_SLEEP
+                self.transition_start[napping] = now
+                self.transition_duration[napping] = TRANSITION_SECONDS
+
+
+class PetHandle:
+    """One pet in a ``PetEngine``, with ``PetState``'s interface."""
+
+    __slots__ = ("engine", "slot")
+
+    def __init__(self, engine: PetEngine, slot: int):
+        self.engine = engine
+        self.slot = slot
+
+    @property
+    def x(self) -> float:
+        return float(self.engine.x[self.slot])
+
+    @property
+    def y(self) -> float:
+        return float(self.engine.y[self.slot])
+
+    @property
+    def is_grabbed(self) -> bool:
+        return bool(self.engine.grabbed[self.slot])
+
+    @property
+    def current_animation(self) -> str:
+        return ANIMATIONS[self.engine.anim[self.slot]]
+
+    def set_position(self, x: float, y: float) -> None:
+        self.engine.set_position(self.slot, x, y)
+
+    def set_grabbed(self, grabbed: bool) -> None:
+        self.engine.set_grabbed(self.slot, grabbed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.engine.to_dict(self.slot)
@@ -0,0 +1,172 @@
+"""Bulk reminder fan-out to every user.
+
+``send_daily_checkin_reminder(uid)`` and friends read the user document and
+write one notification per call. Running them for every user costs several
+round trips each. This module pages through ``users`` with one projection
+query (settings, email and name only), filters recipients in memory, writes
+the in-app notifications through a ``BulkWriter`` and hands emails to the
+bounded mail queue.
+
+The work is synchronous (``BulkWriter`` only exists on the sync client), so
+async callers should run it in a thread.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from firebase_admin import auth
+
+from .email import (
+    get_daily_checkin_reminder_template,
+    get_study_reminder_template,
+    mail_queue,
+)
+from .firebase import db
+from .notification_sender import (
+    daily_checkin_notification,
+    get_user_name,
+    notification_settings_from,
+    study_reminder_notification,
+)
+
+USER_PAGE_SIZE = 1000
+# firebase_admin.auth.get_users accepts at most 100 identifiers per call
+AUTH_LOOKUP_BATCH = 100
+# How long a full mail queue may hold up the fan-out before emails are dropped
+EMAIL_ENQUEUE_TIMEOUT_SECONDS = 30
+
+USER_PROJECTION = ["notification_settings", "email", "displayName", "name"]
+
+
+@dataclass(frozen=True)
+class ReminderKind:
+    setting: str
+    notification: Callable[[datetime], Dict[str, Any]]
+    email_template: Callable[[str], Tuple[str, str, str]]
+
+
+REMINDERS: Dict[str, ReminderKind] = {
+    "daily_checkin": ReminderKind("daily_checkin", daily_checkin_notification, get_daily_checkin_reminder_template),
+    "study_reminder": ReminderKind("study_reminders", study_reminder_notification, get_study_reminder_template),
+}
+
+
+@dataclass
+class FanoutResult:
+    kind: str
+    users_scanned: int = 0
+    recipients: int = 0
+    notifications_written: int = 0
+    notification_errors: int = 0
+    emails_queued: int = 0
+    emails_skipped: int = 0
+    pages: int = 0
+    duration_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.__dict__, "duration_seconds": round(self.duration_seconds, 3)}
+
+
+def iter_user_pages(page_size: int = USER_PAGE_SIZE, fields: Optional[List[str]] = None) -> Iterator[list]:
+    """Yield pages of user snapshots holding only ``fields``, ordered by document id."""
+    query = (
+        db.collection("users")
+        .select(fields if fields is not None else USER_PROJECTION)
+        .order_by("__name__")
+        .limit(page_size)
+    )
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def _lookup_auth_emails(uids: List[str]) -> Dict[str, str]:
+    """Email addresses from Firebase Auth for users whose document has none."""
+    emails: Dict[str, str] = {}
+    for start in range(0, len(uids), AUTH_LOOKUP_BATCH):
+        identifiers = [auth.UidIdentifier(uid) for uid in uids[start:start + AUTH_LOOKUP_BATCH]]
+        try:
+            result = auth.get_users(identifiers)
+        except Exception as e:
+            print(f"Error looking up user emails in Firebase Auth: {e}")
+            continue
+        for user in result.users:
+            if user.email:
+                emails[user.uid] = user.email
+    return emails
+
+
+def fan_out_reminder(kind: str, send_email: bool = True, page_size: int = USER_PAGE_SIZE) -> FanoutResult:
+    """Send the ``kind`` reminder (see ``REMINDERS``) to every user who has it enabled."""
+    spec = REMINDERS[kind]
+    result = FanoutResult(kind=kind)
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    notification = spec.notification(now)
+    if send_email and not mail_queue.service.configured:
+        print("⚠️  Email credentials not configured. Sending in-app reminders only.")
+        send_email = False
+
+    writer = db.bulk_writer()
+    counter_lock = threading.Lock()
+
+    def _on_result(*_):
+        with counter_lock:
+            result.notifications_written += 1
+
+    def _on_error(failure, _writer) -> bool:
+        if failure.attempts < 5:
+            return True
+        with counter_lock:
+            result.notification_errors += 1
+        print(f"Error writing reminder notification {failure.operation.reference.path}: {failure.message}")
+        return False
+
+    writer.on_write_result(_on_result)
+    writer.on_write_error(_on_error)
+
+    try:
+        for page in iter_user_pages(page_size):
+            result.pages += 1
+            result.users_scanned += len(page)
+            recipients = []
+            for user in page:
+                user_data = user.to_dict() or {}
+                if not notification_settings_from(user_data).get(spec.setting):
+                    continue
+                writer.create(user.reference.collection("notifications").document(), dict(notification))
+                recipients.append((user.id, user_data))
+            result.recipients += len(recipients)
+
+            if not send_email or not recipients:
+                continue
+            missing = [uid for uid, data in recipients if not data.get("email")]
+            auth_emails = _lookup_auth_emails(missing) if missing else {}
+            for uid, user_data in recipients:
+                email = user_data.get("email") or auth_emails.get(uid)
+                if not email:
+                    result.emails_skipped += 1
+                    continue
+                subject, html_content, text_content = spec.email_template(get_user_name(user_data))
+                queued = mail_queue.enqueue(
+                    email, subject, html_content, text_content,
+                    block=True, timeout=EMAIL_ENQUEUE_TIMEOUT_SECONDS,
+                )
+                if queued:
+                    result.emails_queued += 1
+                else:
+                    result.emails_skipped += 1
+    finally:
+        writer.close()
+
+    result.duration_seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,151 @@
+"""Async Firestore data layer shared by the API routers.
+
+Every per-user collection or document the routers touch is exposed here as an
+accessor on top of the Firestore ``AsyncClient``, so handlers can ``await``
+reads and writes instead of blocking the event loop (or a threadpool worker)
+on the synchronous client.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from .firebase import async_db
+
+# Firestore caps a single batch at 500 writes
+BATCH_LIMIT = 500
+
+
+def collection(name: str):
+    """Get reference to a root-level collection"""
+    return async_db.collection(name)
+
+
+def users_collection():
+    """Get reference to the root users collection"""
+    return collection("users")
+
+
+def user_doc(uid: str):
+    """Get reference to a user's root document"""
+    return users_collection().document(uid)
+
+
+def tasks_collection(uid: str):
+    """Get reference to user's tasks collection"""
+    return user_doc(uid).collection("tasks")
+
+
+def study_sessions_collection(uid: str):
+    """Get reference to user's study sessions collection"""
+    return user_doc(uid).collection("studySessions")
+
+
+def daily_metrics_collection(uid: str):
+    """Get reference to user's daily metrics collection"""
+    return user_doc(uid).collection("dailyMetrics")
+
+
+def subjects_collection(uid: str):
+    """Get reference to user's subjects collection"""
+    return user_doc(uid).collection("subjects")
+
+
+def recurring_topics_collection(uid: str):
+    """Get reference to user's recurring topics collection"""
+    return user_doc(uid).collection("recurringTopics")
+
+
+def user_settings_doc(uid: str, name: str):
+    """Get reference to a document in the user's userSettings subcollection"""
+    return user_doc(uid).collection("userSettings").document(name)
+
+
+def achievements_collection(uid: str):
+    """Get reference to user's achievements collection"""
+    return user_doc(uid).collection("achievements")
+
+
+def wellness_summary_doc(uid: str):
+    """Get reference to user's wellness summary document"""
+    return user_doc(uid).collection("wellness").document("summary")
+
+
+def wellness_checkins_collection(uid: str):
+    """Get reference to user's wellness check-ins collection"""
+    return user_doc(uid).collection("wellness_checkins")
+
+
+def wellness_pet_history_collection(uid: str):
+    """Get reference to user's wellness pet history collection"""
+    return user_doc(uid).collection("wellness_pet_history")
+
+
+def notifications_collection(uid: str):
+    """Get reference to user's notifications collection"""
+    return user_doc(uid).collection("notifications")
+
+
+def minigame_doc(uid: str):
+    """Get reference to user's minigame progress document"""
+    return user_doc(uid).collection("minigame").document("progress")
+
+
+def aggregates_collection(uid: str):
+    """Get reference to user's aggregates collection (precomputed counters)"""
+    return user_doc(uid).collection("aggregates")
+
+
+def batch():
+    """Start a new async write batch"""
+    return async_db.batch()
+
+
+def transaction():
+    """Start a new async transaction"""
+    return async_db.transaction()
+
+
+async def get_dict(doc_ref, transaction=None) -> Optional[Dict[str, Any]]:
+    """Read a document and return its data, or ``None`` when it does not exist."""
+    snapshot = await doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    return snapshot.to_dict() or {}
+
+
+async def get_many(doc_refs) -> List[Optional[Dict[str, Any]]]:
+    """Read several documents in one round trip.
+
+    Returns the data in the same order as ``doc_refs``, with ``None`` for
+    documents that do not exist.
+    """
+    doc_refs = list(doc_refs)
+    found: Dict[str, Optional[Dict[str, Any]]] = {}
+    async for snapshot in async_db.get_all(doc_refs):
+        found[snapshot.reference.path] = (snapshot.to_dict() or {}) if snapshot.exists else None
+    return [found.get(ref.path) for ref in doc_refs]
+
+
+async def stream(query) -> List[Any]:
+    """Collect the snapshots yielded by a query or collection reference."""
+    return [doc async for doc in query.stream()]
+
+
+async def delete_all(query) -> int:
+    """Delete every document matched by ``query`` using batched writes.
+
+    Returns the number of deleted documents.
+    """
+    deleted = 0
+    write_batch = batch()
+    pending = 0
+    async for doc in query.stream():
+        write_batch.delete(doc.reference)
+        pending += 1
+        deleted += 1
+        if pending == BATCH_LIMIT:
+            await write_batch.commit()
+            write_batch = batch()
+            pending = 0
+    if pending:
+        await write_batch.commit()
+    return deleted
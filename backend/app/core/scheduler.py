@@ -0,0 +1,282 @@
+"""In-process asyncio job scheduler.
+
+Jobs run on cron-like schedules (``minute hour day month weekday``, UTC) with
+optional random jitter. Every replica of the API runs the scheduler, so each
+run first takes a lease in ``schedulerLeases/{job}``. The lease records the
+slot (scheduled time) it was taken for, so a slot runs once even if replicas
+wake up at slightly different times. Run counts and timings are kept per job
+and exposed through ``/api/metrics``.
+"""
+
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from google.cloud import firestore
+
+from . import repository as repo
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+_FIELD_RANGES = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),  # 0 and 7 are both Sunday, as in cron
+)
+
+
+def _parse_field(expr: str, low: int, high: int, name: str) -> Set[int]:
+    values: Set[int] = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step < 1:
+                raise ValueError(f"Invalid step in cron {name} field: {expr!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron {name} field out of range: {expr!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A parsed five-field cron expression evaluated in UTC."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        parsed = [
+            _parse_field(expr, low, high, name)
+            for expr, (name, low, high) in zip(fields, _FIELD_RANGES)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {value % 7 for value in weekdays}
+        # Like cron: if both day fields are restricted a match on either is enough
+        self._day_any = fields[2] == "*"
+        self._weekday_any = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.isoweekday() % 7) in self.weekdays
+        if self._day_any and self._weekday_any:
+            return True
+        if self._day_any:
+            return weekday_ok
+        if self._weekday_any:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after ``after``."""
+        dt = after.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                year, month = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+                dt = dt.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    schedule: CronSchedule
+    jitter_seconds: float = 0.0
+    lease_seconds: float = 600.0
+    # Metrics
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+    last_duration: Optional[float] = None
+    last_started_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    last_result: Any = None
+    next_run_at: Optional[datetime] = None
+    running: bool = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "schedule": self.schedule.expression,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "running": self.running,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "avg_duration_seconds": round(self.total_duration / self.runs, 3) if self.runs else None,
+            "max_duration_seconds": round(self.max_duration, 3),
+            "last_error": self.last_error,
+            "last_result": self.last_result if isinstance(self.last_result, (int, float, str, bool)) else None,
+            "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+        }
+
+
+class Scheduler:
+    """Runs registered jobs on their schedules for the lifetime of the app."""
+
+    def __init__(self, lease_collection: str = "schedulerLeases", instance_id: Optional[str] = None):
+        self.lease_collection = lease_collection
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        cron: str,
+        jitter_seconds: float = 0.0,
+        lease_seconds: float = 600.0,
+    ) -> Job:
+        """Register ``func`` to run on the ``cron`` schedule."""
+        if name in self.jobs:
+            raise ValueError(f"Job {name!r} is already registered")
+        job = Job(
+            name=name,
+            func=func,
+            schedule=CronSchedule(cron),
+            jitter_seconds=jitter_seconds,
+            lease_seconds=lease_seconds,
+        )
+        self.jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job), name=f"scheduler:{job.name}"))
+        print(f"Scheduler started with {len(self.jobs)} job(s) as {self.instance_id}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "instance_id": self.instance_id,
+            "running": bool(self._tasks),
+            "jobs": {name: job.stats() for name, job in self.jobs.items()},
+        }
+
+    def _lease_doc(self, job: Job):
+        return repo.collection(self.lease_collection).document(job.name)
+
+    async def _acquire_lease(self, job: Job, slot: datetime) -> bool:
+        """Take the job's lease for ``slot`` unless another replica has it or ran it."""
+        lease_ref = self._lease_doc(job)
+        instance_id = self.instance_id
+
+        @firestore.async_transactional
+        async def _acquire(transaction):
+            lease = await repo.get_dict(lease_ref, transaction=transaction) or {}
+            now = datetime.now(timezone.utc)
+            last_slot = lease.get("last_slot")
+            if last_slot is not None and last_slot >= slot:
+                return False
+            expires_at = lease.get("expires_at")
+            if lease.get("holder") not in (None, instance_id) and expires_at and expires_at > now:
+                return False
+            transaction.set(lease_ref, {
+                "holder": instance_id,
+                "acquired_at": now,
+                "expires_at": now + timedelta(seconds=job.lease_seconds),
+                "last_slot": slot,
+            })
+            return True
+
+        return await _acquire(repo.transaction())
+
+    async def _release_lease(self, job: Job, ok: bool) -> None:
+        now = datetime.now(timezone.utc)
+        await self._lease_doc(job).set({
+            "expires_at": now,
+            "last_finished_at": now,
+            "last_ok": ok,
+        }, merge=True)
+
+    async def run_job(self, job: Job, slot: datetime) -> None:
+        """Run one slot of ``job`` if this replica wins its lease."""
+        try:
+            acquired = await self._acquire_lease(job, slot)
+        except Exception as e:
+            print(f"Scheduler: could not take lease for {job.name}: {e}")
+            acquired = False
+        if not acquired:
+            job.skipped += 1
+            return
+
+        job.running = True
+        job.last_started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        ok = False
+        try:
+            job.last_result = await job.func()
+            job.last_error = None
+            ok = True
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"Scheduler: job {job.name} failed: {e}")
+        finally:
+            duration = time.perf_counter() - started
+            job.running = False
+            job.runs += 1
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+            try:
+                await self._release_lease(job, ok)
+            except Exception as e:
+                print(f"Scheduler: could not release lease for {job.name}: {e}")
+
+    async def _job_loop(self, job: Job) -> None:
+        while True:
+            slot = job.schedule.next_after(datetime.now(timezone.utc))
+            job.next_run_at = slot
+            delay = (slot - datetime.now(timezone.utc)).total_seconds()
+            if job.jitter_seconds:
+                delay += random.uniform(0, job.jitter_seconds)
+            await asyncio.sleep(max(0.0, delay))
+            await self.run_job(job, slot)
+
+
+scheduler = Scheduler()
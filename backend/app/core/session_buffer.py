@@ -0,0 +1,220 @@
+"""Write-behind buffer for study session timer updates.
+
+While a session runs, the timer page PATCHes ``time_remaining_seconds``
+every few seconds. ``SessionBuffer`` keeps the state of each session this
+node has written and absorbs those PATCHes in memory. The pending fields
+reach Firestore in one of three ways:
+
+- with the session's next state transition (pause, resume, complete,
+  reset), which takes them into its own transactional write;
+- on the periodic checkpoint every ``SESSION_CHECKPOINT_SECONDS``;
+- on shutdown, when everything pending is flushed.
+
+A checkpoint is a conditional write. It only goes through if the stored
+session still carries the ``updated_at`` of this node's last write, so it
+never overwrites a newer write from another replica. If the process dies,
+at most one checkpoint interval of timer progress is lost. The next request
+for the session starts again from the stored checkpoint.
+``SESSION_CHECKPOINT_SECONDS=0`` turns buffering off and every PATCH is
+written through.
+"""
+
+import asyncio
+import os
+import time
+from copy import deepcopy
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from google.api_core import exceptions as gexc
+
+from . import repository as repo
+from .firebase import async_db
+
+SESSION_CHECKPOINT_SECONDS = float(os.getenv("SESSION_CHECKPOINT_SECONDS", "60"))
+# Sessions not touched for this long are flushed and dropped from memory
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "900"))
+
+# Fields a PATCH may change without a write; anything else is written through
+BUFFERED_FIELDS = frozenset({"time_remaining_seconds"})
+HOT_STATUSES = ("active", "paused")
+
+Key = Tuple[str, str]
+
+
+class _Entry:
+    __slots__ = ("state", "pending", "written_at", "touched")
+
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        self.pending: Dict[str, Any] = {}
+        # updated_at of the last write this node made to the session
+        self.written_at = state.get("updated_at")
+        self.touched = time.monotonic()
+
+
+class SessionBuffer:
+    """Hot state of running sessions and their not yet written timer fields."""
+
+    def __init__(
+        self,
+        checkpoint_seconds: float = SESSION_CHECKPOINT_SECONDS,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+    ):
+        self.checkpoint_seconds = checkpoint_seconds
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[Key, _Entry] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.buffered_updates = 0
+        self.flushed_with_transition = 0
+        self.checkpoint_writes = 0
+        self.stale_dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.checkpoint_seconds > 0
+
+    def remember(self, uid: str, session_id: str, session: Optional[Dict[str, Any]]) -> None:
+        """Record the state just written for a session; finished sessions are dropped."""
+        if not self.enabled or not session or session.get("status") not in HOT_STATUSES:
+            self.forget(uid, session_id)
+            return
+        entry = _Entry(deepcopy(session))
+        previous = self._entries.get((uid, session_id))
+        if previous is not None and previous.pending:
+            # PATCHes that arrived while the write was in flight
+            entry.pending = previous.pending
+            entry.state.update(previous.pending)
+        self._entries[(uid, session_id)] = entry
+
+    def update(self, uid: str, session_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Buffer ``changes`` and return the resulting session.
+
+        Returns ``None`` when the change has to be written through: the
+        session is not hot on this node or the change touches other fields.
+        """
+        entry = self._entries.get((uid, session_id))
+        if entry is None or not changes or not set(changes) <= BUFFERED_FIELDS:
+            return None
+        changes = {**changes, "updated_at": datetime.now(timezone.utc)}
+        entry.pending.update(changes)
+        entry.state.update(changes)
+        entry.touched = time.monotonic()
+        self.buffered_updates += 1
+        return deepcopy(entry.state)
+
+    def take(self, uid: str, session_id: str) -> Dict[str, Any]:
+        """Pending fields of a session, for a write that is about to include them."""
+        entry = self._entries.get((uid, session_id))
+        if entry is None or not entry.pending:
+            return {}
+        pending, entry.pending = entry.pending, {}
+        self.flushed_with_transition += 1
+        return pending
+
+    def restore(self, uid: str, session_id: str, pending: Dict[str, Any]) -> None:
+        """Put back fields from ``take`` whose write failed, under anything newer."""
+        entry = self._entries.get((uid, session_id))
+        if entry is None or not pending:
+            return
+        entry.pending = {**pending, **entry.pending}
+        self.flushed_with_transition -= 1
+
+    def overlay(self, uid: str, session_id: str, session: Dict[str, Any]) -> Dict[str, Any]:
+        """``session`` as read from Firestore with this node's pending fields applied."""
+        entry = self._entries.get((uid, session_id))
+        if entry is not None and entry.pending:
+            session.update(deepcopy(entry.pending))
+        return session
+
+    def forget(self, uid: str, session_id: Optional[str] = None) -> None:
+        """Drop a session, or every session of ``uid``, without writing it."""
+        if session_id is not None:
+            self._entries.pop((uid, session_id), None)
+            return
+        for key in [key for key in self._entries if key[0] == uid]:
+            del self._entries[key]
+
+    async def checkpoint(self, everything: bool = False) -> int:
+        """Write the pending fields of every session; returns the number written.
+
+        Idle sessions (or all of them with ``everything``) are dropped afterwards.
+        """
+        now = time.monotonic()
+        dirty = [(key, entry) for key, entry in self._entries.items() if entry.pending]
+        if dirty:
+            refs = [repo.study_sessions_collection(uid).document(session_id) for (uid, session_id), _ in dirty]
+            snapshots = {snapshot.reference.path: snapshot async for snapshot in async_db.get_all(refs)}
+            results = await asyncio.gather(
+                *(self._write(key, entry, ref, snapshots.get(ref.path)) for (key, entry), ref in zip(dirty, refs))
+            )
+            written = sum(results)
+        else:
+            written = 0
+        for key, entry in list(self._entries.items()):
+            if everything or now - entry.touched > self.idle_seconds:
+                if not entry.pending and self._entries.get(key) is entry:
+                    del self._entries[key]
+        return written
+
+    async def _write(self, key: Key, entry: _Entry, ref, snapshot) -> bool:
+        stored = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+        if stored is None or stored.get("updated_at") != entry.written_at:
+            # Deleted or written elsewhere since this node's last write
+            self._drop_stale(key, entry)
+            return False
+        fields, entry.pending = entry.pending, {}
+        try:
+            await ref.update(fields, option=async_db.write_option(last_update_time=snapshot.update_time))
+        except (gexc.FailedPrecondition, gexc.NotFound):
+            self._drop_stale(key, entry)
+            return False
+        except Exception as e:
+            # Keep the fields (under anything newer) for the next checkpoint
+            entry.pending = {**fields, **entry.pending}
+            print(f"Error checkpointing study session {key[1]}: {e}")
+            return False
+        entry.written_at = fields["updated_at"]
+        self.checkpoint_writes += 1
+        return True
+
+    def _drop_stale(self, key: Key, entry: _Entry) -> None:
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+            self.stale_dropped += 1
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                print(f"Error in study session checkpoint: {e}")
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._checkpoint_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.checkpoint(everything=True)
+        except Exception as e:
+            print(f"Error flushing study sessions on shutdown: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checkpoint_seconds": self.checkpoint_seconds,
+            "sessions": len(self._entries),
+            "dirty_sessions": sum(1 for entry in self._entries.values() if entry.pending),
+            "buffered_updates": self.buffered_updates,
+            "flushed_with_transition": self.flushed_with_transition,
+            "checkpoint_writes": self.checkpoint_writes,
+            "stale_dropped": self.stale_dropped,
+        }
+
+
+session_buffer = SessionBuffer()
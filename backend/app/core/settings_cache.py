@@ -0,0 +1,224 @@
+"""In-process cache of rarely changing per-user settings.
+
+Preferences, notification settings, coins, inventory, pet selection and the
+study background are read on nearly every page load but change only when the
+user saves them. ``SettingsCache`` keeps them per ``(uid, group)`` in a
+bounded LRU whose entries also expire after ``SETTINGS_CACHE_TTL_SECONDS``.
+The PUT handlers for each group invalidate it after writing.
+
+Fields of the user's root document are loaded together, so one read fills
+every root group for that user. With several backend replicas, a write on one
+replica reaches the others' caches only when the TTL runs out. Setting
+``SETTINGS_CACHE_WATCH=true`` also attaches a Firestore ``on_snapshot``
+listener to each cached user's root document, which invalidates that user's
+root groups as soon as the document changes anywhere.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from . import repository as repo
+
+SETTINGS_CACHE_MAX_SIZE = int(os.getenv("SETTINGS_CACHE_MAX_SIZE", "50000"))
+SETTINGS_CACHE_TTL_SECONDS = float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "60"))
+SETTINGS_CACHE_WATCH = os.getenv("SETTINGS_CACHE_WATCH", "false").lower() == "true"
+
+# Cache group -> field of the user's root document
+ROOT_FIELDS = {
+    "preferences": "user_preferences",
+    "notification_settings": "notification_settings",
+    "coins": "coins",
+    "inventory": "inventory",
+    "pet_settings": "pet_settings",
+}
+BACKGROUNDS = "backgrounds"
+
+Key = Tuple[str, str]
+
+
+class SettingsCache:
+    """LRU + TTL cache of settings values keyed by ``(uid, group)``."""
+
+    def __init__(
+        self,
+        max_size: int = SETTINGS_CACHE_MAX_SIZE,
+        ttl: float = SETTINGS_CACHE_TTL_SECONDS,
+        watch: bool = SETTINGS_CACHE_WATCH,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.watch = watch
+        self._entries: "OrderedDict[Key, Tuple[float, Any]]" = OrderedDict()
+        # Snapshot listeners call back on their own threads
+        self._lock = threading.Lock()
+        self._watches: Dict[str, Any] = {}
+        self._entries_per_uid: Dict[str, int] = {}
+        # uid -> [loads in flight, invalidations since the first began]; a
+        # load that overlapped an invalidation of its user is not cached
+        self._loads: Dict[str, List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, uid: str, group: str) -> Tuple[bool, Any]:
+        """``(True, value)`` for a fresh entry, ``(False, None)`` on a miss."""
+        key = (uid, group)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, deepcopy(entry[1])
+
+    def put(self, uid: str, group: str, value: Any) -> None:
+        """Cache ``value``."""
+        with self._lock:
+            self._store(uid, group, value)
+        self._watch_if_needed(uid)
+
+    def _begin_load(self, uid: str) -> int:
+        """Register a load of ``uid``'s settings; returns its generation."""
+        with self._lock:
+            load = self._loads.setdefault(uid, [0, 0])
+            load[0] += 1
+            return load[1]
+
+    def _end_load(self, uid: str, generation: int, values: Dict[str, Any] | None = None) -> None:
+        """Finish a load; ``values`` are cached unless ``uid`` was invalidated since it began."""
+        with self._lock:
+            load = self._loads[uid]
+            load[0] -= 1
+            if not load[0]:
+                del self._loads[uid]
+            if values is None or load[1] != generation:
+                return
+            for group, value in values.items():
+                self._store(uid, group, value)
+        self._watch_if_needed(uid)
+
+    def _store(self, uid: str, group: str, value: Any) -> None:
+        """Insert an entry and evict past ``max_size``. Needs the lock."""
+        key = (uid, group)
+        if key not in self._entries:
+            self._entries_per_uid[uid] = self._entries_per_uid.get(uid, 0) + 1
+        self._entries[key] = (time.monotonic() + self.ttl, deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _watch_if_needed(self, uid: str) -> None:
+        if self.watch and uid not in self._watches and uid in self._entries_per_uid:
+            self._start_watch(uid)
+
+    def invalidate(self, uid: str, *groups: str) -> None:
+        """Drop ``groups`` of ``uid``, or all of its groups when none are given."""
+        with self._lock:
+            if uid in self._loads:
+                self._loads[uid][1] += 1
+            keys = [(uid, group) for group in groups] if groups else [key for key in self._entries if key[0] == uid]
+            for key in keys:
+                if key in self._entries:
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def _drop(self, key: Key) -> None:
+        """Remove ``key``; stops the uid's listener with its last entry. Needs the lock."""
+        del self._entries[key]
+        uid = key[0]
+        remaining = self._entries_per_uid.get(uid, 1) - 1
+        if remaining > 0:
+            self._entries_per_uid[uid] = remaining
+            return
+        self._entries_per_uid.pop(uid, None)
+        self._stop_watch(self._watches.pop(uid, None))
+
+    @staticmethod
+    def _stop_watch(watch) -> None:
+        # unsubscribe joins the listener thread, which may be the caller
+        if watch is not None:
+            threading.Thread(target=watch.unsubscribe, daemon=True).start()
+
+    def _start_watch(self, uid: str) -> None:
+        from .firebase import db
+
+        first = [True]
+
+        def on_change(_snapshots, _changes, _read_time):
+            # The first callback carries the state we just cached
+            if first[0]:
+                first[0] = False
+                return
+            self.invalidate(uid, *ROOT_FIELDS)
+
+        try:
+            self._watches[uid] = db.collection("users").document(uid).on_snapshot(on_change)
+        except Exception as e:
+            # Rely on the TTL for this user rather than retrying on every put
+            self._watches[uid] = None
+            print(f"Could not watch settings of user {uid}: {e}")
+
+    async def get_or_load(self, uid: str, group: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self.get(uid, group)
+        if found:
+            return value
+        generation = self._begin_load(uid)
+        loaded = None
+        try:
+            value = await loader()
+            loaded = {group: value}
+        finally:
+            self._end_load(uid, generation, loaded)
+        return value
+
+    async def user_field(self, uid: str, group: str) -> Tuple[bool, Any]:
+        """``(document exists, value)`` of a root document group.
+
+        A miss reads the user's root document once and caches every root group.
+        """
+        found, cached = self.get(uid, group)
+        if found:
+            return cached
+        generation = self._begin_load(uid)
+        loaded = None
+        try:
+            data = await repo.get_dict(repo.user_doc(uid))
+            exists = data is not None
+            loaded = {other: (exists, (data or {}).get(field)) for other, field in ROOT_FIELDS.items()}
+        finally:
+            self._end_load(uid, generation, loaded)
+        return exists, (data or {}).get(ROOT_FIELDS[group])
+
+    def clear(self) -> None:
+        with self._lock:
+            for uid in list(self._watches):
+                self._stop_watch(self._watches.pop(uid))
+            self._entries.clear()
+            self._entries_per_uid.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "watched_users": sum(1 for watch in self._watches.values() if watch is not None),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+settings_cache = SettingsCache()
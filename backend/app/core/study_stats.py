@@ -0,0 +1,414 @@
+"""Per-user study statistics aggregate.
+
+``users/{uid}/aggregates/studyStats`` holds running totals plus per-day
+buckets for the user's study sessions. Every session write goes through
+``write_session``, which updates the session and the aggregate in the same
+transaction by removing the session's old contribution and adding its new
+one, so ``/study-sessions/stats`` can read one document instead of scanning
+the whole ``studySessions`` subcollection.
+
+The aggregate also keeps the study streak as ``streak``: the last day with a
+completed session, the current and the longest run of consecutive days.
+Days are counted in the user's ``timezone`` preference. A session completing
+extends the streak in the same transaction. Changes it cannot apply
+incrementally (a completed session being removed, a different timezone)
+clear it, and the next read rebuilds it from the completed sessions.
+"""
+
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from google.cloud import firestore
+
+from . import daily_metrics
+from . import repository as repo
+from .doc_cache import RequestDocCache
+from .settings_cache import settings_cache
+
+STUDY_STATS_DOC = "studyStats"
+
+# Daily buckets older than this are pruned; the stats endpoint looks back 30 days
+HISTORY_DAYS = 45
+
+COUNTER_FIELDS = (
+    "total_minutes",
+    "total_sessions",
+    "completed_sessions",
+    "paused_sessions",
+    "active_sessions",
+)
+DAILY_FIELDS = ("daily_minutes", "daily_sessions")
+
+# The app's users are on UTC+8 unless their preferences say otherwise
+DEFAULT_TIMEZONE = "UTC+8"
+_UTC_OFFSET = re.compile(r"(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?", re.IGNORECASE)
+
+
+def study_stats_doc(uid: str):
+    """Get reference to user's study stats aggregate document"""
+    return repo.aggregates_collection(uid).document(STUDY_STATS_DOC)
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {
+        **{field: 0 for field in COUNTER_FIELDS},
+        "daily_minutes": {},
+        "daily_sessions": {},
+        "daily_subject_minutes": {},
+        "completed_days": {},
+    }
+
+
+def session_minutes(session: Dict[str, Any]) -> float:
+    """Study minutes a session counts for (legacy sessions use duration_minutes)."""
+    actual_duration = session.get("actual_duration_minutes")
+    if actual_duration is None:
+        actual_duration = session.get("duration_minutes", 0)
+    if isinstance(actual_duration, (int, float)) and actual_duration > 0:
+        return actual_duration
+    return 0
+
+
+def session_contribution(session: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return what a single session adds to the aggregate."""
+    contribution = empty_stats()
+    if not session:
+        return contribution
+
+    minutes = session_minutes(session)
+    session_date = str(session.get("date") or "").strip()
+    status = session.get("status")
+
+    contribution["total_sessions"] = 1
+    contribution["total_minutes"] = minutes
+    if session_date:
+        contribution["daily_sessions"][session_date] = 1
+
+    if status == "completed" and minutes > 0:
+        contribution["completed_sessions"] = 1
+        if session_date:
+            contribution["daily_minutes"][session_date] = minutes
+            contribution["completed_days"][session_date] = 1
+            subject = session.get("subject")
+            if subject and subject.strip():
+                contribution["daily_subject_minutes"][session_date] = {subject: minutes}
+    elif status == "paused":
+        contribution["paused_sessions"] = 1
+    elif status == "active":
+        contribution["active_sessions"] = 1
+
+    return contribution
+
+
+def _history_cutoff(now: datetime) -> str:
+    return (now - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d")
+
+
+def _add_counts(target: Dict[str, Any], source: Dict[str, Any], sign: int, cutoff: str):
+    for key, value in source.items():
+        if key < cutoff:
+            continue
+        total = target.get(key, 0) + sign * value
+        if abs(total) < 1e-9:
+            target.pop(key, None)
+        else:
+            target[key] = total
+
+
+def merge_contribution(
+    stats: Dict[str, Any], contribution: Dict[str, Any], sign: int = 1, now: datetime | None = None
+) -> Dict[str, Any]:
+    """Add (``sign=1``) or remove (``sign=-1``) a session contribution in place."""
+    cutoff = _history_cutoff(now or datetime.now(timezone.utc))
+
+    for field in COUNTER_FIELDS:
+        stats[field] = max(0, stats.get(field, 0) + sign * contribution[field])
+
+    for field in DAILY_FIELDS:
+        stats[field] = dict(stats.get(field) or {})
+        _add_counts(stats[field], contribution[field], sign, cutoff)
+
+    # Completed days are kept for the whole history, they drive the streak
+    stats["completed_days"] = dict(stats.get("completed_days") or {})
+    _add_counts(stats["completed_days"], contribution["completed_days"], sign, "")
+
+    subjects_by_day = {
+        day: dict(subjects) for day, subjects in (stats.get("daily_subject_minutes") or {}).items()
+    }
+    for day, subjects in contribution["daily_subject_minutes"].items():
+        if day < cutoff:
+            continue
+        day_subjects = subjects_by_day.setdefault(day, {})
+        _add_counts(day_subjects, subjects, sign, "")
+        if not day_subjects:
+            subjects_by_day.pop(day)
+    stats["daily_subject_minutes"] = subjects_by_day
+
+    return stats
+
+
+def prune_history(stats: Dict[str, Any], now: datetime | None = None) -> Dict[str, Any]:
+    """Drop daily buckets that fell out of the retained window."""
+    cutoff = _history_cutoff(now or datetime.now(timezone.utc))
+    for field in (*DAILY_FIELDS, "daily_subject_minutes"):
+        stats[field] = {
+            day: value for day, value in (stats.get(field) or {}).items() if day >= cutoff
+        }
+    return stats
+
+
+def parse_timezone(name: Optional[str]) -> tzinfo:
+    """Timezone of a ``timezone`` preference: ``UTC+8``-style offsets or IANA names."""
+    name = (name or DEFAULT_TIMEZONE).strip()
+    if name.upper() in ("UTC", "GMT", "Z"):
+        return timezone.utc
+    match = _UTC_OFFSET.fullmatch(name)
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        if offset < timedelta(hours=24):
+            return timezone(-offset if sign == "-" else offset)
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return parse_timezone(DEFAULT_TIMEZONE)
+
+
+async def user_timezone(uid: str) -> Tuple[str, tzinfo]:
+    """The user's ``timezone`` preference and the timezone it names."""
+    _exists, preferences = await settings_cache.user_field(uid, "preferences")
+    name = (preferences or {}).get("timezone") or DEFAULT_TIMEZONE
+    return name, parse_timezone(name)
+
+
+def _counts_for_streak(session: Optional[Dict[str, Any]]) -> bool:
+    # Same rule as completed_days
+    return bool(session) and session.get("status") == "completed" and session_minutes(session) > 0
+
+
+def completion_day(session: Dict[str, Any], tz: tzinfo) -> Optional[str]:
+    """Local date a session was completed on; legacy sessions fall back to their date."""
+    completed_at = session.get("completed_at")
+    if isinstance(completed_at, str):
+        try:
+            completed_at = datetime.fromisoformat(completed_at.replace("Z", "+00:00"))
+        except ValueError:
+            completed_at = None
+    if isinstance(completed_at, datetime):
+        if completed_at.tzinfo is None:
+            completed_at = completed_at.replace(tzinfo=timezone.utc)
+        return completed_at.astimezone(tz).strftime("%Y-%m-%d")
+    return str(session.get("date") or "")[:10] or None
+
+
+def _day_before(day: str) -> str:
+    return (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+def update_streak(
+    streak: Optional[Dict[str, Any]],
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    timezone_name: str,
+) -> Optional[Dict[str, Any]]:
+    """Streak state after a session change, or ``None`` when it needs a rebuild."""
+    if not streak or streak.get("timezone") != timezone_name:
+        return None
+    if _counts_for_streak(before) and not _counts_for_streak(after):
+        # The day it completed may have no other session
+        return None
+    if not _counts_for_streak(after) or _counts_for_streak(before):
+        return streak
+
+    day = completion_day(after, parse_timezone(timezone_name))
+    last_day = streak.get("last_day")
+    if day is None or day == last_day:
+        return streak
+    if last_day and day < last_day:
+        return None
+    current = streak.get("current", 0) + 1 if last_day == _day_before(day) else 1
+    return {**streak, "last_day": day, "current": current, "longest": max(streak.get("longest", 0), current)}
+
+
+def streak_from_days(days: Iterable[str], timezone_name: str) -> Dict[str, Any]:
+    """Streak state for a set of local completion days."""
+    streak = {"last_day": None, "current": 0, "longest": 0, "timezone": timezone_name}
+    for day in sorted(set(days)):
+        current = streak["current"] + 1 if streak["last_day"] == _day_before(day) else 1
+        streak.update(last_day=day, current=current, longest=max(streak["longest"], current))
+    return streak
+
+
+def current_streak(streak: Dict[str, Any], today: date) -> int:
+    """Length of the run that ended today or yesterday, else 0."""
+    last_day = streak.get("last_day")
+    if last_day in (today.isoformat(), (today - timedelta(days=1)).isoformat()):
+        return streak.get("current", 0)
+    return 0
+
+
+def apply_session_change(
+    stats: Optional[Dict[str, Any]],
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    timezone_name: str = DEFAULT_TIMEZONE,
+) -> Dict[str, Any]:
+    """Return the aggregate with ``before`` replaced by ``after``."""
+    now = datetime.now(timezone.utc)
+    updated = {**empty_stats(), **(stats or {})}
+    merge_contribution(updated, session_contribution(before), sign=-1, now=now)
+    merge_contribution(updated, session_contribution(after), sign=1, now=now)
+    prune_history(updated, now)
+    updated["streak"] = update_streak(updated.get("streak"), before, after, timezone_name)
+    updated["updated_at"] = now
+    return updated
+
+
+async def write_session(
+    uid: str,
+    session_ref,
+    compute: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+    events: Optional[Callable[[Optional[Dict[str, Any]], Optional[Dict[str, Any]]], Dict[str, int]]] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Write a study session and its aggregate contributions atomically.
+
+    Both the ``studyStats`` aggregate and the rollup of the session's day in
+    ``dailyMetrics`` are updated in the same transaction.
+
+    ``compute`` receives the stored session (``None`` if it does not exist)
+    and returns the fields to write, or ``None`` to delete the session.
+    ``events`` receives the session before and after the write and returns
+    the increments of today's ``dailyMetrics`` event counters. Both may run
+    more than once if the transaction is retried, so they must not have side
+    effects. Returns the session data before and after the write.
+    """
+    stats_ref = study_stats_doc(uid)
+    timezone_name, _ = await user_timezone(uid)
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        before = await repo.get_dict(session_ref, transaction=transaction)
+        stats = await repo.get_dict(stats_ref, transaction=transaction)
+        changes = compute(before)
+
+        if changes is None:
+            after = None
+            transaction.delete(session_ref)
+        elif before is None:
+            after = dict(changes)
+            transaction.set(session_ref, changes)
+        else:
+            after = {**before, **changes}
+            transaction.update(session_ref, changes)
+
+        daily_metrics.write_rollup(transaction, uid, session_ref.id, before, after)
+        if events is not None:
+            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            daily_metrics.write_events(transaction, uid, today, events(before, after))
+
+        if stats is None:
+            # No aggregate yet (e.g. history from before it existed); it is
+            # rebuilt from the sessions on the next read
+            return before, after
+
+        transaction.set(stats_ref, apply_session_change(stats, before, after, timezone_name))
+        return before, after
+
+    return await _run(repo.transaction())
+
+
+async def rebuild_study_stats(uid: str) -> Dict[str, Any]:
+    """Recompute the aggregate from every stored session and save it.
+
+    Runs in a transaction, so a session written meanwhile (whose own
+    transaction saw no aggregate) makes it retry instead of being missed.
+    """
+    stats_ref = study_stats_doc(uid)
+    timezone_name, tz = await user_timezone(uid)
+    # Transactions read queries, not bare collections
+    sessions = repo.study_sessions_collection(uid).order_by("__name__")
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        now = datetime.now(timezone.utc)
+        stats = empty_stats()
+        streak_days = set()
+        async for session in await transaction.get(sessions):
+            data = session.to_dict() or {}
+            merge_contribution(stats, session_contribution(data), now=now)
+            if _counts_for_streak(data):
+                streak_days.add(completion_day(data, tz))
+        prune_history(stats, now)
+        stats["streak"] = streak_from_days(filter(None, streak_days), timezone_name)
+        stats["updated_at"] = now
+        transaction.set(stats_ref, stats)
+        return stats
+
+    return await _run(repo.transaction())
+
+
+async def load_study_stats(uid: str, cache: Optional[RequestDocCache] = None) -> Dict[str, Any]:
+    """Read the aggregate, building it from the sessions on first use."""
+    doc_ref = study_stats_doc(uid)
+    stats = await (cache.get_dict(doc_ref) if cache is not None else repo.get_dict(doc_ref))
+    if stats is None:
+        return await rebuild_study_stats(uid)
+    return {**empty_stats(), **stats}
+
+
+async def rebuild_streak(uid: str, timezone_name: str) -> Dict[str, Any]:
+    """Recompute the streak from the completed sessions and save it on the aggregate."""
+    stats_ref = study_stats_doc(uid)
+    tz = parse_timezone(timezone_name)
+    query = (
+        repo.study_sessions_collection(uid)
+        .where("status", "==", "completed")
+        .select(["status", "completed_at", "date", "actual_duration_minutes", "duration_minutes"])
+    )
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        exists = await repo.get_dict(stats_ref, transaction=transaction) is not None
+        days = set()
+        async for doc in await transaction.get(query):
+            session = doc.to_dict() or {}
+            if _counts_for_streak(session):
+                days.add(completion_day(session, tz))
+        streak = streak_from_days(filter(None, days), timezone_name)
+        # A streak-only document would pass for a whole aggregate; if it was
+        # dropped (e.g. by a reset) it is rebuilt, streak included, on next read
+        if exists:
+            transaction.set(stats_ref, {"streak": streak}, merge=["streak"])
+        return streak
+
+    return await _run(repo.transaction())
+
+
+async def load_streak(uid: str, stats: Dict[str, Any], timezone_name: str) -> Dict[str, Any]:
+    """Streak state of a loaded aggregate, rebuilt when missing or in another timezone."""
+    streak = stats.get("streak")
+    if streak and streak.get("timezone") == timezone_name:
+        return streak
+    return await rebuild_streak(uid, timezone_name)
+
+
+async def reset_study_stats(uid: str) -> None:
+    """Drop the aggregate, streak included, after the user's sessions were deleted."""
+    await study_stats_doc(uid).delete()
+
+
+def sum_since(daily: Dict[str, Any], since: str) -> float:
+    return sum(value for day, value in daily.items() if day >= since)
+
+
+def subject_minutes_since(stats: Dict[str, Any], since: str) -> Dict[str, float]:
+    totals: Dict[str, float] = defaultdict(float)
+    for day, subjects in (stats.get("daily_subject_minutes") or {}).items():
+        if day < since:
+            continue
+        for subject, minutes in subjects.items():
+            totals[subject] += minutes
+    return totals
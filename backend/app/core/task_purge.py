@@ -0,0 +1,53 @@
+"""Background sweeper that permanently deletes long-archived tasks.
+
+Archived tasks (``deletedAt`` set) are kept for ``ARCHIVE_RETENTION_DAYS``
+and then removed by the ``task_purge`` scheduler job, which keeps the
+``GET /tasks`` read path free of writes. One collection-group query finds
+expired tasks across all users, and they are deleted in batches.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore import FieldFilter
+
+from . import repository as repo
+from . import task_stats
+from .firebase import async_db
+
+ARCHIVE_RETENTION_DAYS = 30
+
+
+async def purge_archived_tasks(now: datetime | None = None) -> int:
+    """Delete every task archived more than ``ARCHIVE_RETENTION_DAYS`` ago.
+
+    Returns the number of deleted tasks.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=ARCHIVE_RETENTION_DAYS)
+    query = (
+        async_db.collection_group("tasks")
+        .where(filter=FieldFilter("deletedAt", "<", cutoff))
+        .select(["status"])
+    )
+
+    deleted = 0
+    done_by_user: Counter = Counter()
+    batch = repo.batch()
+    pending = 0
+    async for task in query.stream():
+        batch.delete(task.reference)
+        pending += 1
+        deleted += 1
+        if (task.to_dict() or {}).get("status") == task_stats.DONE_STATUS:
+            # users/{uid}/tasks/{taskId}
+            done_by_user[task.reference.parent.parent.id] += 1
+        if pending == repo.BATCH_LIMIT:
+            await batch.commit()
+            batch = repo.batch()
+            pending = 0
+    if pending:
+        await batch.commit()
+
+    for uid, count in done_by_user.items():
+        await task_stats.adjust_completed_tasks(uid, -count)
+    return deleted
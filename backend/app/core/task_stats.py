@@ -0,0 +1,250 @@
+"""Per-user task counters and query fields.
+
+``users/{uid}/aggregates/taskStats`` keeps the number of completed tasks so
+achievements can read one document instead of streaming the ``tasks``
+subcollection. Task writes go through ``write_task``, which reads the task
+and updates it together with the counter in one transaction; a missing
+document is rebuilt from the tasks the first time it is read.
+
+Tasks also carry two denormalized sort keys (``priorityRank`` and
+``dueDateSort``) so listings can be filtered and ordered by Firestore
+composite indexes (see ``firestore.indexes.json``). Firestore leaves
+documents without an ``order_by`` field out of the results, so tasks
+written before those keys existed get them (and ``deletedAt``) filled in:
+by ``write_task`` on their next write, and for all of a user's tasks by
+``ensure_task_fields`` before the first listing, which records that it ran
+in ``taskStats.fields_version``. The backfill also clears due dates that are
+not ``YYYY-MM-DD``, which the API no longer accepts, so the task stats can
+compare due dates as strings.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.cloud import firestore
+from google.cloud.firestore import Increment
+
+from . import repository as repo
+from .firebase import async_db
+
+TASK_STATS_DOC = "taskStats"
+DONE_STATUS = "done"
+
+# Bump when the backfill starts filling in a new task field
+TASK_FIELDS_VERSION = 1
+# Backfill passes before giving up on tasks that keep changing underneath it
+BACKFILL_ATTEMPTS = 3
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Sorts after every real YYYY-MM-DD date, so tasks without a due date come last
+NO_DUE_DATE_SORT = "9999-12-31"
+
+
+def task_stats_doc(uid: str):
+    """Get reference to user's task stats aggregate document"""
+    return repo.aggregates_collection(uid).document(TASK_STATS_DOC)
+
+
+def is_due_date(value: Any) -> bool:
+    """Whether ``value`` is a ``YYYY-MM-DD`` date string."""
+    if not isinstance(value, str) or len(value) != 10:
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def index_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Sort keys derived from whichever of ``priority``/``dueDate`` are in ``data``."""
+    fields: Dict[str, Any] = {}
+    if "priority" in data:
+        fields["priorityRank"] = PRIORITY_RANK.get(str(data["priority"] or ""), len(PRIORITY_RANK))
+    if "dueDate" in data:
+        fields["dueDateSort"] = data["dueDate"] or NO_DUE_DATE_SORT
+    return fields
+
+
+def completed_delta(before_status: Optional[str], after_status: Optional[str]) -> int:
+    """How a status change moves the completed-task counter (-1, 0 or 1)."""
+    return int(after_status == DONE_STATUS) - int(before_status == DONE_STATUS)
+
+
+async def write_task(
+    uid: str,
+    task_ref,
+    compute: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Write a task and its completed-task count atomically.
+
+    ``compute`` receives the stored task (``None`` if it does not exist) and
+    returns the fields to write, or ``None`` to delete the task. It may run
+    more than once if the transaction is retried, so it must not have side
+    effects. Returns the task data before and after the write.
+    """
+    stats_ref = task_stats_doc(uid)
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        before = await repo.get_dict(task_ref, transaction=transaction)
+        stats = await repo.get_dict(stats_ref, transaction=transaction)
+        changes = compute(before)
+
+        if changes is None:
+            after = None
+            transaction.delete(task_ref)
+        elif before is None:
+            after = dict(changes)
+            transaction.set(task_ref, changes)
+        else:
+            # Tasks from before the sort keys get them with their next write
+            changes = {**_missing_fields({**before, **changes}), **changes}
+            after = {**before, **changes}
+            transaction.update(task_ref, changes)
+
+        delta = completed_delta((before or {}).get("status"), (after or {}).get("status"))
+        # Without a counter yet it is rebuilt from the tasks on the next read
+        if stats is not None and delta:
+            transaction.update(stats_ref, {
+                "completed_tasks": stats.get("completed_tasks", 0) + delta,
+                "updated_at": datetime.now(timezone.utc),
+            })
+        return before, after
+
+    return await _run(repo.transaction())
+
+
+async def adjust_completed_tasks(uid: str, delta: int) -> None:
+    """Apply ``delta`` to the completed-task counter, for bulk task deletes.
+
+    If the counter document does not exist yet it is left alone: it gets
+    built from the tasks themselves on the next read, which already includes
+    this write. If the update fails the counter is dropped so that it is
+    rebuilt, rather than left off by ``delta``.
+    """
+    if not delta:
+        return
+    try:
+        await task_stats_doc(uid).update({
+            "completed_tasks": Increment(delta),
+            "updated_at": datetime.now(timezone.utc),
+        })
+    except NotFound:
+        pass
+    except Exception as e:
+        print(f"Error updating task stats for {uid}, dropping them for a rebuild: {e}")
+        try:
+            await task_stats_doc(uid).delete()
+        except Exception as e:
+            print(f"Error dropping task stats for {uid}: {e}")
+
+
+def _missing_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    missing: Dict[str, Any] = {}
+    if "deletedAt" not in data:
+        missing["deletedAt"] = None
+    if "priorityRank" not in data:
+        missing.update(index_fields({"priority": data.get("priority")}))
+    due_date = data.get("dueDate")
+    if due_date is not None and not is_due_date(due_date):
+        missing["dueDate"] = None
+        missing.update(index_fields({"dueDate": None}))
+    elif "dueDateSort" not in data:
+        missing.update(index_fields({"dueDate": due_date}))
+    return missing
+
+
+async def _backfill_pass(uid: str) -> Tuple[int, bool]:
+    """One pass of ``backfill_task_fields``; returns ``(changed, had conflicts)``."""
+    changed = 0
+    conflicts = False
+    batch = repo.batch()
+    pending = 0
+
+    async def _commit() -> None:
+        nonlocal changed, conflicts
+        try:
+            await batch.commit()
+            changed += pending
+        except FailedPrecondition:
+            # A task in the batch was written meanwhile; the next pass redoes the rest
+            conflicts = True
+
+    async for task in repo.tasks_collection(uid).stream():
+        missing = _missing_fields(task.to_dict() or {})
+        if missing:
+            # Only if the task is unchanged, so a concurrent write_task is never undone
+            batch.update(task.reference, missing, option=async_db.write_option(last_update_time=task.update_time))
+            pending += 1
+            if pending == repo.BATCH_LIMIT:
+                await _commit()
+                batch = repo.batch()
+                pending = 0
+    if pending:
+        await _commit()
+    return changed, conflicts
+
+
+async def backfill_task_fields(uid: str) -> int:
+    """Fill in the query fields on tasks written before they existed.
+
+    Returns the number of tasks changed.
+    """
+    changed = 0
+    for _ in range(BACKFILL_ATTEMPTS):
+        done, conflicts = await _backfill_pass(uid)
+        changed += done
+        if not conflicts:
+            return changed
+    raise RuntimeError(f"Tasks of {uid} kept changing during the field backfill")
+
+
+async def ensure_task_fields(uid: str, force: bool = False) -> int:
+    """Backfill the user's task query fields unless ``taskStats`` says it already ran.
+
+    Called before listing tasks, so tasks from before the sort keys are not
+    left out of ordered queries. Returns the number of tasks changed.
+    """
+    stats_ref = task_stats_doc(uid)
+    stats = await repo.get_dict(stats_ref)
+    if not force and stats is not None and stats.get("fields_version", 0) >= TASK_FIELDS_VERSION:
+        return 0
+    changed = await backfill_task_fields(uid)
+    if stats is None:
+        # The flag lives with the counter, whose document must not exist without it
+        await rebuild_task_stats(uid)
+    try:
+        await stats_ref.update({"fields_version": TASK_FIELDS_VERSION})
+    except NotFound:
+        # Counter dropped meanwhile; the next listing backfills (nothing) again
+        pass
+    return changed
+
+
+async def rebuild_task_stats(uid: str) -> Dict[str, Any]:
+    """Recount completed tasks and save the counters.
+
+    The count runs in a transaction, so a task written meanwhile makes it
+    retry instead of being missed.
+    """
+    stats_ref = task_stats_doc(uid)
+    done_tasks = repo.tasks_collection(uid).where(
+        filter=firestore.FieldFilter("status", "==", DONE_STATUS)
+    ).select([])
+
+    @firestore.async_transactional
+    async def _run(transaction):
+        completed = 0
+        async for _task in await transaction.get(done_tasks):
+            completed += 1
+        stats = {
+            "completed_tasks": completed,
+            "updated_at": datetime.now(timezone.utc),
+        }
+        # merge keeps fields_version
+        transaction.set(stats_ref, stats, merge=True)
+        return stats
+
+    return await _run(repo.transaction())
@@ -0,0 +1,46 @@
+"""Rate limiting and log sampling for high-frequency events."""
+
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Allows ``rate`` events per second on average, in bursts of up to ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def allow(self, now: Optional[float] = None, cost: float = 1.0) -> bool:
+        """Take ``cost`` tokens if available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class SampledLogger:
+    """Prints at most one line per ``interval`` seconds and counts the rest."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._last = float("-inf")
+        self.suppressed = 0
+
+    def log(self, message: str) -> None:
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            message = f"{message} (+{self.suppressed} similar in the last {now - self._last:.0f}s)"
+        print(message)
+        self._last = now
+        self.suppressed = 0
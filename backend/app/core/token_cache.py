@@ -0,0 +1,114 @@
+"""In-process cache of verified Firebase ID tokens.
+
+``auth.verify_id_token`` checks the RSA signature of every token it is given,
+and fetches Google's public signing certificates whenever its HTTP cache has
+gone cold. A dashboard page fires several API calls with the same token, so we
+keep the decoded claims of recently verified tokens, keyed by a digest of the
+token and dropped once the token's ``exp`` claim has passed.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from firebase_admin import auth
+
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+
+class VerifiedTokenCache:
+    """LRU cache of decoded ID token claims bounded by each token's expiry."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # require_user runs in the threadpool, so guard the OrderedDict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(id_token: str) -> str:
+        return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+    def get(self, id_token: str) -> Optional[Dict[str, Any]]:
+        """Return cached claims for ``id_token`` or ``None`` on a miss."""
+        key = self._key(id_token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(claims)
+
+    def put(self, id_token: str, claims: Dict[str, Any]) -> None:
+        """Remember verified claims until the token's ``exp`` claim."""
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+token_cache = VerifiedTokenCache()
+
+
+def verify_id_token_cached(id_token: str) -> Dict[str, Any]:
+    """Verify an ID token, reusing the claims of a previously verified token.
+
+    Raises whatever ``auth.verify_id_token`` raises for invalid tokens.
+    """
+    claims = token_cache.get(id_token)
+    if claims is not None:
+        return claims
+    claims = auth.verify_id_token(id_token)
+    token_cache.put(id_token, claims)
+    return claims
+
+
+def prefetch_signing_certs() -> bool:
+    """Warm the Admin SDK's certificate cache so the first request skips the fetch.
+
+    Uses the same cache-control aware transport the SDK verifies tokens with,
+    so the certificates stay cached for as long as Google's ``max-age`` allows.
+    """
+    try:
+        verifier = auth._get_client(None)._token_verifier
+        verifier.request(verifier.id_token_verifier.cert_url, method="GET")
+        return True
+    except Exception as e:
+        print(f"Error prefetching token signing certificates: {e}")
+        return False
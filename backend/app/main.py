@@ -23,8 +23,18 @@ from app.api.routes import (
     achievements,
     google_oauth,
     minigame,
+    metrics,
+    pet_socket,
+    dashboard,
 )
 from app.core.firebase import db
+from app.core.cluster import BackendClientManager
+from app.core.pet_engine.node import pet_node
+from app.core.token_cache import prefetch_signing_certs
+from app.core.email import mail_queue
+from app.core.jobs import register_jobs
+from app.core.scheduler import SCHEDULER_ENABLED, scheduler
+from app.core.session_buffer import session_buffer
 
 app = FastAPI()
 
@@ -57,10 +67,12 @@ static_path = os.path.join(os.path.dirname(__file__), "static")
 os.makedirs(static_path, exist_ok=True)
 app.mount("/static", StaticFiles(directory=static_path), name="static")
 
-# Socket.IO setup for real-time pet updates
+# Socket.IO setup for real-time pet updates. With SOCKETIO_MESSAGE_QUEUE set,
+# emits are relayed between nodes through the shared backend.
 sio = socketio.AsyncServer(
     async_mode="asgi",
     cors_allowed_origins=cors_origins,
+    client_manager=BackendClientManager(pet_node.backend) if pet_node.clustered else None,
 )
 
 socket_app = socketio.ASGIApp(sio, app)
@@ -74,94 +86,37 @@ app.include_router(achievements.router, prefix="/api")
 app.include_router(pet.router)
 app.include_router(google_oauth.router, prefix="/api")
 app.include_router(minigame.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(dashboard.router, prefix="/api")
 
-# Pet update loop
-pet_update_task = None
-
-
-async def pet_update_loop():
-    """Continuously update pet state and broadcast to clients"""
-    from app.api.routes.pet import pet_state
-
-    while True:
-        try:
-            if not pet_state.is_grabbed:
-                pet_state.update_position(dt=0.1)
-
-            # Broadcast to all connected clients
-            await sio.emit("pet_update", pet_state.to_dict())
-
-            # 10 updates per second
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            print(f"Pet update error: {e}")
-            await asyncio.sleep(1)
+# Pet events and the pet update loop
+pet_socket.register(sio)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Start pet update loop when server starts"""
-    global pet_update_task
-    pet_update_task = asyncio.create_task(pet_update_loop())
+    # Runs the loop here, or joins the cluster's leader election
+    await pet_node.start()
+    # Checkpoints buffered study session timer updates
+    await session_buffer.start()
+    # Warm the ID token signing certificates so the first request skips the fetch
+    asyncio.create_task(asyncio.to_thread(prefetch_signing_certs))
+    # Periodic maintenance (pet decay, archived task purge) and reminders
+    if SCHEDULER_ENABLED:
+        register_jobs(scheduler)
+        scheduler.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop pet update loop when server stops"""
-    if pet_update_task:
-        pet_update_task.cancel()
-
-
-@sio.event
-async def connect(sid, environ):
-    print(f"Client connected: {sid}")
-    # Send initial pet state
-    from app.api.routes.pet import pet_state
-
-    await sio.emit("pet_state", pet_state.to_dict(), room=sid)
-
-
-@sio.event
-async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
-
-
-@sio.event
-async def move_pet(sid, data):
-    from app.api.routes.pet import pet_state
-
-    # CRITICAL: Actually update the backend state
-    pet_state.set_position(data["x"], data["y"])
-
-    # Log for debugging
-    print(f'🎯 move_pet: x={data["x"]}, y={data["y"]}, grabbed={pet_state.is_grabbed}')
-
-
-@sio.event
-async def grab_pet(sid, data):
-    from app.api.routes.pet import pet_state
-
-    grabbed = data["grabbed"]
-
-    print(f"grab_pet: {grabbed}, current_pos=({pet_state.x}, {pet_state.y})")
-
-    # Update grab state
-    pet_state.set_grabbed(grabbed)
-
-    await sio.emit("pet_update", pet_state.to_dict(), broadcast=True)
-
-
-@sio.event
-async def grab_pet(sid, data):
-    from app.api.routes.pet import pet_state
-
-    grabbed = data["grabbed"]
-
-    print(f"grab_pet: {grabbed}, current_pos=({pet_state.x}, {pet_state.y})")
-
-    pet_state.set_grabbed(grabbed)
-
-    await sio.emit("pet_update", pet_state.to_dict(), broadcast=True)
+    await pet_node.stop()
+    await scheduler.stop()
+    # Write out buffered study session timer updates
+    await session_buffer.stop()
+    # Give queued emails a chance to go out
+    await asyncio.to_thread(mail_queue.stop)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rebuild per-user aggregate documents from the raw Firestore collections,
+and backfill the query fields on tasks written before they existed.
+
+Run from the backend directory (it needs serviceAccountKey.json):
+
+    python backfill_aggregates.py              # every user
+    python backfill_aggregates.py --uid UID    # a single user
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+
+async def backfill(uids):
+    from app.core import repository as repo
+    from app.core.study_stats import rebuild_study_stats
+    from app.core.task_stats import ensure_task_fields, rebuild_task_stats
+
+    if not uids:
+        uids = [doc.id async for doc in repo.users_collection().select([]).stream()]
+
+    print(f"🔄 Rebuilding study and task stats for {len(uids)} user(s)")
+    failed = 0
+    for uid in uids:
+        try:
+            stats = await rebuild_study_stats(uid)
+            backfilled = await ensure_task_fields(uid, force=True)
+            tasks = await rebuild_task_stats(uid)
+            print(
+                f"✅ {uid}: {stats['total_sessions']} session(s), {stats['total_minutes']} min, "
+                f"{tasks['completed_tasks']} completed task(s), {backfilled} task(s) backfilled"
+            )
+        except Exception as e:
+            failed += 1
+            print(f"❌ {uid}: {e}")
+    return failed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uid", action="append", default=[], help="Only rebuild this user (repeatable)")
+    args = parser.parse_args()
+
+    backend_dir = Path(__file__).parent
+    if not (backend_dir / "app").exists():
+        print("❌ Error: Please run this script from the backend directory")
+        return False
+
+    return asyncio.run(backfill(args.uid))
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
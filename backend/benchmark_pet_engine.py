@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare stepping pets one PetState at a time with the vectorized PetEngine.
+
+Both run seeded on the fixed simulation step, so every run replays the same
+simulation; the engine's final state is hashed to show it.
+
+    python benchmark_pet_engine.py                  # 1, 1,000 and 100,000 pets
+    python benchmark_pet_engine.py --pets 5000 --ticks 200 --seed 7
+"""
+
+import argparse
+import hashlib
+import sys
+import time
+
+import numpy as np
+
+
+def time_scalar(count, ticks, dt, seed):
+    from app.core.pet_engine.pet_state import PetState
+
+    pets = [PetState(seed=seed + i) for i in range(count)]
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for pet in pets:
+            if not pet.is_grabbed:
+                pet.update_position(dt=dt)
+    return time.perf_counter() - started
+
+
+def time_engine(count, ticks, dt, seed):
+    from app.core.pet_engine.vector_engine import PetEngine
+
+    engine = PetEngine(capacity=count, seed=seed)
+    for _ in range(count):
+        engine.add()
+    started = time.perf_counter()
+    for _ in range(ticks):
+        engine.step(dt)
+    elapsed = time.perf_counter() - started
+
+    digest = hashlib.sha256()
+    for array in (engine.x, engine.y, engine.anim, engine.roaming, engine.sleeping):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return elapsed, digest.hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pets", type=int, action="append", help="Pet counts to compare (repeatable)")
+    parser.add_argument("--ticks", type=int, default=100, help="Ticks per run (default 100, i.e. 10 s of simulation)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.core.pet_engine.clock import STEP_SECONDS
+
+    print(f"{'pets':>8} {'scalar ms/tick':>15} {'engine ms/tick':>15} {'speedup':>8}  state")
+    for count in args.pets or [1, 1000, 100000]:
+        scalar = time_scalar(count, args.ticks, STEP_SECONDS, args.seed) / args.ticks * 1000
+        engine, state = time_engine(count, args.ticks, STEP_SECONDS, args.seed)
+        engine = engine / args.ticks * 1000
+        print(f"{count:>8,} {scalar:>15.3f} {engine:>15.3f} {scalar / engine:>7.1f}x  {state}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
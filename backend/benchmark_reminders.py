@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bulk reminder fan-out against the Firestore emulator.
+
+Seeds USERS users with reminders enabled, then times one fan-out run.
+The target is 10,000 users in under a minute.
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmark_reminders.py --users 10000
+
+Emails are only queued when --email is passed and SMTP is configured
+(e.g. SMTP_DEBUG=true against a local sink).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+TARGET_SECONDS = 60
+
+
+def _init_firebase(project_id):
+    """Initialize before app.core.firebase, which would load serviceAccountKey.json."""
+    import firebase_admin
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        # The emulator ignores credentials
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(EmulatorCredential(), {"projectId": project_id})
+
+
+def seed_users(db, count, prefix):
+    writer = db.bulk_writer()
+    for i in range(count):
+        writer.set(db.collection("users").document(f"{prefix}{i:06d}"), {
+            "email": f"{prefix}{i}@example.com",
+            "displayName": f"Bench User {i}",
+            "notification_settings": {
+                "notifications": True,
+                "study_reminders": True,
+                "daily_checkin": True,
+            },
+        })
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Users to seed (default 10000)")
+    parser.add_argument("--kind", default="daily_checkin", choices=["daily_checkin", "study_reminder"])
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--email", action="store_true", help="Also queue reminder emails")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse users seeded by an earlier run")
+    parser.add_argument("--project", default="demo-bench")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("❌ Error: FIRESTORE_EMULATOR_HOST is not set. Refusing to seed a real project.")
+        return False
+
+    _init_firebase(args.project)
+    from app.core.email import mail_queue
+    from app.core.firebase import db
+    from app.core.reminder_fanout import fan_out_reminder
+
+    if not args.skip_seed:
+        print(f"🌱 Seeding {args.users} user(s)...")
+        started = time.perf_counter()
+        seed_users(db, args.users, "bench-user-")
+        print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    if args.email:
+        mail_queue.start()
+
+    print(f"📣 Fanning out {args.kind} reminders...")
+    result = fan_out_reminder(args.kind, send_email=args.email, page_size=args.page_size)
+
+    if args.email:
+        mail_queue.stop(timeout=TARGET_SECONDS)
+
+    rate = result.users_scanned / result.duration_seconds if result.duration_seconds else 0
+    print(f"   {result.as_dict()}")
+    print(f"   {rate:,.0f} users/s")
+
+    ok = result.duration_seconds < TARGET_SECONDS * max(1, result.users_scanned) / 10000
+    print("✅ Within target" if ok else f"❌ Slower than {TARGET_SECONDS}s per 10,000 users")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)